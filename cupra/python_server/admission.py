@@ -0,0 +1,197 @@
+"""
+Admission control in front of the upstream model quota.
+
+A token bucket refilled at the configured requests-per-minute decides when
+the next upstream call may start. Callers that find it empty wait in a
+per-client queue, and the queues are served round-robin, so a client firing
+many requests only delays itself. The wait is bounded: once the queue is
+full, or the expected wait is longer than a player would sit through, new
+calls are rejected at once with a Retry-After estimate rather than making
+every player slow.
+
+Background work (clue pool refills, batch jobs) has no client. It queues
+like any other client but is never rejected, only delayed.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Deque, Dict, Optional, Tuple
+
+# --- Admission Configuration ---
+# Upstream requests per minute to stay under; 0 disables admission control.
+LLM_QUOTA_RPM = float(os.environ.get("LLM_QUOTA_RPM", "0"))
+# Calls that may start back to back after an idle period (default: ten seconds' worth).
+LLM_QUOTA_BURST = int(os.environ.get("LLM_QUOTA_BURST", "0")) or max(1, int(LLM_QUOTA_RPM / 6))
+# Waiting calls across all clients, and per client, before new ones are rejected.
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "100"))
+ADMISSION_MAX_QUEUE_PER_CLIENT = int(os.environ.get("ADMISSION_MAX_QUEUE_PER_CLIENT", "10"))
+# Longest expected wait in seconds a call is queued for instead of rejected.
+ADMISSION_MAX_WAIT = float(os.environ.get("ADMISSION_MAX_WAIT", "5"))
+
+BACKGROUND = "background"
+
+# Who the model calls made in the current request are for; None for background work.
+admission_client: ContextVar[Optional[str]] = ContextVar("admission_client", default=None)
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of queueing a call that would wait too long for upstream quota."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Model quota exhausted; retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """`capacity` tokens, refilled continuously at `rate` per second."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def charge(self):
+        """Take a token even if there is none; the debt delays the next admissions."""
+        self._refill()
+        self.tokens -= 1
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available."""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class AdmissionController:
+    """Token-bucket admission with bounded, round-robin per-client wait queues."""
+
+    def __init__(
+        self,
+        rpm: float = LLM_QUOTA_RPM,
+        burst: int = LLM_QUOTA_BURST,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        max_queue_per_client: int = ADMISSION_MAX_QUEUE_PER_CLIENT,
+        max_wait: float = ADMISSION_MAX_WAIT,
+    ):
+        self.enabled = rpm > 0
+        self.bucket = TokenBucket(rpm / 60, burst) if self.enabled else None
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self.max_wait = max_wait
+        self._queues: Dict[str, Deque[Tuple[asyncio.Future, bool]]] = {}
+        # Clients with waiting calls, in the order they are served
+        self._ring: Deque[str] = deque()
+        self._waiting = 0
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.charged = 0
+
+    def expected_wait(self) -> float:
+        """Seconds a call queued now would wait, behind every call already waiting."""
+        return self.bucket.wait_time() + self._waiting / self.bucket.rate
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.expected_wait()))
+
+    async def acquire(self, client: Optional[str] = None):
+        """
+        Return once an upstream call may start for the client, taking one token.
+
+        Raises AdmissionRejected without waiting if the call would wait too long;
+        calls without a client wait as long as it takes.
+        """
+        if not self.enabled:
+            return
+        if not self._ring and self.bucket.try_take():
+            self.admitted += 1
+            return
+
+        background = client is None
+        key = client or BACKGROUND
+        queue = self._queues.get(key)
+        if not background and (
+            self._waiting >= self.max_queue
+            or (queue is not None and len(queue) >= self.max_queue_per_client)
+            or self.expected_wait() > self.max_wait
+        ):
+            self.rejected += 1
+            raise AdmissionRejected(self.retry_after())
+
+        if queue is None:
+            queue = self._queues[key] = deque()
+            self._ring.append(key)
+        entry = (asyncio.get_running_loop().create_future(), background)
+        queue.append(entry)
+        if not background:
+            self._waiting += 1
+        self.queued += 1
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        try:
+            await entry[0]
+        except asyncio.CancelledError:
+            # Cancelling the wait cancels the future too; only a result means the dispatcher already took it
+            if entry[0].cancelled() or not entry[0].done():
+                self._remove(key, entry)
+            raise
+        self.admitted += 1
+
+    def _remove(self, key: str, entry: Tuple[asyncio.Future, bool]):
+        queue = self._queues[key]
+        queue.remove(entry)
+        if not entry[1]:
+            self._waiting -= 1
+        if not queue:
+            del self._queues[key]
+            self._ring.remove(key)
+
+    async def _dispatch(self):
+        """Hand each token to the next client in turn, as the bucket refills."""
+        try:
+            while self._ring:
+                wait = self.bucket.wait_time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                key = self._ring[0]
+                self._ring.rotate(-1)
+                entry = self._queues[key][0]
+                self._remove(key, entry)
+                self.bucket.try_take()
+                entry[0].set_result(None)
+        finally:
+            self._dispatcher = None
+
+    def charge(self):
+        """Account for an upstream call that wasn't admitted on its own, e.g. a retry or hedge."""
+        if self.enabled:
+            self.bucket.charge()
+            self.charged += 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "enabled": self.enabled,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "charged": self.charged,
+            "waiting": self._waiting,
+            "clients_waiting": len(self._ring),
+        }
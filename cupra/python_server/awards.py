@@ -0,0 +1,178 @@
+"""
+Server-side sticker awards: an append-only ledger per user, compacted into snapshots.
+
+Every win appends one event with the user's next version number, so a write
+costs the same however large the collection grows. Once enough events pile
+up they are folded into the user's snapshot (a count and last-changed
+version per sticker) and deleted. Clients sync by sending the last version
+they saw and get back only the stickers that changed since.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --- Awards Configuration ---
+AWARDS_PATH = os.environ.get("AWARDS_PATH", str(Path(__file__).parent / "state" / "awards.sqlite3"))
+# Events per user kept in the ledger before they are folded into the snapshot.
+AWARDS_COMPACT_EVERY = int(os.environ.get("AWARDS_COMPACT_EVERY", "50"))
+
+STICKER_CATALOG_PATH = Path(__file__).parent.parent / "lib" / "assets" / "cupraStickers.json"
+
+WORD = re.compile(r"[a-z0-9]+")
+
+
+def _words(text: str) -> set:
+    return set(WORD.findall(text.casefold()))
+
+
+class StickerCatalog:
+    """Maps a won card to its sticker in cupraStickers.json, the catalog the app checks awards against."""
+
+    def __init__(self, path: Path = STICKER_CATALOG_PATH):
+        self.stickers: List[Dict[str, Any]] = []
+        self.default: Optional[Dict[str, Any]] = None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                catalog = json.load(f)
+        except Exception as e:
+            logger.error("Error loading sticker catalog %s: %s", path, e)
+            return
+        for title, group in catalog.items():
+            for item in group.get("items", []):
+                sticker_id = item.get("id") or item.get("sticker")
+                if group.get("section") is None:
+                    self.default = {"section": 0, "id": sticker_id}
+                    continue
+                self.stickers.append({
+                    "section": group["section"],
+                    "id": sticker_id,
+                    "words": _words(item.get("name", "")),
+                    "section_words": _words(title),
+                })
+
+    def sticker_for(self, card: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The sticker whose name shares most words with the card title, then the section's first, then the default."""
+        if card.get("sticker"):
+            for sticker in self.stickers:
+                if sticker["id"] == card["sticker"]:
+                    return {"section": sticker["section"], "id": sticker["id"]}
+        title = _words(card.get("title", ""))
+        for key in ("words", "section_words"):
+            best = max(self.stickers, key=lambda sticker: len(title & sticker[key]), default=None)
+            if best is not None and title & best[key]:
+                return {"section": best["section"], "id": best["id"]}
+        return self.default
+
+
+class AwardLedger:
+    """
+    Per-user award events and snapshots in SQLite (WAL mode), shared by every
+    worker process on the host like the SQLite game store.
+    """
+
+    def __init__(self, path: str = AWARDS_PATH, compact_every: int = AWARDS_COMPACT_EVERY):
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.compactions = 0
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS award_events ("
+            " user_id TEXT NOT NULL, version INTEGER NOT NULL, section INTEGER NOT NULL,"
+            " sticker_id TEXT NOT NULL, game_id TEXT, created_at REAL NOT NULL,"
+            " PRIMARY KEY (user_id, version)) WITHOUT ROWID"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS award_snapshots ("
+            " user_id TEXT PRIMARY KEY, version INTEGER NOT NULL, awards TEXT NOT NULL)"
+        )
+
+    def _snapshot(self, user_id: str) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        row = self._db.execute(
+            "SELECT version, awards FROM award_snapshots WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return 0, {}
+        return row[0], {f"{award['section']}:{award['id']}": award for award in json.loads(row[1])}
+
+    def record(self, user_id: str, section: int, sticker_id: str, game_id: Optional[str] = None) -> int:
+        """Append an award event and return the user's new version."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                latest = self._db.execute(
+                    "SELECT MAX(version) FROM award_events WHERE user_id = ?", (user_id,)
+                ).fetchone()[0] or 0
+                snapshot = self._db.execute(
+                    "SELECT version FROM award_snapshots WHERE user_id = ?", (user_id,)
+                ).fetchone()
+                snapshot_version = snapshot[0] if snapshot else 0
+                version = max(latest, snapshot_version) + 1
+                self._db.execute(
+                    "INSERT INTO award_events (user_id, version, section, sticker_id, game_id, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (user_id, version, section, sticker_id, game_id, time.time()),
+                )
+                if version - snapshot_version >= self.compact_every:
+                    self._compact(user_id)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self.recorded += 1
+        return version
+
+    def _compact(self, user_id: str):
+        """Fold the user's events into their snapshot; runs inside the caller's transaction."""
+        version, awards = self._apply_events(user_id, *self._snapshot(user_id))
+        self._db.execute(
+            "INSERT OR REPLACE INTO award_snapshots (user_id, version, awards) VALUES (?, ?, ?)",
+            (user_id, version, json.dumps(list(awards.values()), separators=(",", ":"))),
+        )
+        self._db.execute("DELETE FROM award_events WHERE user_id = ? AND version <= ?", (user_id, version))
+        self.compactions += 1
+
+    def _apply_events(self, user_id: str, version: int,
+                      awards: Dict[str, Dict[str, Any]]) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        rows = self._db.execute(
+            "SELECT version, section, sticker_id FROM award_events WHERE user_id = ? AND version > ? ORDER BY version",
+            (user_id, version),
+        ).fetchall()
+        for event_version, section, sticker_id in rows:
+            key = f"{section}:{sticker_id}"
+            award = awards.get(key) or {"section": section, "id": sticker_id, "count": 0}
+            awards[key] = {**award, "count": award["count"] + 1, "version": event_version}
+            version = event_version
+        return version, awards
+
+    def changes(self, user_id: str, since: int = 0) -> Dict[str, Any]:
+        """
+        The user's current version and every sticker that changed after `since`.
+
+        A client claiming a version the server never issued gets the full
+        collection, flagged with "full", and should replace what it has.
+        """
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                version, awards = self._apply_events(user_id, *self._snapshot(user_id))
+            finally:
+                self._db.execute("COMMIT")
+        full = since <= 0 or since > version
+        changed = [award for award in awards.values() if full or award["version"] > since]
+        changed.sort(key=lambda award: award["version"])
+        return {"version": version, "full": full, "awards": changed}
+
+    def stats(self) -> Dict[str, int]:
+        return {"recorded": self.recorded, "compactions": self.compactions}
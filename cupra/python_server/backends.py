@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+from schemas import AnswerVariants, ClueLadder, response_schema
+
+# --- Backend Configuration ---
+# Which backend serves model calls: "gemini" (default), "fake" or "replay" (a recorded trace).
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "gemini")
+GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
+GEMINI_MODEL_NAME = os.environ.get("GEMINI_MODEL_NAME", "gemini-1.5-flash")
+# Latency and error profile of the fake backend.
+FAKE_LLM_LATENCY_MS = float(os.environ.get("FAKE_LLM_LATENCY_MS", "800"))
+FAKE_LLM_JITTER_MS = float(os.environ.get("FAKE_LLM_JITTER_MS", "200"))
+FAKE_LLM_ERROR_RATE = float(os.environ.get("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_SEED = int(os.environ.get("FAKE_LLM_SEED", "0"))
+FAKE_STREAM_CHUNK_CHARS = 16
+# Marks the start of each item in a batched judge prompt.
+BATCH_ITEM_HEADER = re.compile(r"^Item (\d+):$", re.MULTILINE)
+# Judge prompts carry this when a clue is already prepared, so the fake leaves its own clue out.
+CLUE_READY_MARKER = "A new clue has already been prepared"
+
+
+@dataclass
+class LLMResponse:
+    """Text produced by a backend for one prompt, with token counts when the backend reports them."""
+    text: str
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+
+class LLMBackendError(Exception):
+    """Raised when a backend fails to produce a response."""
+
+
+class LLMBackend(ABC):
+    """Interface every model backend implements."""
+
+    name = "base"
+
+    @abstractmethod
+    async def generate(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> LLMResponse:
+        """Generate a response for the prompt, as JSON matching the schema if one is given."""
+
+    async def generate_stream(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> AsyncIterator[str]:
+        """Yield the response text in chunks; backends that can't stream yield it whole."""
+        response = await self.generate(prompt, schema)
+        yield response.text
+
+    async def warm_up(self):
+        """Load whatever the first call would otherwise have to load; idempotent."""
+
+
+class GeminiBackend(LLMBackend):
+    """
+    Backend that calls the Gemini API.
+
+    The SDK (and the protobuf, gRPC and auth stacks under it) takes longer to
+    import than the rest of the server, so it is only imported by warm_up()
+    or the first call, in a worker thread.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key: str = GEMINI_API_KEY, model_name: str = GEMINI_MODEL_NAME):
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    def _load_model(self):
+        with self._model_lock:
+            if self._model is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=self.api_key)
+                self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    async def warm_up(self):
+        if self._model is None:
+            await asyncio.to_thread(self._load_model)
+
+    async def _get_model(self):
+        await self.warm_up()
+        return self._model
+
+    @staticmethod
+    def _generation_config(schema: Optional[Type[BaseModel]]) -> Optional[Dict[str, Any]]:
+        if schema is None:
+            return None
+        return {"response_mime_type": "application/json", "response_schema": response_schema(schema)}
+
+    async def generate(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> LLMResponse:
+        model = await self._get_model()
+        response = await model.generate_content_async(prompt, generation_config=self._generation_config(schema))
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(
+            text=response.text,
+            input_tokens=getattr(usage, "prompt_token_count", None),
+            output_tokens=getattr(usage, "candidates_token_count", None),
+        )
+
+    async def generate_stream(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> AsyncIterator[str]:
+        model = await self._get_model()
+        response = await model.generate_content_async(
+            prompt, generation_config=self._generation_config(schema), stream=True
+        )
+        async for chunk in response:
+            yield chunk.text
+
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic local stand-in for Gemini.
+
+    Answers clue and judge prompts with JSON matching their schemas after a simulated
+    latency, and fails a configurable fraction of calls. The same prompt and
+    seed always produce the same latency, outcome and text.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency_ms: float = FAKE_LLM_LATENCY_MS,
+        jitter_ms: float = FAKE_LLM_JITTER_MS,
+        error_rate: float = FAKE_LLM_ERROR_RATE,
+        seed: int = FAKE_LLM_SEED,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.seed = seed
+
+    def _rng(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    async def generate(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> LLMResponse:
+        rng = self._rng(prompt)
+        delay_ms = max(0.0, rng.gauss(self.latency_ms, self.jitter_ms))
+        await asyncio.sleep(delay_ms / 1000)
+        if rng.random() < self.error_rate:
+            raise LLMBackendError("Simulated backend failure")
+        return LLMResponse(text=self._answer(prompt, rng, schema))
+
+    async def generate_stream(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> AsyncIterator[str]:
+        # Spend a third of the latency before the first chunk and spread the rest over the text
+        rng = self._rng(prompt)
+        delay_ms = max(0.0, rng.gauss(self.latency_ms, self.jitter_ms))
+        await asyncio.sleep(delay_ms / 3000)
+        if rng.random() < self.error_rate:
+            raise LLMBackendError("Simulated backend failure")
+        text = self._answer(prompt, rng, schema)
+        chunks = [text[i:i + FAKE_STREAM_CHUNK_CHARS] for i in range(0, len(text), FAKE_STREAM_CHUNK_CHARS)]
+        for chunk in chunks:
+            await asyncio.sleep(delay_ms * 2 / 3000 / len(chunks))
+            yield chunk
+
+    def _answer(self, prompt: str, rng: random.Random, schema: Optional[Type[BaseModel]] = None) -> str:
+        target = quoted_after(prompt, "The target text is:") or ""
+        feature = target.split("›››")[0].strip().lower()
+        if schema is ClueLadder:
+            count = int(re.search(r"exactly (\d+) clues", prompt).group(1))
+            return json.dumps({"clues": [
+                f"Clue {i + 1} of {count} (#{rng.randint(1, 1000)}): this feature is described in the owner's manual."
+                for i in range(count)
+            ]})
+        if schema is AnswerVariants:
+            words = feature.split()
+            return json.dumps({"answers": [feature, " ".join(words[-2:]), f"the {feature}"]})
+
+        parts = BATCH_ITEM_HEADER.split(prompt)
+        if len(parts) > 1:
+            verdicts = []
+            for item_id, item_prompt in zip(parts[1::2], parts[2::2]):
+                verdicts.append({"id": int(item_id), **json.loads(self._answer(item_prompt, rng))})
+            return json.dumps({"verdicts": verdicts})
+
+        guess = quoted_after(prompt, "The user's latest guess is:")
+        clue_number = rng.randint(1, 1000)
+        if guess is None:
+            return (
+                '{"status": "success", '
+                f'"clue": "Clue #{clue_number}: this feature is described in the owner\'s manual."}}'
+            )
+
+        normalized_guess = guess.strip().lower()
+        if normalized_guess and (normalized_guess in feature or feature in normalized_guess):
+            return '{"status": "correct", "clue": null, "reasoning": "Your guess matches the target text."}'
+        if CLUE_READY_MARKER in prompt:
+            clue = "null"
+        else:
+            clue = f'"Clue #{clue_number}: think about where this feature sits in the car."'
+        return (
+            '{"status": "incorrect", '
+            f'"clue": {clue}, '
+            '"reasoning": "Your guess does not match the feature."}'
+        )
+
+
+def quoted_after(prompt: str, marker: str) -> Optional[str]:
+    """Return the first double-quoted string following the marker in the prompt."""
+    match = re.search(re.escape(marker) + r'\s*"(.*?)"', prompt, re.DOTALL)
+    return match.group(1) if match else None
+
+
+def create_backend(name: str = LLM_BACKEND) -> LLMBackend:
+    """Create the backend selected by name."""
+    if name == "gemini":
+        return GeminiBackend()
+    if name == "fake":
+        return FakeBackend()
+    if name == "replay":
+        # llm_trace builds on this module, so it can only be imported here
+        from llm_trace import ReplayBackend
+
+        return ReplayBackend()
+    raise ValueError(f"Unknown LLM backend: {name}")
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# --- Judge Batching Configuration ---
+# Guesses arriving within this many milliseconds of each other are judged in one
+# model call. 0 (the default) disables batching.
+JUDGE_BATCH_WINDOW_MS = float(os.environ.get("JUDGE_BATCH_WINDOW_MS", "0"))
+# A batch is sent as soon as it holds this many guesses, without waiting out the window.
+JUDGE_BATCH_MAX_SIZE = int(os.environ.get("JUDGE_BATCH_MAX_SIZE", "8"))
+
+
+class MicroBatcher:
+    """
+    Collects items submitted within a short window and processes them together.
+
+    The first item of a batch starts the window; the batch is flushed when the
+    window closes or it reaches `max_size`. `process` gets the items in
+    submission order and returns one result per item, which is handed back to
+    each waiting `submit` call. If `process` raises, every waiter gets the error.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[List[Any]], Awaitable[List[Any]]],
+        window_ms: float = JUDGE_BATCH_WINDOW_MS,
+        max_size: int = JUDGE_BATCH_MAX_SIZE,
+    ):
+        self._process = process
+        self.window = window_ms / 1000
+        self.max_size = max(1, max_size)
+        self._pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.batches = 0
+        self.items = 0
+        self.failed_batches = 0
+        self.total_wait = 0.0
+        self.total_call = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def submit(self, item: Any) -> Any:
+        """Add an item to the next batch and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, loop.time()))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Waiters that gave up (e.g. their client disconnected) don't need a slot
+        batch = [entry for entry in self._pending if not entry[1].done()]
+        self._pending = []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future, float]]):
+        started = time.perf_counter()
+        now = asyncio.get_running_loop().time()
+        self.batches += 1
+        self.items += len(batch)
+        self.total_wait += sum(now - submitted for _, _, submitted in batch)
+        try:
+            results = await self._process([item for item, _, _ in batch])
+        except Exception as e:
+            self.failed_batches += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.total_call += time.perf_counter() - started
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window * 1000,
+            "max_size": self.max_size,
+            "batches": self.batches,
+            "items": self.items,
+            "failed_batches": self.failed_batches,
+            "calls_saved": self.items - self.batches,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "avg_wait_ms": round(self.total_wait / self.items * 1000, 1) if self.items else 0.0,
+            "avg_call_ms": round(self.total_call / self.batches * 1000, 1) if self.batches else 0.0,
+        }
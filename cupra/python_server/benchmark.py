@@ -0,0 +1,196 @@
+"""
+Load-test harness for the game API.
+
+Drives full game sessions (one /start_game followed by N /guess calls) at
+one or more concurrency levels and reports throughput and p50/p95/p99
+latency per endpoint. By default the server runs in-process against the
+fake LLM backend, so results are reproducible offline:
+
+    python benchmark.py --concurrency 1,8,32 --sessions 200 --guesses 3
+
+Pass --url to benchmark a running server instead, and --json to get
+machine-readable output for regression checks.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+# Seconds to wait for the server to finish warming up before the run starts.
+READY_TIMEOUT = 60
+GUESS_WORDS = ["airbag", "radar", "camera", "sensor", "battery", "seat belt", "brake", "charging socket"]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of the samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Recorder:
+    """Collects per-endpoint latencies and error counts."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def post(self, client: httpx.AsyncClient, endpoint: str, payload: dict) -> Optional[dict]:
+        start = time.perf_counter()
+        try:
+            response = await client.post(endpoint, json=payload)
+        except httpx.HTTPError:
+            self.errors[endpoint] += 1
+            return None
+        finally:
+            self.latencies[endpoint].append(time.perf_counter() - start)
+        if response.status_code != 200:
+            self.errors[endpoint] += 1
+            return None
+        return response.json()
+
+
+async def run_session(client: httpx.AsyncClient, recorder: Recorder, card: dict, guesses: int, rng: random.Random):
+    """Play one game: start it, then guess until it ends or the guess budget runs out."""
+    game = await recorder.post(client, "/start_game", {"card_data": card})
+    if game is None:
+        return
+    for _ in range(guesses):
+        result = await recorder.post(client, "/guess", {"game_id": game["game_id"], "guess": rng.choice(GUESS_WORDS)})
+        if result is None or result.get("game_over"):
+            return
+
+
+async def run_level(client: httpx.AsyncClient, cards: List[dict], concurrency: int, sessions: int, guesses: int, seed: int) -> dict:
+    """Run the given number of sessions with at most `concurrency` in flight."""
+    recorder = Recorder()
+    semaphore = asyncio.Semaphore(concurrency)
+    rng = random.Random(seed)
+
+    async def one(index: int):
+        async with semaphore:
+            await run_session(client, recorder, cards[index % len(cards)], guesses, random.Random(rng.random()))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    total_requests = sum(len(samples) for samples in recorder.latencies.values())
+    endpoints = {}
+    for endpoint, samples in sorted(recorder.latencies.items()):
+        endpoints[endpoint] = {
+            "requests": len(samples),
+            "errors": recorder.errors.get(endpoint, 0),
+            "p50_ms": round(percentile(samples, 50) * 1000, 1),
+            "p95_ms": round(percentile(samples, 95) * 1000, 1),
+            "p99_ms": round(percentile(samples, 99) * 1000, 1),
+        }
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "elapsed_s": round(elapsed, 3),
+        "sessions_per_s": round(sessions / elapsed, 2),
+        "requests_per_s": round(total_requests / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+@asynccontextmanager
+async def make_client(url: Optional[str]) -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Client for a running server, or for the app in-process on the fake backend.
+
+    ASGITransport doesn't send lifespan events, so the in-process app's startup
+    (warm-up, clue pool) and shutdown are run here, as uvicorn would run them.
+    Either way, the client is handed over once the server reports ready.
+    """
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+            await wait_until_ready(client)
+            yield client
+        return
+    import fastapi_server
+
+    app = fastapi_server.app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            await wait_until_ready(client)
+            yield client
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = READY_TIMEOUT):
+    """Wait for /readyz, so warm-up isn't counted against the first requests."""
+    deadline = time.perf_counter() + timeout
+    while (await client.get("/readyz")).status_code == 503:
+        if time.perf_counter() > deadline:
+            raise SystemExit(f"Server not ready after {timeout}s")
+        await asyncio.sleep(0.1)
+
+
+def load_cards() -> List[dict]:
+    """Card payloads to start games with, taken from the bundled metadata."""
+    from fastapi_server import load_metadata
+
+    cards = [{"title": view.get("title", ""), "text": view["text"]} for view in load_metadata() if view.get("text")]
+    if not cards:
+        raise SystemExit("No cards available in metadata.json")
+    return cards
+
+
+def print_report(results: List[dict]):
+    print(f"{'conc':>5} {'sess/s':>8} {'req/s':>8}  {'endpoint':<12} {'reqs':>6} {'errs':>5} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8}")
+    for result in results:
+        for index, (endpoint, stats) in enumerate(result["endpoints"].items()):
+            head = f"{result['concurrency']:>5} {result['sessions_per_s']:>8} {result['requests_per_s']:>8}" if index == 0 else " " * 23
+            print(
+                f"{head}  {endpoint:<12} {stats['requests']:>6} {stats['errors']:>5} "
+                f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}"
+            )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server (default: in-process with the fake backend)")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--sessions", type=int, default=100, help="Game sessions per concurrency level")
+    parser.add_argument("--guesses", type=int, default=3, help="Guesses per session")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for card and guess selection")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    # Only affects the in-process server; a remote server keeps its own backend
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    # Start from empty caches and leave the ones a real server persists untouched
+    os.environ.setdefault("CLUE_POOL_PATH", "")
+    os.environ.setdefault("JUDGEMENT_CACHE_PATH", "")
+    # Per-request logs would drown the report
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    async with make_client(args.url) as client:
+        cards = load_cards()
+        results = [await run_level(client, cards, level, args.sessions, args.guesses, args.seed) for level in levels]
+        stats = (await client.get("/stats")).json()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+        # The clue pool and speculation decide how many starts and guesses wait on the model
+        if "clue_pool" in stats:
+            print(f"Clue pool: {stats['clue_pool']}")
+        if "speculation" in stats:
+            print(f"Speculation: {stats['speculation']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
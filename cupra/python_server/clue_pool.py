@@ -0,0 +1,185 @@
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from pathlib import Path
+from typing import Awaitable, Callable, Deque, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Clue Pool Configuration ---
+# Ready opening clues kept per target text.
+CLUE_POOL_SIZE = int(os.environ.get("CLUE_POOL_SIZE", "3"))
+# Where the pool is persisted between restarts; empty disables persistence.
+CLUE_POOL_PATH = os.environ.get("CLUE_POOL_PATH", str(Path(__file__).parent / "state" / "clue_pool.json"))
+# Upper bound on distinct targets, so arbitrary client card data can't grow the pool forever.
+CLUE_POOL_MAX_TARGETS = int(os.environ.get("CLUE_POOL_MAX_TARGETS", "500"))
+# Seconds to wait before retrying after a refill round had failures.
+CLUE_POOL_RETRY_DELAY = float(os.environ.get("CLUE_POOL_RETRY_DELAY", "30"))
+# Pool clues generated at once, so a refill round doesn't crowd out the players' own model calls.
+CLUE_POOL_REFILL_CONCURRENCY = int(os.environ.get("CLUE_POOL_REFILL_CONCURRENCY", "2"))
+
+
+class CluePool:
+    """
+    Ready-made opening clues per target text, refilled in the background.
+
+    `take` is O(1) and never calls the model; a background task tops every
+    pool back up to `size` clues and persists the pool to disk. Each clue is
+    generated with a per-target variant number so a pool doesn't fill up with
+    copies of one clue, and clues already in a pool are not added again.
+    Refills run a few generations at a time and pause while `healthy` says
+    the upstream isn't.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[str, int], Awaitable[Optional[str]]],
+        path: Optional[str] = CLUE_POOL_PATH,
+        size: int = CLUE_POOL_SIZE,
+        max_targets: int = CLUE_POOL_MAX_TARGETS,
+        refill_concurrency: int = CLUE_POOL_REFILL_CONCURRENCY,
+        healthy: Callable[[], bool] = lambda: True,
+    ):
+        self._generate = generate
+        self._healthy = healthy
+        self._refill_limit = asyncio.Semaphore(refill_concurrency)
+        self.path = Path(path) if path else None
+        self.size = size
+        self.max_targets = max_targets
+        self._pools: Dict[str, Deque[str]] = {}
+        self._variants: Dict[str, int] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.duplicates = 0
+
+    def register(self, target_text: str):
+        """Start keeping clues for a target text."""
+        if target_text in self._pools or len(self._pools) >= self.max_targets:
+            return
+        self._pools[target_text] = deque()
+        self._wake.set()
+
+    def register_all(self, target_texts: Iterable[str]):
+        for target_text in target_texts:
+            self.register(target_text)
+
+    def take(self, target_text: str) -> Optional[str]:
+        """Pop a ready clue for the target, or return None if its pool is empty."""
+        pool = self._pools.get(target_text)
+        if pool:
+            self.hits += 1
+            self._wake.set()
+            return pool.popleft()
+        self.misses += 1
+        self.register(target_text)
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "targets": len(self._pools),
+            "ready_clues": sum(len(pool) for pool in self._pools.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "duplicates": self.duplicates,
+        }
+
+    def _put(self, target_text: str, clue: str):
+        pool = self._pools[target_text]
+        if clue in pool:
+            self.duplicates += 1
+            return
+        pool.append(clue)
+
+    def _next_variant(self, target_text: str) -> int:
+        variant = self._variants.get(target_text, 0) + 1
+        self._variants[target_text] = variant
+        return variant
+
+    def load(self):
+        """Load persisted clues, keeping at most `size` per target."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error("Error loading clue pool: %s", e)
+            return
+        for target_text, clues in data.get("pools", {}).items():
+            self.register(target_text)
+            if target_text in self._pools:
+                for clue in clues[:self.size]:
+                    self._put(target_text, clue)
+                # Number new clues after the loaded ones
+                self._variants[target_text] = len(clues)
+
+    def save(self):
+        """Persist the pool atomically."""
+        if not self.path:
+            return
+        data = {"pools": {target: list(pool) for target, pool in self._pools.items()}}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    async def _refill_one(self, target_text: str) -> bool:
+        async with self._refill_limit:
+            # Leave an unhealthy upstream to the players' calls rather than queue more behind them
+            if not self._healthy():
+                return False
+            try:
+                clue = await self._generate(target_text, self._next_variant(target_text))
+            except Exception as e:
+                logger.warning("Error generating pool clue: %s", e)
+                return False
+        if not clue:
+            return False
+        # Ready for players at once, not when the whole round is done
+        self._put(target_text, clue)
+        return True
+
+    async def refill(self) -> bool:
+        """Top every pool up to `size` clues. Returns False if any generation failed or was skipped."""
+        if not self._healthy():
+            return False
+        # Slot by slot, so every target gets its first clue before any gets a second
+        wanted = [
+            target for slot in range(self.size) for target, pool in self._pools.items() if len(pool) <= slot
+        ]
+        if not wanted:
+            return True
+        ok = all(await asyncio.gather(*(self._refill_one(target) for target in wanted)))
+        try:
+            await asyncio.to_thread(self.save)
+        except Exception as e:
+            logger.error("Error saving clue pool: %s", e)
+        return ok
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            if not await self.refill():
+                await asyncio.sleep(CLUE_POOL_RETRY_DELAY)
+                self._wake.set()
+
+    def start(self):
+        """Load the persisted pool and start the background refill task."""
+        self.load()
+        self._wake.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
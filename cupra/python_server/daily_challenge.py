@@ -0,0 +1,269 @@
+"""
+Daily challenges, precomputed offline and served from memory.
+
+A batch job picks each day's challenge features from the manual index with
+a seed derived from the date and the index contents, so re-running it for
+the same day and manual picks the same features. For every feature it asks
+the model for the full clue ladder and the accepted answer variants (all
+features and days in parallel) and writes one versioned artifact per day:
+
+    python daily_challenge.py --date 2026-10-18 --days 7
+
+The server only reads these artifacts; a challenge game gets its clues from
+the ladder and settles answers against the variants locally, so it costs
+no model calls unless a guess is genuinely ambiguous.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from manual_index import FeatureRecord, ManualIndex
+
+logger = logging.getLogger(__name__)
+
+# --- Daily Challenge Configuration ---
+DAILY_CHALLENGE_DIR = os.environ.get("DAILY_CHALLENGE_DIR", str(Path(__file__).parent / "state" / "daily"))
+# Challenges generated per day.
+DAILY_CHALLENGES_PER_DAY = int(os.environ.get("DAILY_CHALLENGES_PER_DAY", "3"))
+# Clues per ladder; one per attempt, so a player never runs out before the game ends.
+DAILY_CLUE_LADDER_SIZE = int(os.environ.get("DAILY_CLUE_LADDER_SIZE", "5"))
+# Most answer variants kept per challenge.
+DAILY_MAX_ANSWERS = 12
+# Days whose artifacts the server keeps in memory, most recently used first.
+DAILY_CACHE_DAYS = int(os.environ.get("DAILY_CACHE_DAYS", "14"))
+
+ARTIFACT_VERSION = 1
+
+
+def index_fingerprint(index: ManualIndex) -> str:
+    """Digest of every card's title and text, so a changed manual changes the picks."""
+    digest = hashlib.sha256()
+    for card in sorted(index.cards, key=lambda card: (card.get("title", ""), card.get("text", ""))):
+        digest.update(f"{card.get('title', '')}\0{card.get('text', '')}\0".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def day_seed(day: date, fingerprint: str) -> int:
+    return int.from_bytes(hashlib.sha256(f"{day.isoformat()}:{fingerprint}".encode("utf-8")).digest()[:8], "big")
+
+
+def candidate_features(index: ManualIndex) -> List[Tuple[dict, FeatureRecord]]:
+    """Every (card, feature) pair, in a stable order and without repeated features."""
+    seen = set()
+    candidates = []
+    for card in sorted(index.cards, key=lambda card: (card.get("title", ""), card.get("text", ""))):
+        for record in index.features(card.get("text", "")):
+            key = (record.name, record.page)
+            if key not in seen:
+                seen.add(key)
+                candidates.append((card, record))
+    return candidates
+
+
+def pick_features(index: ManualIndex, day: date, count: int,
+                  fingerprint: Optional[str] = None) -> List[Tuple[dict, FeatureRecord]]:
+    """The day's challenge features, the same on every run for the same day and manual."""
+    candidates = candidate_features(index)
+    rng = random.Random(day_seed(day, fingerprint or index_fingerprint(index)))
+    return rng.sample(candidates, min(count, len(candidates)))
+
+
+async def build_challenge(backend, context: Callable[[str], str], day: date, position: int,
+                          card: dict, record: FeatureRecord) -> Dict[str, Any]:
+    """Generate one challenge's clue ladder and answer variants concurrently."""
+    from llm import generate_structured
+    from prompts import ANSWER_VARIANTS, CLUE_LADDER, render_answer_variants, render_clue_ladder
+    from schemas import AnswerVariants, ClueLadder
+
+    target_text = record.text
+    manual_context = context(target_text)
+    ladder, variants = await asyncio.gather(
+        generate_structured(
+            backend, render_clue_ladder(target_text, manual_context, DAILY_CLUE_LADDER_SIZE),
+            ClueLadder, template=CLUE_LADDER.name,
+        ),
+        generate_structured(
+            backend, render_answer_variants(target_text, manual_context, DAILY_MAX_ANSWERS),
+            AnswerVariants, template=ANSWER_VARIANTS.name,
+        ),
+    )
+    clues = [clue.strip() for clue in ladder.clues if clue.strip()][:DAILY_CLUE_LADDER_SIZE]
+    if not clues:
+        raise ValueError(f"Empty clue ladder for {target_text}")
+
+    answers = []
+    for answer in [record.name, *variants.answers]:
+        answer = answer.strip()
+        if answer and answer.casefold() not in {known.casefold() for known in answers}:
+            answers.append(answer)
+
+    page_ref = f"page {record.page}" if record.page is not None else ""
+    return {
+        "id": f"{day.isoformat()}-{position + 1}",
+        "card": {key: card[key] for key in ("title", "description", "image", "text") if key in card},
+        # Same shape as the server's randomly selected features
+        "feature": {
+            "type": "section" if record.section else "callout",
+            "name": record.name,
+            "text": target_text,
+            "description": f"is described on {page_ref}" if page_ref else "is shown on this view",
+            "page": page_ref,
+            "section_title": record.section_title or "",
+        },
+        "clues": clues,
+        "answers": answers[:DAILY_MAX_ANSWERS],
+    }
+
+
+async def build_days(backend, index: ManualIndex, context: Callable[[str], str], days: List[date],
+                     per_day: int = DAILY_CHALLENGES_PER_DAY) -> List[Dict[str, Any]]:
+    """Build the artifacts for several days, generating every challenge in parallel."""
+    fingerprint = index_fingerprint(index)
+    picks = {day: pick_features(index, day, per_day, fingerprint) for day in days}
+    jobs = [
+        build_challenge(backend, context, day, position, card, record)
+        for day in days
+        for position, (card, record) in enumerate(picks[day])
+    ]
+    challenges = await asyncio.gather(*jobs)
+
+    artifacts = []
+    offset = 0
+    for day in days:
+        count = len(picks[day])
+        artifacts.append({
+            "version": ARTIFACT_VERSION,
+            "date": day.isoformat(),
+            "seed": day_seed(day, fingerprint),
+            "index_fingerprint": fingerprint,
+            "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "backend": backend.name,
+            "challenges": challenges[offset:offset + count],
+        })
+        offset += count
+    return artifacts
+
+
+def artifact_path(day: date, directory: str = DAILY_CHALLENGE_DIR) -> Path:
+    return Path(directory) / f"{day.isoformat()}.v{ARTIFACT_VERSION}.json"
+
+
+def write_artifact(artifact: Dict[str, Any], directory: str = DAILY_CHALLENGE_DIR) -> Path:
+    """Write a day's artifact atomically."""
+    path = artifact_path(date.fromisoformat(artifact["date"]), directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(artifact, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return path
+
+
+class DailyChallenges:
+    """
+    Read-only view of the precomputed artifacts, with the most recently used days kept in memory.
+
+    A day without an artifact isn't remembered, so it is served as soon as the batch job writes it,
+    and at most `max_days` days are kept however many dates clients ask for.
+    """
+
+    def __init__(self, directory: str = DAILY_CHALLENGE_DIR, max_days: int = DAILY_CACHE_DAYS):
+        self.directory = directory
+        self.max_days = max_days
+        self._days: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def day(self, day: date) -> Optional[Dict[str, Any]]:
+        key = day.isoformat()
+        artifact = self._days.get(key)
+        if artifact is not None:
+            self._days.move_to_end(key)
+            return artifact
+        artifact = self._load(day)
+        if artifact is not None:
+            self._days[key] = artifact
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+        return artifact
+
+    def _load(self, day: date) -> Optional[Dict[str, Any]]:
+        path = artifact_path(day, self.directory)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                artifact = json.load(f)
+        except Exception as e:
+            logger.error("Error loading daily challenge %s: %s", path, e)
+            return None
+        if artifact.get("version") != ARTIFACT_VERSION:
+            logger.error("Daily challenge %s has unsupported version %s", path, artifact.get("version"))
+            return None
+        return artifact
+
+    def challenge(self, challenge_id: str) -> Optional[Dict[str, Any]]:
+        """A challenge by ID, from its day's artifact."""
+        try:
+            artifact = self.day(date.fromisoformat(challenge_id.rsplit("-", 1)[0]))
+        except ValueError:
+            return None
+        if artifact is None:
+            return None
+        return next((challenge for challenge in artifact["challenges"] if challenge["id"] == challenge_id), None)
+
+
+def public_challenge(challenge: Dict[str, Any]) -> Dict[str, Any]:
+    """What a client may see before playing: the card and first clue, never the answers."""
+    return {
+        "id": challenge["id"],
+        "card": challenge["card"],
+        "first_clue": challenge["clues"][0],
+        "clue_count": len(challenge["clues"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--date", default=None, help="First day to generate (YYYY-MM-DD, default today UTC)")
+    parser.add_argument("--days", type=int, default=1, help="Number of consecutive days")
+    parser.add_argument("--per-day", type=int, default=DAILY_CHALLENGES_PER_DAY, help="Challenges per day")
+    parser.add_argument("--out", default=DAILY_CHALLENGE_DIR, help="Directory to write artifacts to")
+    parser.add_argument("--force", action="store_true", help="Regenerate days that already have an artifact")
+    args = parser.parse_args()
+
+    # The server module owns the backend, the card index and the manual context
+    from fastapi_server import llm_backend, manual_context, manual_index
+
+    if llm_backend is None:
+        raise SystemExit("No LLM backend configured")
+    first = date.fromisoformat(args.date) if args.date else datetime.now(timezone.utc).date()
+    days = [first + timedelta(days=offset) for offset in range(args.days)]
+    if not args.force:
+        days = [day for day in days if not artifact_path(day, args.out).exists()]
+    if not days:
+        print("All requested days already have artifacts (use --force to regenerate)")
+        return
+
+    started = time.perf_counter()
+    try:
+        artifacts = asyncio.run(build_days(llm_backend, manual_index, manual_context, days, args.per_day))
+    except Exception as e:
+        print(f"Failed to build daily challenges: {e}", file=sys.stderr)
+        sys.exit(1)
+    for artifact in artifacts:
+        path = write_artifact(artifact, args.out)
+        print(f"{artifact['date']}: {len(artifact['challenges'])} challenges -> {path}")
+    print(f"Generated {len(artifacts)} days in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,64 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers
 from pydantic import BaseModel
+import asyncio
 import random
 import os
 import json
-import google.generativeai as genai
-from typing import Optional, List, Dict, Any
+import logging
+import time
+from datetime import date, datetime, timezone
+from typing import AsyncIterator, Optional, List, Dict, Any
 import uvicorn
-import re
 from pathlib import Path
 
+from logging_config import setup_logging
+from metrics import ACTIVE_GAMES, GAMES_LOST, GAMES_STARTED, GAMES_WON, REQUEST_SECONDS, render_metrics
+from backends import create_backend, LLM_BACKEND
+from llm import (
+    generate_structured, stream_content, await_unless_disconnected, single_flight, resilience, admission,
+    ClientDisconnectedError, STRUCTURED_OUTPUT_MAX_REPAIRS,
+)
+from admission import AdmissionRejected, admission_client
+from schemas import (
+    BatchVerdicts, ClueResult, GuessVerdict, StructuredOutputError, parse_stats, repair_prompt, validate_fields,
+)
+from awards import AwardLedger, StickerCatalog
+from batching import MicroBatcher
+from clue_pool import CluePool
+from daily_challenge import DailyChallenges, public_challenge
+from matcher import GuessMatcher
+from judgement_cache import JudgementCache, judgement_key
+from images import ImageAssets
+from game_store import GameState, create_game_store, new_game_id, snapshot
+from ingest import load_views
+from llm_trace import LLM_TRACE_PATH, LLM_TRACE_RECORD, RecordingBackend, ReplayBackend, TraceWriter
+from manual_index import ManualIndex, load_entries
+from retrieval import open_index
+from speculation import ClueSpeculator
+from streaming import JSONFieldStream, sse_event
+from prompts import (
+    INITIAL_CLUE, JUDGE_GUESS, JUDGE_GUESS_BATCH, NEXT_CLUE,
+    render_initial_clue, render_judge_guess, render_judge_guess_batch, render_next_clue, token_usage,
+)
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
 # --- Game Configuration ---
-MAX_CLUES = 3
+# Most games /start_games opens in one request.
+MAX_BATCH_GAMES = 20
 
-# --- In-memory storage for game states ---
-active_games = {}
-next_game_id = 1
+# --- Startup Configuration ---
+# "background" loads the model SDK right after startup and reports ready once it
+# has; "lazy" reports ready at once and loads it on the first model call.
+STARTUP_WARM_UP = os.environ.get("STARTUP_WARM_UP", "background")
+
+# --- Game state storage ---
+# Selected with GAME_STORE ("memory" or "sqlite" to share games between workers)
+game_store = create_game_store()
 
 # --- FastAPI App Initialization ---
 app = FastAPI(
@@ -33,13 +76,127 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# The middlewares below are plain ASGI: @app.middleware runs the app in a separate
+# task behind BaseHTTPMiddleware, which hides client disconnects from
+# request.is_disconnected() and so from await_unless_disconnected.
+class RequestMetricsMiddleware:
+    """Observe every request's latency, labelled by its route template rather than the raw path."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        observed = False
+
+        def observe(status: int):
+            nonlocal observed
+            observed = True
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(
+                scope["method"], route.path if route else "unmatched", str(status)
+            ).observe(time.perf_counter() - started)
+
+        async def send_observed(message):
+            if message["type"] == "http.response.start" and not observed:
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_observed)
+        finally:
+            if not observed:
+                observe(500)
+
+app.add_middleware(RequestMetricsMiddleware)
+
+class ClientIdentityMiddleware:
+    """Queue each request's model calls under its client, for fair admission to the upstream quota."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            client = Headers(scope=scope).get("x-client-id") or (scope["client"][0] if scope.get("client") else None)
+            admission_client.set(client or "anonymous")
+        await self.app(scope, receive, send)
+
+app.add_middleware(ClientIdentityMiddleware)
+
+class TrafficTraceMiddleware:
+    """When recording a trace, append each game request and what the player got back."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if trace_writer is None or scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in TRACED_PATHS:
+            return await self.app(scope, receive, send)
+        # Copies of the bodies as they pass through; nothing is read ahead or held back
+        request_body: List[bytes] = []
+        response_body: List[bytes] = []
+        status = 500
+        started = time.perf_counter()
+
+        async def receive_copy():
+            message = await receive()
+            if message["type"] == "http.request":
+                request_body.append(message.get("body", b""))
+            return message
+
+        async def send_copy(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_body.append(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, receive_copy, send_copy)
+        await record_request_trace(scope["path"], b"".join(request_body), status, b"".join(response_body),
+                             time.perf_counter() - started)
+
+async def record_request_trace(path: str, body: bytes, status: int, content: bytes, latency: float):
+    try:
+        payload = json.loads(body)
+        result = json.loads(content) if status == 200 else None
+    except ValueError:
+        payload, result = None, None
+    extra = {}
+    if path == "/start_game" and result:
+        game_state = await game_store.get(result["game_id"])
+        if game_state is not None:
+            # Replays pick the same feature, so their prompts match the recorded ones
+            extra["feature"] = game_state.selected_feature["id"]
+        result = {"game_id": result["game_id"], "clue": result.get("clue")}
+    elif result:
+        result = {key: result.get(key) for key in ("is_correct", "game_over", "won", "next_clue")}
+    trace_writer.request(path, payload, status, result, latency, **extra)
+
+app.add_middleware(TrafficTraceMiddleware)
+
 # --- Pydantic Models for Request/Response ---
 class StartGameRequest(BaseModel):
     card_data: Dict[str, str]
+    user_id: Optional[str] = None
+
+class DailyStartRequest(BaseModel):
+    challenge_id: str
+    user_id: Optional[str] = None
+
+class StartGamesRequest(BaseModel):
+    cards: List[Dict[str, str]]
+    user_id: Optional[str] = None
 
 class GuessRequest(BaseModel):
     game_id: str
     guess: str
+    # Opt in to a compact response with only what changed since this many attempts
+    compact: bool = False
+    known_attempts: int = 0
 
 class GameResponse(BaseModel):
     game_id: str
@@ -49,6 +206,13 @@ class GameResponse(BaseModel):
     attempts_remaining: int
     message: str
 
+class StartGameResult(BaseModel):
+    game: Optional[GameResponse] = None
+    error: Optional[str] = None
+
+class StartGamesResponse(BaseModel):
+    games: List[StartGameResult]
+
 class GuessResponse(BaseModel):
     is_correct: bool
     message: str
@@ -61,412 +225,747 @@ class GuessResponse(BaseModel):
     game_over: bool = False
     won: bool = False
     correct_concept: Optional[str] = None
+    award: Optional[dict] = None
 
-# --- Gemini API Configuration ---
+# --- LLM Backend Configuration ---
 try:
-    # Configure the Gemini API key directly
-    API_KEY = ''
-    genai.configure(api_key=API_KEY)
-    # Create the model instance (e.g., 'gemini-1.5-flash' or 'gemini-pro')
-    # Choose the model that best suits your needs and availability
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    print("Gemini API configured successfully.")
+    # The backend is chosen with LLM_BACKEND ("gemini" or "fake"); the Gemini
+    # backend reads its key from GEMINI_API_KEY
+    llm_backend = create_backend(LLM_BACKEND)
+    logger.info("LLM backend configured", extra={"backend": llm_backend.name})
 except Exception as e:
-    print(f"Error configuring Gemini API: {e}")
-    # You might want to exit or handle this more gracefully depending on your application
-    model = None # Ensure model is None if configuration fails
+    logger.error("Error configuring LLM backend: %s", e)
+    llm_backend = None # Ensure the backend is None if configuration fails
+
+# --- Trace Configuration ---
+# Opt-in with LLM_TRACE_RECORD=1: model calls and game requests are appended to
+# LLM_TRACE_PATH, for replay.py to re-run against another build
+TRACED_PATHS = ("/start_game", "/guess")
+trace_writer = TraceWriter(LLM_TRACE_PATH) if LLM_TRACE_RECORD and LLM_BACKEND != "replay" else None
+if trace_writer is not None and llm_backend:
+    llm_backend = RecordingBackend(llm_backend, trace_writer)
+
+# --- Retrieval Configuration ---
+# Memory-mapped BM25 index over the manual, built offline with `python retrieval.py`
+retrieval_index = open_index()
+if retrieval_index is None:
+    logger.warning("Retrieval index not found; prompts will have no manual context. Build it with: python retrieval.py")
 
 # --- Helper Functions ---
-def parse_gemini_json_response(response_text: str) -> Optional[Dict]:
-    """Parse the Gemini API response into a JSON object."""
-    try:
-        # Find the first { and last } in the response
-        start = response_text.find('{')
-        end = response_text.rfind('}') + 1
-        if start == -1 or end == 0:
-            return None
-        json_str = response_text[start:end]
-        return json.loads(json_str)
-    except Exception as e:
-        print(f"Error parsing Gemini response: {e}")
-        return None
-
-def get_initial_clue_from_gemini(card_data: Dict[str, Any]) -> Dict[str, Any]:
-    if not model:
+def manual_context(query: str) -> str:
+    """Relevant owner's manual passages for a prompt, within the RAG token budget."""
+    if not retrieval_index:
+        return "- (no manual excerpts available)"
+    passages = retrieval_index.context(query)
+    if not passages:
+        return "- (no relevant manual excerpts found)"
+    return "\n".join(f"- {passage.text}" for passage in passages)
+
+async def get_initial_clue_from_gemini(card_data: Dict[str, Any], request: Optional[Request] = None,
+                                       variant: Optional[int] = None) -> Dict[str, Any]:
+    if not llm_backend:
         return {"status": "error", "clue": None, "reasoning": "Gemini API not configured"}
 
     target_text = card_data.get('text', '')
-    prompt = f"""
-    You are a helpful assistant creating clues for a car feature guessing game.
-    The target text is: "{target_text}"
-    
-    Generate a single, interesting, and not too obvious first clue for this car feature.
-    The clue should:
-    1. Hint at the feature's function or purpose
-    2. Not directly mention the feature name
-    3. Be relevant to the car's operation or safety
-    
-    Respond ONLY with a JSON object containing two keys:
-    1. "status": set to "success".
-    2. "clue": containing the generated clue string.
+    prompt = render_initial_clue(target_text, manual_context(target_text), variant)
+    try:
+        logger.debug("Asking Gemini for initial clue", extra={"target_text": target_text})
+        # A numbered variant wants a clue of its own, not a share of an identical call
+        result = await generate_structured(llm_backend, prompt, ClueResult, request=request, template=INITIAL_CLUE.name,
+                                           coalesce=variant is None)
+        logger.debug("Gemini initial clue response", extra={"response": result.model_dump()})
+        return result.model_dump()
+
+    except (ClientDisconnectedError, AdmissionRejected):
+        raise
+    except Exception as e:
+        logger.warning("Error calling Gemini API (initial clue): %s", e)
+        return {"status": "error", "clue": None, "reasoning": str(e)}
 
-    Example for target text "Front passenger front airbag off ››› page 50":
-    {{
-      "status": "success",
-      "clue": "This safety feature can be disabled for specific passenger situations."
-    }}
+async def generate_pool_clue(target_text: str, variant: int) -> Optional[str]:
+    """Generate one opening clue for the clue pool, numbered so each pool slot gets a different one."""
+    result = await get_initial_clue_from_gemini({"text": target_text}, variant=variant)
+    if result["status"] == "error":
+        return None
+    return result["clue"]
 
-    Now, generate the response for the target text: "{target_text}".
-    """
+async def generate_next_clue(target_text: str, clues_given: List[str]) -> Optional[str]:
+    """Generate the clue after `clues_given`, before the guess that will need it."""
+    if not llm_backend:
+        return None
+    prompt = render_next_clue(target_text, manual_context(target_text), clues_given)
+    result = await generate_structured(llm_backend, prompt, ClueResult, template=NEXT_CLUE.name, coalesce=False)
+    return result.clue if result.status == "success" else None
+
+# Refills stop while the breaker is open or probing, and resume once it has closed
+clue_pool = CluePool(generate_pool_clue, healthy=lambda: resilience.breaker.state == "closed")
+clue_speculator = ClueSpeculator(generate_next_clue, game_store)
+guess_matcher = GuessMatcher()
+judgement_cache = JudgementCache()
+# Precomputed by `python daily_challenge.py`; read-only here
+daily_challenges = DailyChallenges()
+sticker_catalog = StickerCatalog()
+award_ledger = AwardLedger()
+# Variants precomputed by `python images.py`
+image_assets = ImageAssets()
+if not image_assets.available:
+    logger.warning("No precomputed images found; /images will 404. Build them with: python images.py")
+
+def game_target_text(game_state: GameState) -> str:
+    """The manual text of the feature the player has to guess."""
+    return (game_state.selected_feature or {}).get('text') or game_state.card_data.get('text', '')
+
+def speculate_next_clue(game_state: GameState):
+    """Start generating the game's next clue while the player thinks about this one."""
+    # Daily challenges have their next clue ready until their clue ladder runs out
+    if ladder_clue(game_state) is None:
+        clue_speculator.schedule(game_state, game_target_text(game_state))
+
+def ladder_clue(game_state: GameState) -> Optional[str]:
+    """The next unused clue of a daily challenge's precomputed clue ladder, if any."""
+    for clue in (game_state.selected_feature or {}).get('clues', []):
+        if clue not in game_state.clues_given:
+            return clue
+    return None
+
+def local_next_clue(game_state: GameState, guess: str) -> str:
+    """A new clue for a locally rejected guess, without calling the model."""
+    next_clue = ladder_clue(game_state)
+    if next_clue:
+        return next_clue
+    speculative_clue = clue_speculator.take(game_state)
+    if speculative_clue:
+        return speculative_clue
+    target_text = game_target_text(game_state)
+    pooled_clue = clue_pool.take(target_text)
+    if pooled_clue and pooled_clue not in game_state.clues_given:
+        return pooled_clue
+    _, next_clue = generate_detailed_feedback(guess, game_state.selected_feature)
+    return next_clue
+
+def record_award(game_state: GameState) -> Optional[Dict[str, Any]]:
+    """Append the won card's sticker to the player's award ledger."""
+    if not game_state.user_id:
+        return None
+    sticker = sticker_catalog.sticker_for(game_state.card_data)
+    if sticker is None:
+        return None
     try:
-        print(f"Asking Gemini for initial clue for: {target_text}")
-        response = model.generate_content(prompt)
-        parsed_response = parse_gemini_json_response(response.text)
+        version = award_ledger.record(game_state.user_id, sticker["section"], sticker["id"], game_state.game_id)
+    except Exception:
+        # The win stands even if the ledger is unavailable
+        logger.exception("Error recording award", extra={"game_id": game_state.game_id})
+        return None
+    return {**sticker, "version": version}
 
-        if parsed_response and "status" in parsed_response and "clue" in parsed_response:
-            print(f"Gemini initial clue response: {parsed_response}")
-            return parsed_response
-        else:
-            print(f"Gemini response (non-JSON or unexpected format): {response.text}")
-            return {
-                "status": "success",
-                "clue": response.text.strip(),
-                "reasoning": "Gemini response format was unexpected, using raw text."
-            }
+def build_win_response(game_state: GameState) -> Dict[str, Any]:
+    """Response for a correct guess."""
+    GAMES_WON.inc()
+    clue_speculator.discard(game_state)
+    target_text = game_target_text(game_state)
+    return {
+        "is_correct": True,
+        "message": f"Congratulations! You guessed the feature: {target_text}",
+        "next_clue": None,
+        "attempts_remaining": game_state.max_attempts - game_state.attempts,
+        "attempts_used": game_state.attempts,
+        "previous_guesses": game_state.guesses,
+        "game_over": True,
+        "won": True,
+        "correct_concept": target_text,
+        "award": record_award(game_state)
+    }
 
-    except Exception as e:
-        print(f"Error calling Gemini API (initial clue): {e}")
-        return {"status": "error", "clue": None, "reasoning": str(e)}
+def build_incorrect_response(game_state: GameState, reasoning: str, next_clue: str) -> Dict[str, Any]:
+    """Response for a wrong guess that still leaves attempts."""
+    return {
+        "is_correct": False,
+        "message": f"Incorrect. {reasoning} Here's another clue:",
+        "next_clue": next_clue,
+        "attempts_remaining": game_state.max_attempts - game_state.attempts,
+        "attempts_used": game_state.attempts,
+        "previous_guesses": game_state.guesses,
+        "game_over": False,
+        "won": False
+    }
 
-def evaluate_guess_with_gemini(card_data: Dict[str, Any], guess: str, clues_given: List[str]) -> Dict[str, Any]:
-    if not model:
-        return {"status": "error", "clue": None, "reasoning": "Gemini API not configured"}
+# --- Lifecycle ---
+warm_up_state: Dict[str, Any] = {"ready": False, "seconds": None, "error": None}
+warm_up_task: Optional[asyncio.Task] = None
 
-    target_text = card_data.get('text', '')
-    clues_string = "\n".join([f"- {clue}" for clue in clues_given])
-
-    prompt = f"""
-    You are the judge in a car feature guessing game.
-    The target text is: "{target_text}"
-    The user has already received the following clues:
-    {clues_string}
-
-    The user's latest guess is: "{guess}".
-
-    Analyze the guess. Is it correct or close enough to the target text "{target_text}"?
-
-    Respond ONLY with a JSON object containing the following keys:
-    1. "status": set to "correct" if the guess is correct, or "incorrect" if it is wrong.
-    2. "clue": If the status is "incorrect", provide a *new*, helpful clue that hasn't been given before. If the status is "correct", set this to null.
-    3. "reasoning": Explain in detail why the guess was incorrect, focusing on:
-       - What aspects of the guess are not matching the target
-       - Any correlations or similarities with other car parts that might be causing confusion
-       - How the guess relates to a different part of the car
-       - What aspects of the guess need to be more specific or different
-       - DO NOT reveal the correct answer or give away too much information
-
-    IMPORTANT: 
-    - Only explain why the guess is wrong, never reveal the correct answer
-    - Make the explanation educational and helpful for the user to think differently
-    - Keep the explanation focused on the guess itself, not the answer
-
-    Example for target text "Front passenger front airbag off ››› page 50", guess "airbag", status "incorrect":
-    {{
-      "status": "incorrect",
-      "clue": "This feature can be toggled on or off depending on the passenger situation.",
-      "reasoning": "Your guess of 'airbag' is too general. Modern cars have multiple airbags (driver, passenger, side, curtain), and each serves a specific purpose. Think about which specific airbag this feature might be referring to and what makes it unique."
-    }}
-
-    Example for target text "Front passenger front airbag off ››› page 50", guess "front passenger airbag off", status "correct":
-     {{
-      "status": "correct",
-      "clue": null,
-      "reasoning": "Your guess exactly matches the target text."
-    }}
-
-    Now, evaluate the guess "{guess}" for the target text "{target_text}" given the previous clues.
-    """
+async def warm_up():
+    """Load the model SDK off the request path, then report ready."""
+    started = time.perf_counter()
     try:
-        print(f"Asking Gemini to evaluate guess: '{guess}' for target text: '{target_text}'")
-        response = model.generate_content(prompt)
-        parsed_response = parse_gemini_json_response(response.text)
-
-        if parsed_response and "status" in parsed_response and "clue" in parsed_response and "reasoning" in parsed_response:
-            if parsed_response["status"] not in ["correct", "incorrect"]:
-                print(f"Warning: Gemini returned unexpected status: {parsed_response['status']}")
-                parsed_response["status"] = "incorrect"
-                if parsed_response["clue"] is None:
-                    parsed_response["clue"] = "The evaluation was unclear, but the guess seems incorrect. Try again."
-
-            print(f"Gemini evaluation response: {parsed_response}")
-            return parsed_response
-        else:
-            print(f"Gemini response (non-JSON or unexpected format): {response.text}")
-            is_correct_in_text = "correct" in response.text.lower()
-            return {
-                "status": "correct" if is_correct_in_text else "incorrect",
-                "clue": None if is_correct_in_text else response.text.strip(),
-                "reasoning": "Gemini response format was unexpected."
-            }
-
+        await llm_backend.warm_up()
     except Exception as e:
-        print(f"Error calling Gemini API (evaluate guess): {e}")
-        return {"status": "error", "clue": None, "reasoning": str(e)}
+        # Serve anyway: model calls fail fast and fall back to local answers
+        logger.error("Error warming up LLM backend: %s", e)
+        warm_up_state["error"] = str(e)
+    warm_up_state["seconds"] = round(time.perf_counter() - started, 3)
+    warm_up_state["ready"] = True
+    logger.info("Warm-up finished", extra={"seconds": warm_up_state["seconds"]})
+
+@app.on_event("startup")
+async def start_warm_up():
+    global warm_up_task
+    if STARTUP_WARM_UP == "lazy" or not llm_backend:
+        warm_up_state["ready"] = True
+        return
+    warm_up_task = asyncio.create_task(warm_up())
+
+@app.on_event("startup")
+async def start_clue_pool():
+    """Start keeping opening clues ready for every known card."""
+    if not llm_backend:
+        return
+    clue_pool.register_all(record.text for record in manual_index.all_features())
+    clue_pool.start()
+
+@app.on_event("shutdown")
+async def stop_clue_pool():
+    await clue_pool.stop()
+
+@app.on_event("shutdown")
+async def close_trace():
+    if trace_writer is not None:
+        trace_writer.close()
 
-def extract_options(text: str) -> List[Dict[str, str]]:
-    """Extract numbered options from the text."""
-    options = []
-    # Split text into sections (numbered items and lettered sections)
-    sections = re.split(r'([A-Z] [^A-Z]+)', text)
+# --- API Endpoints ---
+async def open_game(card_data: Dict[str, str], user_id: Optional[str], http_request: Request) -> Dict[str, Any]:
+    """Pick a feature of the card, get its first clue and store the new game."""
+    # Validate card data
+    if not card_data or not isinstance(card_data, dict):
+        raise HTTPException(status_code=400, detail="Invalid card data provided")
     
-    for section in sections:
-        if section.strip():
-            # Handle numbered items
-            if re.match(r'^\d+', section):
-                parts = section.split(' ', 1)
-                if len(parts) == 2:
-                    options.append({
-                        'number': parts[0],
-                        'text': parts[1].strip()
-                    })
-            # Handle lettered sections
-            elif re.match(r'^[A-Z] ', section):
-                parts = section.split(' ', 1)
-                if len(parts) == 2:
-                    options.append({
-                        'number': parts[0],
-                        'text': parts[1].strip()
-                    })
+    # Get text and validate it
+    text = card_data.get("text")
+    if not text or not isinstance(text, str):
+        raise HTTPException(status_code=400, detail="No valid text available in card data")
     
-    return options
-
-def select_random_option(options: List[Dict[str, str]]) -> Dict[str, str]:
-    """Select a random option from the list."""
-    return random.choice(options)
+    # Select a random feature from the text
+    selected_feature = select_random_feature(card_data, replayed_feature(http_request))
+    
+    # Take a ready clue from the pool, or generate one live if the pool is dry
+    target_text = selected_feature["text"]
+    pooled_clue = clue_pool.take(target_text)
+    if pooled_clue is not None:
+        initial_clue = {"status": "success", "clue": pooled_clue}
+    else:
+        if user_id:
+            admission_client.set(user_id)
+        try:
+            initial_clue = await get_initial_clue_from_gemini({"text": target_text}, request=http_request)
+        except ClientDisconnectedError:
+            raise HTTPException(status_code=499, detail="Client closed request")
+        except AdmissionRejected as e:
+            raise busy_error(e)
+    if initial_clue["status"] == "error":
+        # Degrade to a clue built from the manual rather than failing the game
+        initial_clue = {"status": "success", "clue": generate_clue(selected_feature)}
+    
+    # Create and store the game state with its first clue
+    game_state = GameState(
+        game_id=new_game_id(),
+        card_data=card_data,
+        selected_feature=selected_feature,
+        clues_given=[initial_clue["clue"]],
+        user_id=user_id,
+    )
+    await game_store.save(game_state)
+    GAMES_STARTED.inc()
+    speculate_next_clue(game_state)
+    
+    return {
+        "game_id": game_state.game_id,
+        "clue": initial_clue["clue"],
+        "attempts_remaining": game_state.max_attempts,
+        "message": "Game started successfully!"
+    }
 
-# --- API Endpoints ---
 @app.post("/start_game", response_model=GameResponse)
-async def start_game(request: StartGameRequest):
+async def start_game(request: StartGameRequest, http_request: Request):
     """Start a new game with the provided card data."""
     try:
-        # Validate card data
-        card_data = request.card_data
-        if not card_data or not isinstance(card_data, dict):
-            raise HTTPException(status_code=400, detail="Invalid card data provided")
-        
-        # Get text and validate it
-        text = card_data.get("text")
-        if not text or not isinstance(text, str):
-            raise HTTPException(status_code=400, detail="No valid text available in card data")
-        
-        # Select a random feature from the text
-        selected_feature = select_random_feature(card_data)
-        
-        # Generate a new game ID
-        global next_game_id
-        game_id = str(next_game_id)
-        next_game_id += 1
-        
-        # Create new game state
-        game_state = {
-            "game_id": game_id,
-            "card_data": card_data,
-            "selected_feature": selected_feature,
-            "guesses": [],
-            "is_completed": False,
-            "attempts": 0,
-            "max_attempts": 5,
-            "clues_given": []
-        }
-        
-        # Store game state
-        active_games[game_id] = game_state
-        
-        # Generate initial clue
-        initial_clue = get_initial_clue_from_gemini(card_data)
-        if initial_clue["status"] == "error":
-            raise HTTPException(status_code=500, detail="Failed to generate initial clue")
-        
-        # Add the clue to the game state
-        game_state["clues_given"].append(initial_clue["clue"])
-        
-        return {
-            "game_id": game_id,
-            "clue": initial_clue["clue"],
-            "attempts_remaining": game_state["max_attempts"],
-            "message": "Game started successfully!"
-        }
-        
+        return await open_game(request.card_data, request.user_id, http_request)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error starting game: {e}")
+        logger.exception("Error starting game")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/start_games", response_model=StartGamesResponse, response_class=ORJSONResponse)
+async def start_games(request: StartGamesRequest, http_request: Request):
+    """
+    Start one game per card in a single request. The first clues are generated
+    concurrently; a card that fails gets an error entry instead of failing the batch.
+    """
+    if not request.cards or len(request.cards) > MAX_BATCH_GAMES:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {MAX_BATCH_GAMES} cards")
+
+    async def one(card_data: Dict[str, str]) -> Dict[str, Any]:
+        try:
+            return {"game": await open_game(card_data, request.user_id, http_request)}
+        except HTTPException as e:
+            if e.status_code == 499:
+                raise
+            return {"error": e.detail}
+        except Exception as e:
+            logger.exception("Error starting game")
+            return {"error": str(e)}
+
+    return {"games": await asyncio.gather(*(one(card_data) for card_data in request.cards))}
+
+@app.get("/daily_challenge")
+async def get_daily_challenge(day: Optional[str] = Query(None, alias="date")):
+    """The day's precomputed challenges (today, UTC, by default), without their answers."""
+    try:
+        selected_day = date.fromisoformat(day) if day else datetime.now(timezone.utc).date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date, expected YYYY-MM-DD")
+    artifact = daily_challenges.day(selected_day)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail=f"No daily challenge for {selected_day.isoformat()}")
+    return {
+        "date": artifact["date"],
+        "challenges": [public_challenge(challenge) for challenge in artifact["challenges"]],
+    }
+
+@app.post("/daily_challenge/start", response_model=GameResponse)
+async def start_daily_challenge(request: DailyStartRequest):
+    """Start a game on a daily challenge; its clues and answers are precomputed, so no model call is made."""
+    challenge = daily_challenges.challenge(request.challenge_id)
+    if challenge is None:
+        raise HTTPException(status_code=404, detail="Unknown daily challenge")
+
+    game_state = GameState(
+        game_id=new_game_id(),
+        card_data=challenge["card"],
+        selected_feature={**challenge["feature"], "clues": challenge["clues"], "answers": challenge["answers"]},
+        clues_given=[challenge["clues"][0]],
+        user_id=request.user_id,
+    )
+    await game_store.save(game_state)
+    GAMES_STARTED.inc()
+
+    return {
+        "game_id": game_state.game_id,
+        "clue": challenge["clues"][0],
+        "feature_type": challenge["feature"].get("type"),
+        "attempts_remaining": game_state.max_attempts,
+        "message": "Daily challenge started!"
+    }
+
+@app.get("/awards/{user_id}")
+async def get_awards(user_id: str, since: int = 0):
+    """Stickers the player won since the version they last synced (everything for 0)."""
+    return {"user_id": user_id, **award_ledger.changes(user_id, since)}
+
+@app.get("/images")
+async def list_images():
+    """The content hash of every manual image reference, and the widths precomputed for it."""
+    return image_assets.index()
+
+@app.get("/images/{content_hash}")
+async def get_image(content_hash: str, request: Request, w: Optional[int] = None, format: Optional[str] = None):
+    """
+    A precomputed image variant: the narrowest at least `w` pixels wide, as WebP
+    when the client accepts it (or `format` asks for it), PNG otherwise.
+    """
+    return await image_assets.response(request, content_hash, w, format)
+
+@app.get("/healthz")
+async def liveness():
+    """Liveness: the process is up and serving, whether or not warm-up has finished."""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness():
+    """Readiness: 503 until warm-up has finished, so no traffic is routed here before then."""
+    if not warm_up_state["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready", "warm_up_seconds": warm_up_state["seconds"], "warm_up_error": warm_up_state["error"]}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics in text exposition format."""
+    ACTIVE_GAMES.set(await game_store.count())
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/stats")
+async def get_stats():
+    """Hit rates of the clue pool and the local guess matcher, for tuning."""
+    return {
+        "clue_pool": clue_pool.stats(),
+        "matcher": guess_matcher.stats(),
+        "judgement_cache": judgement_cache.stats(),
+        "judge_batching": judge_batcher.stats(),
+        "single_flight": single_flight.stats(),
+        "resilience": resilience.stats(),
+        "admission": admission.stats(),
+        "speculation": clue_speculator.stats(),
+        "trace": llm_backend.stats() if isinstance(llm_backend, ReplayBackend) else {
+            "recording": trace_writer is not None,
+            "lines": trace_writer.lines if trace_writer else 0,
+        },
+        "active_games": await game_store.count(),
+        "awards": award_ledger.stats(),
+        "images": image_assets.stats(),
+        "prompts": token_usage.stats(),
+        "structured_output": parse_stats.stats(),
+    }
+
 @app.post("/guess", response_model=GuessResponse)
-async def handle_guess(guess_request: GuessRequest):
+async def handle_guess(guess_request: GuessRequest, http_request: Request):
     """
     Submit a guess for a game and get feedback.
     """
-    if not model:
+    if not llm_backend:
         raise HTTPException(status_code=503, detail="Gemini API not configured, cannot process guess.")
 
     game_id = guess_request.game_id
     user_guess = guess_request.guess
 
-    if game_id not in active_games:
+    game_state = await game_store.get(game_id)
+    if game_state is None:
         raise HTTPException(status_code=404, detail="Invalid game ID")
+    if game_state.user_id:
+        admission_client.set(game_state.user_id)
 
-    game_state = active_games[game_id]
+    base = snapshot(game_state)
+    try:
+        response = await process_guess(game_state, user_guess, http_request)
+    finally:
+        # Another worker may have saved a guess for this game while the model was judging this one
+        game_state = await game_store.update(game_state, base)
+    speculate_next_clue(game_state)
+    if guess_request.compact:
+        return ORJSONResponse(compact_response(response, guess_request.known_attempts))
+    return response
+
+def compact_response(response: Dict[str, Any], known_attempts: int) -> Dict[str, Any]:
+    """
+    A guess response without the messages, unset fields or guesses the client
+    already has: only guesses after its first `known_attempts` are sent.
+    """
+    compact = {
+        "is_correct": response["is_correct"],
+        "attempts_used": response["attempts_used"],
+        "attempts_remaining": response["attempts_remaining"],
+        "new_guesses": response["previous_guesses"][max(0, known_attempts):],
+    }
+    for key in ("next_clue", "correct_concept", "award"):
+        if response.get(key) is not None:
+            compact[key] = response[key]
+    if response.get("game_over"):
+        compact["game_over"] = True
+        compact["won"] = response["won"]
+    elif compact.get("next_clue") is None:
+        # Nothing else tells the client the guess wasn't judged
+        compact["message"] = response["message"]
+    return compact
+
+def busy_error(error: AdmissionRejected) -> HTTPException:
+    """429 for a request turned away by admission control, with when to try again."""
+    return HTTPException(
+        status_code=429,
+        detail="The server is busy. Please try again shortly.",
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+def error_response(game_state: GameState, message: str) -> Dict[str, Any]:
+    """Response for a guess the model failed to judge."""
+    return {
+        "is_correct": False,
+        "message": message,
+        "next_clue": None,
+        "attempts_remaining": game_state.max_attempts - game_state.attempts,
+        "attempts_used": game_state.attempts,
+        "previous_guesses": game_state.guesses,
+        "game_over": False,
+        "won": False
+    }
 
-    if game_state['is_completed']:
+def fallback_response(game_state: GameState, user_guess: str) -> Dict[str, Any]:
+    """Judge a guess with the local matcher when the model is unavailable; the verdict isn't cached."""
+    target_text = game_target_text(game_state)
+    feature_name = (game_state.selected_feature or {}).get('name', target_text)
+    if guess_matcher.fallback(user_guess, feature_name) == "correct":
+        game_state.is_completed = True
+        return build_win_response(game_state)
+    next_clue = local_next_clue(game_state, user_guess)
+    game_state.clues_given.append(next_clue)
+    reasoning = "Your guess doesn't match the feature closely enough."
+    return build_incorrect_response(game_state, reasoning, next_clue)
+
+def guess_cache_key(game_state: GameState, user_guess: str) -> str:
+    backend_name = llm_backend.name if llm_backend else "none"
+    return judgement_key(backend_name, game_target_text(game_state), user_guess, len(game_state.clues_given))
+
+def start_guess(game_state: GameState, user_guess: str) -> Optional[Dict[str, Any]]:
+    """
+    Record the attempt and settle the guess without the model where possible.
+
+    Returns the response, or None when the model has to judge the guess.
+    """
+    game_id = game_state.game_id
+
+    if game_state.is_completed:
         return {
             "is_correct": False,
             "message": "This game has already ended.",
             "next_clue": None,
             "attempts_remaining": 0,
-            "attempts_used": game_state['attempts'],
-            "previous_guesses": game_state['guesses'],
+            "attempts_used": game_state.attempts,
+            "previous_guesses": game_state.guesses,
             "game_over": True,
             "won": False,
-            "correct_concept": game_state['card_data'].get('text', '')
+            "correct_concept": game_target_text(game_state)
         }
 
-    game_state['attempts'] += 1
-    game_state['guesses'].append(user_guess)
-    print(f"Game {game_id}: Attempt {game_state['attempts']}, Guess='{user_guess}'")
+    game_state.attempts += 1
+    game_state.guesses.append(user_guess)
+    logger.info("Guess received", extra={"game_id": game_id, "attempt": game_state.attempts, "guess": user_guess})
 
-    if game_state['attempts'] >= game_state['max_attempts']:
-        game_state['is_completed'] = True
+    if game_state.attempts >= game_state.max_attempts:
+        game_state.is_completed = True
+        GAMES_LOST.inc()
+        clue_speculator.discard(game_state)
         return {
             "is_correct": False,
-            "message": f"Incorrect. You've run out of attempts! The feature was: {game_state['card_data'].get('text', '')}",
+            "message": f"Incorrect. You've run out of attempts! The feature was: {game_target_text(game_state)}",
             "next_clue": None,
             "attempts_remaining": 0,
-            "attempts_used": game_state['attempts'],
-            "previous_guesses": game_state['guesses'],
+            "attempts_used": game_state.attempts,
+            "previous_guesses": game_state.guesses,
             "game_over": True,
             "won": False,
-            "correct_concept": game_state['card_data'].get('text', '')
+            "correct_concept": game_target_text(game_state)
         }
 
-    # Get the target text from the card data
-    target_text = game_state['card_data'].get('text', '')
-    clues_string = "\n".join([f"- {clue}" for clue in game_state['clues_given']])
-
-    # Generate next clue and evaluate guess
-    prompt = f"""
-    You are the judge in a car feature guessing game.
-    The target text is: "{target_text}"
-    The user has already received the following clues:
-    {clues_string}
-
-    The user's latest guess is: "{user_guess}".
-
-    Analyze the guess. Is it correct or close enough to the target text "{target_text}"?
-
-    Respond ONLY with a JSON object containing the following keys:
-    1. "status": set to "correct" if the guess is correct, or "incorrect" if it is wrong.
-    2. "clue": If the status is "incorrect", provide a *new*, helpful clue that hasn't been given before. If the status is "correct", set this to null.
-    3. "reasoning": Explain in detail why the guess was incorrect, focusing on:
-       - What aspects of the guess are not matching the target
-       - Any correlations or similarities with other car parts that might be causing confusion
-       - How the guess relates to a different part of the car
-       - What aspects of the guess need to be more specific or different
-       - DO NOT reveal the correct answer or give away too much information
-
-    IMPORTANT: 
-    - Only explain why the guess is wrong, never reveal the correct answer
-    - Make the explanation educational and helpful for the user to think differently
-    - Keep the explanation focused on the guess itself, not the answer
-
-    Example for target text "Front passenger front airbag off ››› page 50", guess "airbag", status "incorrect":
-    {{
-      "status": "incorrect",
-      "clue": "This feature can be toggled on or off depending on the passenger situation.",
-      "reasoning": "Your guess of 'airbag' is too general. Modern cars have multiple airbags (driver, passenger, side, curtain), and each serves a specific purpose. Think about which specific airbag this feature might be referring to and what makes it unique."
-    }}
-
-    Example for target text "Front passenger front airbag off ››› page 50", guess "front passenger airbag off", status "correct":
-     {{
-      "status": "correct",
-      "clue": null,
-      "reasoning": "Your guess exactly matches the target text."
-    }}
-
-    Now, evaluate the guess "{user_guess}" for the target text "{target_text}" given the previous clues.
-    """
+    target_text = game_target_text(game_state)
+    feature_name = (game_state.selected_feature or {}).get('name', target_text)
 
-    try:
-        print(f"Asking Gemini to evaluate guess: '{user_guess}' for target text: '{target_text}'")
-        response = model.generate_content(prompt)
-        parsed_response = parse_gemini_json_response(response.text)
-
-        if parsed_response and "status" in parsed_response and "clue" in parsed_response and "reasoning" in parsed_response:
-            if parsed_response["status"] not in ["correct", "incorrect"]:
-                print(f"Warning: Gemini returned unexpected status: {parsed_response['status']}")
-                parsed_response["status"] = "incorrect"
-                if parsed_response["clue"] is None:
-                    parsed_response["clue"] = "The evaluation was unclear, but the guess seems incorrect. Try again."
-
-            print(f"Gemini evaluation response: {parsed_response}")
-            
-            if parsed_response["status"] == "correct":
-                game_state['is_completed'] = True
-                return {
-                    "is_correct": True,
-                    "message": f"Congratulations! You guessed the feature: {target_text}",
-                    "next_clue": None,
-                    "attempts_remaining": game_state['max_attempts'] - game_state['attempts'],
-                    "attempts_used": game_state['attempts'],
-                    "previous_guesses": game_state['guesses'],
-                    "game_over": True,
-                    "won": True,
-                    "correct_concept": target_text
-                }
-
-            elif parsed_response["status"] == "incorrect":
-                next_clue = parsed_response.get("clue")
-                if next_clue:
-                    game_state['clues_given'].append(next_clue)
-                else:
-                    print(f"Warning: Gemini reported 'incorrect' but provided no clue for game {game_id}.")
-                    next_clue = "That wasn't it. Try thinking from a different angle."
-
-                return {
-                    "is_correct": False,
-                    "message": f"Incorrect. {parsed_response.get('reasoning', '')} Here's another clue:",
-                    "next_clue": next_clue,
-                    "attempts_remaining": game_state['max_attempts'] - game_state['attempts'],
-                    "attempts_used": game_state['attempts'],
-                    "previous_guesses": game_state['guesses'],
-                    "game_over": False,
-                    "won": False
-                }
+    # Settle obvious guesses locally; only ambiguous ones need the model
+    answers = (game_state.selected_feature or {}).get('answers', [])
+    if any(guess_matcher.judge(user_guess, answer) == "correct" for answer in answers):
+        local_verdict = "correct"
+    else:
+        local_verdict = guess_matcher.judge(user_guess, feature_name)
+    if local_verdict == "correct":
+        logger.info("Guess settled locally", extra={"game_id": game_id, "verdict": "correct"})
+        game_state.is_completed = True
+        return build_win_response(game_state)
+    if local_verdict == "incorrect":
+        logger.info("Guess settled locally", extra={"game_id": game_id, "verdict": "incorrect"})
+        next_clue = local_next_clue(game_state, user_guess)
+        game_state.clues_given.append(next_clue)
+        reasoning = "Your guess doesn't share any key words with the feature you're looking for."
+        return build_incorrect_response(game_state, reasoning, next_clue)
+
+    # Serve repeat guesses from the judgement cache, unless the cached clue was already given
+    cached = judgement_cache.get(guess_cache_key(game_state, user_guess))
+    if cached is not None and cached.get("clue") not in game_state.clues_given:
+        return apply_verdict(game_state, cached)
+    return None
 
+def rollback_guess(game_state: GameState):
+    """Undo the attempt recorded by start_guess when the player never saw a verdict."""
+    game_state.attempts -= 1
+    game_state.guesses.pop()
+
+def judge_item(game_state: GameState, user_guess: str) -> Dict[str, Any]:
+    """Everything the judge prompt needs about one guess."""
+    target_text = game_target_text(game_state)
+    return {
+        "target_text": target_text,
+        "context": manual_context(f"{target_text} {user_guess}"),
+        "clues_given": list(game_state.clues_given),
+        "guess": user_guess,
+        "previous_guesses": game_state.guesses[:-1],
+        "clue_ready": ladder_clue(game_state) is not None or clue_speculator.has_clue(game_state),
+    }
+
+def judge_prompt(game_state: GameState, user_guess: str) -> str:
+    return render_judge_guess(**judge_item(game_state, user_guess))
+
+def apply_verdict(game_state: GameState, verdict: Dict) -> Dict[str, Any]:
+    """Update the game with a judge verdict and build the response."""
+    if verdict["status"] == "correct":
+        game_state.is_completed = True
+        return build_win_response(game_state)
+
+    # A daily challenge's clue ladder always comes first, and its judge was told so
+    next_clue = ladder_clue(game_state)
+    if next_clue is None:
+        # The judge is only told to leave the clue out when one was ready as its prompt was
+        # rendered; a clue it wrote anyway is what a streaming player has already seen
+        next_clue = verdict.get("clue")
+        if next_clue:
+            clue_speculator.decline(game_state)
         else:
-            print(f"Gemini response (non-JSON or unexpected format): {response.text}")
-            return {
-                "is_correct": False,
-                "message": "Error evaluating guess. Please try again.",
-                "next_clue": None,
-                "attempts_remaining": game_state['max_attempts'] - game_state['attempts'],
-                "attempts_used": game_state['attempts'],
-                "previous_guesses": game_state['guesses'],
-                "game_over": False,
-                "won": False
-            }
+            next_clue = clue_speculator.take(game_state)
+    if next_clue:
+        game_state.clues_given.append(next_clue)
+    else:
+        logger.warning("Gemini reported 'incorrect' but provided no clue", extra={"game_id": game_state.game_id})
+        next_clue = "That wasn't it. Try thinking from a different angle."
+
+    return build_incorrect_response(game_state, verdict.get('reasoning', ''), next_clue)
 
+def settle_verdict(game_state: GameState, cache_key: str, verdict: Dict) -> Dict[str, Any]:
+    """Apply a fresh judge verdict and cache it with the clue the player actually got."""
+    response = apply_verdict(game_state, verdict)
+    if verdict["status"] != "correct" and response["next_clue"] in game_state.clues_given:
+        verdict = {**verdict, "clue": response["next_clue"]}
+    judgement_cache.put(cache_key, verdict)
+    return response
+
+async def judge_guess_batch(items: List[Dict[str, Any]]) -> List[Optional[Dict]]:
+    """Judge several guesses in one model call; None for any guess the model left out."""
+    try:
+        result = await generate_structured(
+            llm_backend, render_judge_guess_batch(items), BatchVerdicts, template=JUDGE_GUESS_BATCH.name
+        )
+    except StructuredOutputError as e:
+        logger.warning("Invalid batch verdicts, judging the guesses one by one: %s", e)
+        return [None] * len(items)
+    except AdmissionRejected:
+        # The batch runs as whichever client submitted first; the others shouldn't get its 429,
+        # so each guess is judged on its own, under its own client's quota
+        logger.info("Judge batch turned away by admission control, judging the guesses one by one")
+        return [None] * len(items)
+    verdicts = {verdict.id: verdict.model_dump(exclude={"id"}) for verdict in result.verdicts}
+    logger.debug("Gemini judged a batch", extra={"batch_size": len(items), "verdicts": len(verdicts)})
+    return [verdicts.get(position) for position in range(len(items))]
+
+# Opt-in with JUDGE_BATCH_WINDOW_MS: guesses arriving together share one judge call
+judge_batcher = MicroBatcher(judge_guess_batch)
+
+async def process_guess(game_state: GameState, user_guess: str, http_request: Request) -> Dict[str, Any]:
+    """Judge a guess and update the game state; the caller persists the state."""
+    response = start_guess(game_state, user_guess)
+    if response is not None:
+        return response
+
+    cache_key = guess_cache_key(game_state, user_guess)
+    verdict = None
+    try:
+        logger.debug("Asking Gemini to evaluate guess", extra={"game_id": game_state.game_id})
+        if judge_batcher.enabled:
+            verdict = await await_unless_disconnected(judge_batcher.submit(judge_item(game_state, user_guess)), http_request)
+        # Without batching, or if the batch came back without this guess, judge it on its own
+        if verdict is None:
+            result = await generate_structured(
+                llm_backend, judge_prompt(game_state, user_guess), GuessVerdict,
+                request=http_request, template=JUDGE_GUESS.name,
+            )
+            verdict = result.model_dump()
+    except ClientDisconnectedError:
+        # The player never saw a verdict, so don't charge them the attempt
+        rollback_guess(game_state)
+        raise HTTPException(status_code=499, detail="Client closed request")
+    except AdmissionRejected as e:
+        # Turned away before the model saw it, so the attempt is given back too
+        rollback_guess(game_state)
+        raise busy_error(e)
+    except StructuredOutputError as e:
+        # The guess was never judged, so the retry shouldn't cost an attempt either
+        logger.warning("Gemini evaluation unusable after repairs: %s", e, extra={"game_id": game_state.game_id})
+        rollback_guess(game_state)
+        return error_response(game_state, "Error evaluating guess. Please try again.")
     except Exception as e:
-        print(f"Error calling Gemini API (evaluate guess): {e}")
-        return {
-            "is_correct": False,
-            "message": f"Error: {str(e)}",
-            "next_clue": None,
-            "attempts_remaining": game_state['max_attempts'] - game_state['attempts'],
-            "attempts_used": game_state['attempts'],
-            "previous_guesses": game_state['guesses'],
-            "game_over": False,
-            "won": False
-        }
+        logger.warning("Error calling Gemini API (evaluate guess), judging locally: %s", e, extra={"game_id": game_state.game_id})
+        return fallback_response(game_state, user_guess)
+
+    logger.debug("Gemini evaluation response", extra={"game_id": game_state.game_id, "response": verdict})
+    return settle_verdict(game_state, cache_key, verdict)
+
+@app.post("/guess/stream")
+async def handle_guess_stream(guess_request: GuessRequest):
+    """
+    Submit a guess and receive the verdict as server-sent events.
+
+    Events: `verdict` ({"is_correct"}) as soon as the judge has decided,
+    `clue` and `reasoning` ({"delta"}) as the model writes them, then
+    `result` with the same body /guess returns.
+    """
+    if not llm_backend:
+        raise HTTPException(status_code=503, detail="Gemini API not configured, cannot process guess.")
+
+    game_state = await game_store.get(guess_request.game_id)
+    if game_state is None:
+        raise HTTPException(status_code=404, detail="Invalid game ID")
+    if game_state.user_id:
+        admission_client.set(game_state.user_id)
+
+    return StreamingResponse(
+        stream_guess(game_state, guess_request.guess),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def stream_guess(game_state: GameState, user_guess: str) -> AsyncIterator[str]:
+    """Judge a guess, streaming the model's verdict, clue and reasoning as they arrive."""
+    pending = False
+    base = snapshot(game_state)
+    try:
+        response = start_guess(game_state, user_guess)
+        if response is not None:
+            yield sse_event("verdict", {"is_correct": response["is_correct"]})
+            yield sse_event("result", response)
+            return
+
+        pending = True
+        cache_key = guess_cache_key(game_state, user_guess)
+        prompt = judge_prompt(game_state, user_guess)
+        parser = JSONFieldStream()
+        try:
+            logger.debug("Streaming Gemini evaluation of guess", extra={"game_id": game_state.game_id})
+            async for chunk in stream_content(llm_backend, prompt, template=JUDGE_GUESS.name, schema=GuessVerdict):
+                for event in parser.feed(chunk):
+                    if event.key == "status" and event.done:
+                        yield sse_event("verdict", {"is_correct": event.value == "correct"})
+                    elif event.key in ("clue", "reasoning") and event.delta:
+                        yield sse_event(event.key, {"delta": event.delta})
+            try:
+                if not parser.complete:
+                    raise StructuredOutputError("GuessVerdict: response ended before the JSON object was complete")
+                result = validate_fields(GuessVerdict, parser.fields)
+            except StructuredOutputError as e:
+                if not STRUCTURED_OUTPUT_MAX_REPAIRS:
+                    raise
+                # The result event carries the repaired verdict, superseding the streamed text
+                logger.warning("Invalid streamed verdict, asking for a repair: %s", e, extra={"game_id": game_state.game_id})
+                result = await generate_structured(
+                    llm_backend, repair_prompt(prompt, GuessVerdict, e), GuessVerdict,
+                    template=JUDGE_GUESS.name, max_repairs=STRUCTURED_OUTPUT_MAX_REPAIRS - 1,
+                )
+        except StructuredOutputError as e:
+            logger.warning("Gemini evaluation unusable after repairs: %s", e, extra={"game_id": game_state.game_id})
+            rollback_guess(game_state)
+            response = error_response(game_state, "Error evaluating guess. Please try again.")
+        except AdmissionRejected as e:
+            rollback_guess(game_state)
+            response = {
+                **error_response(game_state, f"The server is busy. Please try again in {e.retry_after} seconds."),
+                "retry_after": e.retry_after,
+            }
+        except Exception as e:
+            logger.warning("Error calling Gemini API (stream guess), judging locally: %s", e, extra={"game_id": game_state.game_id})
+            response = fallback_response(game_state, user_guess)
+        else:
+            response = settle_verdict(game_state, cache_key, result.model_dump())
+        pending = False
+        yield sse_event("result", response)
+    finally:
+        # A client that left mid-stream never saw a verdict, so don't charge them the attempt
+        if pending:
+            rollback_guess(game_state)
+        # Shielded, since a client that leaves cancels the stream while it is still saving
+        game_state = await asyncio.shield(game_store.update(game_state, base))
+        speculate_next_clue(game_state)
 
 # Load metadata from JSON file
 def load_metadata():
@@ -486,58 +985,40 @@ def load_metadata():
                 data = json.load(f)
                 return data.get('views', [])
         
-        print("Error: metadata.json not found in either location")
+        logger.error("metadata.json not found in either location")
         return []
     except Exception as e:
-        print(f"Error loading metadata: {e}")
+        logger.error("Error loading metadata: %s", e)
         return []
 
-# Load metadata at startup
-metadata = load_metadata()
+def load_assets_metadata() -> List[dict]:
+    """Load the app's bundled assets/metadata.json, which the client sends cards from."""
+    assets_path = Path(__file__).parent.parent / "assets" / "metadata.json"
+    try:
+        with open(assets_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data.get('views', []) if isinstance(data, dict) else data
+    except Exception as e:
+        logger.error("Error loading assets metadata: %s", e)
+        return []
+
+# Load metadata at startup, from the ingested manual (`python ingest.py`) when there is one
+metadata = load_views() or load_metadata()
 if not metadata:
-    print("Warning: No metadata loaded. The game will not work properly.")
+    logger.warning("No metadata loaded. The game will not work properly.")
 
-metadata = load_metadata()
+# Index every known card once: lookups and feature selection never rescan the raw metadata
+manual_index = ManualIndex(metadata + load_entries() + load_assets_metadata())
 
-class GameState(BaseModel):
-    game_id: str
-    card_data: dict
-    selected_feature: Optional[dict] = None
-    guesses: List[str] = []
-    is_completed: bool = False
-    attempts: int = 0
-    max_attempts: int = 5
-    clues_given: List[str] = []
-
-# Store active games
-active_games: Dict[str, GameState] = {}
-
-def get_card_by_title(title: str) -> Optional[dict]:
-    """Find a card by its title in the metadata."""
-    if not metadata:
-        print("Warning: Metadata is empty")
+def replayed_feature(http_request: Request) -> Optional[int]:
+    """Position of the feature a replayed /start_game picked when it was recorded (X-Replay-Feature)."""
+    if not isinstance(llm_backend, ReplayBackend):
         return None
-        
-    # First try exact match
-    for card in metadata:
-        if card.get("title") == title:
-            return card
-            
-    # If no exact match, try case-insensitive match
-    for card in metadata:
-        if card.get("title", "").lower() == title.lower():
-            return card
-            
-    # If still no match, try partial match
-    for card in metadata:
-        if title.lower() in card.get("title", "").lower():
-            return card
-            
-    print(f"Warning: No card found with title '{title}' in metadata")
-    return None
+    feature = http_request.headers.get("x-replay-feature", "")
+    return int(feature) - 1 if feature.isdigit() else None
 
-def select_random_feature(card_data: dict) -> dict:
-    """Select a random feature or text from the card's data."""
+def select_random_feature(card_data: dict, position: Optional[int] = None) -> dict:
+    """Select a random feature from the card's text, or the one at `position` if there is one."""
     # Validate input
     if not isinstance(card_data, dict):
         raise ValueError("Card data must be a dictionary")
@@ -547,20 +1028,24 @@ def select_random_feature(card_data: dict) -> dict:
     if not text or not isinstance(text, str):
         raise ValueError("No valid text available in card data")
     
-    # Split the text into feature and page reference
-    text_parts = text.split("›››")
-    if len(text_parts) < 1:
+    # The index parses each distinct text once, so picking is O(1) after the first game
+    records = manual_index.features(text)
+    if not records:
         raise ValueError("Invalid text format in card data")
     
-    main_text = text_parts[0].strip()
-    page_ref = text_parts[1].strip() if len(text_parts) > 1 else ""
+    if position is None or not 0 <= position < len(records):
+        position = random.randrange(len(records))
+    record = records[position]
+    page_ref = f"page {record.page}" if record.page is not None else ""
     
     return {
-        "id": "1",
-        "type": "text",
-        "name": main_text,
-        "description": f"This feature is described on {page_ref}",
-        "page": page_ref
+        "id": str(position + 1),
+        "type": "section" if record.section else "callout",
+        "name": record.name,
+        "text": record.text,
+        "description": f"is described on {page_ref}" if page_ref else "is shown on this view",
+        "page": page_ref,
+        "section_title": record.section_title or ""
     }
 
 def generate_clue(feature: dict) -> str:
@@ -579,7 +1064,13 @@ def generate_detailed_feedback(guess: str, feature: dict) -> tuple[str, str]:
         next_clue = f"This feature {description}"
     else:
         feedback = f"That's not it. This feature {description}"
-        next_clue = f"This feature is specifically described on {feature.get('page', '')}"
+        # Not every feature has a page reference to point at
+        if feature.get("page"):
+            next_clue = f"This feature is specifically described on {feature['page']}"
+        elif feature.get("section_title"):
+            next_clue = f"This feature is listed under \"{feature['section_title']}\" on this view"
+        else:
+            next_clue = "This feature is marked on this view; look at where it sits on the car"
     
     return feedback, next_clue
 
@@ -600,11 +1091,14 @@ if __name__ == "__main__":
 
     local_ip = get_local_ip()
     
-    print(f"\nServer will be accessible at:")
-    print(f"Local: http://localhost:5001")
-    print(f"Network: http://{local_ip}:5001")
-    print(f"API Documentation: http://{local_ip}:5001/docs")
-    print("\nPress CTRL+C to quit\n")
+    logger.info(
+        "Server will be accessible",
+        extra={
+            "local": "http://localhost:5001",
+            "network": f"http://{local_ip}:5001",
+            "docs": f"http://{local_ip}:5001/docs",
+        },
+    )
     
     # Run the server
     uvicorn.run(app, host="0.0.0.0", port=5001) 
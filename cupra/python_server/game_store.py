@@ -0,0 +1,283 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from metrics import GAME_STORE_SECONDS
+
+# --- Game Store Configuration ---
+# "memory" keeps games in this process; "sqlite" shares them between worker processes.
+GAME_STORE = os.environ.get("GAME_STORE", "memory")
+GAME_STORE_PATH = os.environ.get("GAME_STORE_PATH", str(Path(__file__).parent / "state" / "games.sqlite3"))
+# Games untouched for this many seconds are evicted.
+GAME_IDLE_TTL = float(os.environ.get("GAME_IDLE_TTL", "3600"))
+# Hard cap on stored games; the least recently used are evicted first.
+GAME_STORE_MAX_GAMES = int(os.environ.get("GAME_STORE_MAX_GAMES", "50000"))
+# The SQLite store sweeps expired games once every this many writes.
+SQLITE_SWEEP_INTERVAL = 500
+# Times a save is merged with a newer saved state and tried again before giving up.
+GAME_SAVE_RETRIES = 5
+
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class GameState:
+    game_id: str
+    card_data: Dict[str, Any]
+    selected_feature: Optional[Dict[str, Any]] = None
+    guesses: List[str] = field(default_factory=list)
+    is_completed: bool = False
+    attempts: int = 0
+    max_attempts: int = 5
+    clues_given: List[str] = field(default_factory=list)
+    updated_at: float = 0.0
+    user_id: Optional[str] = None
+    # Clue generated ahead of the next wrong guess, and how many clues had been given then
+    next_clue: Optional[str] = None
+    next_clue_for: int = 0
+    # Saves so far; a save is refused if another worker saved the game since it was read
+    version: int = 0
+
+
+class GameConflictError(Exception):
+    """Raised when a game is saved over a newer version saved by another request."""
+
+
+def new_game_id() -> str:
+    """A game ID that can't collide between worker processes."""
+    return uuid.uuid4().hex
+
+
+def snapshot(game: GameState) -> GameState:
+    """A copy of the game that later changes to it don't affect."""
+    return replace(game, guesses=list(game.guesses), clues_given=list(game.clues_given))
+
+
+def rebase(game: GameState, base: GameState, current: GameState) -> GameState:
+    """
+    What `game` changed since `base` was read, replayed onto `current`, the newer saved state.
+
+    A guess only ever adds attempts, guesses and clues and may end the game, so those are
+    added to what the other request saved rather than overwriting it.
+    """
+    merged = snapshot(current)
+    merged.attempts += game.attempts - base.attempts
+    merged.guesses.extend(game.guesses[len(base.guesses):])
+    merged.clues_given.extend(
+        clue for clue in game.clues_given[len(base.clues_given):] if clue not in merged.clues_given
+    )
+    merged.is_completed = current.is_completed or game.is_completed or merged.attempts >= merged.max_attempts
+    if (game.next_clue, game.next_clue_for) != (base.next_clue, base.next_clue_for):
+        merged.next_clue, merged.next_clue_for = game.next_clue, game.next_clue_for
+    return merged
+
+
+class GameStore(ABC):
+    """Where game states live between requests."""
+
+    @abstractmethod
+    async def get(self, game_id: str) -> Optional[GameState]:
+        """Return the game, or None if it doesn't exist or has expired."""
+
+    @abstractmethod
+    async def save(self, game: GameState):
+        """
+        Store the game's current state and refresh its idle timer.
+
+        Raises GameConflictError if the game was saved elsewhere since it was read.
+        """
+
+    @abstractmethod
+    async def delete(self, game_id: str):
+        """Remove a game."""
+
+    @abstractmethod
+    async def count(self) -> int:
+        """Number of stored games."""
+
+    async def update(self, game: GameState, base: GameState) -> GameState:
+        """
+        Save a game read as `base`, merging in what other requests saved since; returns the saved state.
+        """
+        for _ in range(GAME_SAVE_RETRIES):
+            try:
+                await self.save(game)
+                return game
+            except GameConflictError:
+                current = await self.get(game.game_id)
+                if current is None:
+                    # Evicted meanwhile, so there is nothing left to save it over
+                    return game
+                game, base = rebase(game, base, current), current
+        raise GameConflictError(f"Game {game.game_id} kept changing while being saved")
+
+
+class MemoryGameStore(GameStore):
+    """In-process store with idle-TTL and LRU eviction."""
+
+    def __init__(self, idle_ttl: float = GAME_IDLE_TTL, max_games: int = GAME_STORE_MAX_GAMES):
+        self.idle_ttl = idle_ttl
+        self.max_games = max_games
+        self._games: "OrderedDict[str, GameState]" = OrderedDict()
+        self.evictions = 0
+
+    def _evict(self, now: float):
+        # Games are kept in last-touched order, so expired ones are always at the front
+        while self._games:
+            game = next(iter(self._games.values()))
+            if now - game.updated_at <= self.idle_ttl and len(self._games) <= self.max_games:
+                break
+            self._games.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, game_id: str) -> Optional[GameState]:
+        self._evict(time.time())
+        return self._games.get(game_id)
+
+    async def save(self, game: GameState):
+        stored = self._games.get(game.game_id)
+        # Requests in this process share the stored object; only a replaced one can be newer
+        if stored is not None and stored is not game and stored.version != game.version:
+            raise GameConflictError(f"Game {game.game_id} was saved by another request")
+        now = time.time()
+        game.updated_at = now
+        game.version += 1
+        self._games[game.game_id] = game
+        self._games.move_to_end(game.game_id)
+        self._evict(now)
+
+    async def delete(self, game_id: str):
+        self._games.pop(game_id, None)
+
+    async def count(self) -> int:
+        return len(self._games)
+
+
+class SQLiteGameStore(GameStore):
+    """
+    Store shared by every worker process on the host, backed by SQLite in WAL mode.
+
+    Each process opens its own connection; WAL lets readers proceed while
+    another worker writes. Saves compare and swap the game's version, so two
+    workers can't overwrite each other's guesses. The blocking SQLite calls
+    run on one dedicated thread, off the event loop.
+    """
+
+    def __init__(self, path: str = GAME_STORE_PATH, idle_ttl: float = GAME_IDLE_TTL, max_games: int = GAME_STORE_MAX_GAMES):
+        self.idle_ttl = idle_ttl
+        self.max_games = max_games
+        self._writes = 0
+        # One thread owns the connection, so calls on it never overlap
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="game-store")
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS games (game_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL, "
+            "version INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(games)")}
+        if "version" not in columns:
+            self._db.execute("ALTER TABLE games ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS games_updated_at ON games (updated_at)")
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def get(self, game_id: str) -> Optional[GameState]:
+        return await self._run(self._get, game_id)
+
+    def _get(self, game_id: str) -> Optional[GameState]:
+        row = self._db.execute(
+            "SELECT state, version FROM games WHERE game_id = ? AND updated_at > ?",
+            (game_id, time.time() - self.idle_ttl),
+        ).fetchone()
+        if not row:
+            return None
+        game = GameState(**json.loads(row[0]))
+        game.version = row[1]
+        return game
+
+    async def save(self, game: GameState):
+        updated_at = time.time()
+        state = json.dumps({**asdict(game), "updated_at": updated_at, "version": game.version + 1}, ensure_ascii=False)
+        await self._run(self._save, game.game_id, game.version, state, updated_at)
+        game.updated_at = updated_at
+        game.version += 1
+
+    def _save(self, game_id: str, version: int, state: str, updated_at: float):
+        if version == 0:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO games (game_id, state, updated_at, version) VALUES (?, ?, ?, 1)",
+                (game_id, state, updated_at),
+            )
+        else:
+            cursor = self._db.execute(
+                "UPDATE games SET state = ?, updated_at = ?, version = version + 1 WHERE game_id = ? AND version = ?",
+                (state, updated_at, game_id, version),
+            )
+        if cursor.rowcount == 0:
+            raise GameConflictError(f"Game {game_id} was saved by another request")
+        self._writes += 1
+        if self._writes % SQLITE_SWEEP_INTERVAL == 0:
+            self._sweep(updated_at)
+
+    def _sweep(self, now: float):
+        self._db.execute("DELETE FROM games WHERE updated_at <= ?", (now - self.idle_ttl,))
+        self._db.execute(
+            "DELETE FROM games WHERE game_id IN (SELECT game_id FROM games ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_games,),
+        )
+
+    async def delete(self, game_id: str):
+        await self._run(self._db.execute, "DELETE FROM games WHERE game_id = ?", (game_id,))
+
+    async def count(self) -> int:
+        return await self._run(self._count)
+
+    def _count(self) -> int:
+        return self._db.execute(
+            "SELECT COUNT(*) FROM games WHERE updated_at > ?", (time.time() - self.idle_ttl,)
+        ).fetchone()[0]
+
+
+class TimedGameStore(GameStore):
+    """Records the latency of every operation on the wrapped store."""
+
+    def __init__(self, store: GameStore):
+        self.store = store
+
+    async def get(self, game_id: str) -> Optional[GameState]:
+        with GAME_STORE_SECONDS.labels("get").time():
+            return await self.store.get(game_id)
+
+    async def save(self, game: GameState):
+        with GAME_STORE_SECONDS.labels("save").time():
+            await self.store.save(game)
+
+    async def delete(self, game_id: str):
+        with GAME_STORE_SECONDS.labels("delete").time():
+            await self.store.delete(game_id)
+
+    async def count(self) -> int:
+        with GAME_STORE_SECONDS.labels("count").time():
+            return await self.store.count()
+
+
+def create_game_store(name: str = GAME_STORE) -> GameStore:
+    """Create the game store selected by name."""
+    if name == "memory":
+        return TimedGameStore(MemoryGameStore())
+    if name == "sqlite":
+        return TimedGameStore(SQLiteGameStore())
+    raise ValueError(f"Unknown game store: {name}")
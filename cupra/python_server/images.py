@@ -0,0 +1,307 @@
+"""
+Manual screenshots, precomputed for mobile clients and served from disk.
+
+An offline pipeline reads every image the manual entries and the app's
+assets point to, and writes resized variants (PNG and WebP) named by the
+source's content hash, plus a manifest:
+
+    python images.py --widths 320,640,1280
+
+Identical screenshots collapse into one set of variants, and unchanged
+sources are skipped on the next run. The server serves the variants as
+immutable files: strong ETags, year-long cache headers, single byte ranges,
+and plain file responses that the ASGI server can send without copying.
+Pillow is only needed to run the pipeline, so it is in
+requirements-pipeline.txt rather than the server's requirements.txt.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import anyio
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+from manual_index import ENTRIES_DIR, load_entries
+
+# --- Image Configuration ---
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", str(Path(__file__).parent / "state" / "images"))
+# Widths of the resized variants; sources narrower than a width are not upscaled.
+IMAGE_WIDTHS = [int(width) for width in os.environ.get("IMAGE_WIDTHS", "320,640,1280").split(",") if width]
+IMAGE_WEBP_QUALITY = int(os.environ.get("IMAGE_WEBP_QUALITY", "80"))
+
+APP_ROOT = Path(__file__).parent.parent
+ASSETS_METADATA_PATH = APP_ROOT / "assets" / "metadata.json"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+FORMATS = {"png": "image/png", "webp": "image/webp"}
+# Content-hashed URLs never change meaning, so clients may keep them forever
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# An entity tag, weak or strong; the opaque part may itself contain commas
+ENTITY_TAG = re.compile(r'(?:W/)?"[^"]*"')
+
+
+def none_match(if_none_match: str, etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches the ETag (RFC 9110, 13.1.2).
+
+    "*" matches any current representation, and tags are compared weakly:
+    W/"x" and "x" match each other.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.removeprefix("W/") == opaque for tag in ENTITY_TAG.findall(if_none_match))
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:20]
+
+
+def image_sources() -> Dict[str, Path]:
+    """Every image path the manual entries and the app's bundled metadata refer to, by that reference."""
+    sources = {}
+    for entry in load_entries():
+        if entry.get("image_path"):
+            sources[entry["image_path"]] = ENTRIES_DIR.parent / entry["image_path"]
+    try:
+        with open(ASSETS_METADATA_PATH, 'r', encoding='utf-8') as f:
+            views = json.load(f)
+    except Exception:
+        views = []
+    for view in views if isinstance(views, list) else views.get('views', []):
+        if view.get("image"):
+            sources[view["image"]] = APP_ROOT / view["image"]
+    return {reference: path for reference, path in sources.items() if path.is_file()}
+
+
+def variant_name(digest: str, width: int, fmt: str) -> str:
+    return f"{digest}-{width}.{fmt}"
+
+
+def build_variants(data: bytes, digest: str, out_dir: Path, widths: List[int], quality: int) -> Dict[str, Any]:
+    """Write every width and format of one source image; returns its manifest record."""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    record = {"width": image.width, "height": image.height, "variants": {}}
+    targets = sorted({width for width in widths if width < image.width} | {image.width})
+    for width in targets:
+        if width == image.width:
+            resized = image
+        else:
+            resized = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        for fmt in FORMATS:
+            name = variant_name(digest, width, fmt)
+            tmp_path = out_dir / f"{name}.tmp"
+            if fmt == "webp":
+                resized.save(tmp_path, "WEBP", quality=quality, method=6)
+            else:
+                resized.save(tmp_path, "PNG", optimize=True)
+            os.replace(tmp_path, out_dir / name)
+            record["variants"].setdefault(str(width), {})[fmt] = {
+                "file": name,
+                "bytes": (out_dir / name).stat().st_size,
+                "height": resized.height,
+            }
+    return record
+
+
+def build(out_dir: str = IMAGE_CACHE_DIR, widths: List[int] = IMAGE_WIDTHS,
+          quality: int = IMAGE_WEBP_QUALITY) -> Dict[str, Any]:
+    """Bring the variants and manifest up to date with the current sources."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    previous = ImageAssets(out_dir).manifest
+    images = {}
+    references = {}
+    built = 0
+    for reference, path in sorted(image_sources().items()):
+        data = path.read_bytes()
+        digest = content_hash(data)
+        references[reference] = digest
+        if digest in images:
+            continue
+        record = previous["images"].get(digest)
+        fresh = (
+            record is not None
+            and previous.get("widths") == widths
+            and previous.get("quality") == quality
+            and all((out / formats[fmt]["file"]).exists()
+                    for formats in record["variants"].values() for fmt in formats)
+        )
+        if not fresh:
+            record = build_variants(data, digest, out, widths, quality)
+            built += 1
+        images[digest] = record
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "widths": widths,
+        "quality": quality,
+        "built_at": time.time(),
+        "images": images,
+        "sources": references,
+    }
+    tmp_path = out / f"{MANIFEST_NAME}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, out / MANIFEST_NAME)
+    manifest["built"] = built
+    return manifest
+
+
+class ImageAssets:
+    """The manifest of precomputed variants, loaded once, and the responses that serve them."""
+
+    def __init__(self, directory: str = IMAGE_CACHE_DIR):
+        self.directory = Path(directory)
+        self.manifest: Dict[str, Any] = {"images": {}, "sources": {}}
+        path = self.directory / MANIFEST_NAME
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                self.manifest = manifest
+        self.served = 0
+        self.not_modified = 0
+        self.partial = 0
+
+    @property
+    def available(self) -> bool:
+        return bool(self.manifest["images"])
+
+    def index(self) -> Dict[str, Any]:
+        """Which content hash each image reference maps to, and the widths available for it."""
+        return {
+            "sources": self.manifest["sources"],
+            "images": {
+                digest: {
+                    "width": record["width"],
+                    "height": record["height"],
+                    "widths": sorted(int(width) for width in record["variants"]),
+                }
+                for digest, record in self.manifest["images"].items()
+            },
+        }
+
+    def variant(self, digest: str, width: Optional[int], fmt: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """The narrowest variant at least `width` wide (the widest there is otherwise); None if unknown."""
+        record = self.manifest["images"].get(digest)
+        if record is None:
+            return None
+        widths = sorted(int(width) for width in record["variants"])
+        chosen = widths[-1]
+        if width:
+            chosen = next((candidate for candidate in widths if candidate >= width), widths[-1])
+        variant = record["variants"][str(chosen)].get(fmt)
+        if variant is None:
+            return None
+        return f'"{digest}-{chosen}-{fmt}"', variant
+
+    async def response(self, request: Request, digest: str, width: Optional[int], fmt: Optional[str]) -> Response:
+        """Serve a variant, honouring If-None-Match and single byte ranges."""
+        if fmt is None:
+            fmt = "webp" if "image/webp" in request.headers.get("accept", "") else "png"
+        if fmt not in FORMATS:
+            return Response(status_code=400, content=f"Unsupported format: {fmt}")
+        found = self.variant(digest, width, fmt)
+        if found is None:
+            return Response(status_code=404, content="Unknown image")
+        etag, variant = found
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Accept-Ranges": "bytes", "Vary": "Accept"}
+
+        if none_match(request.headers.get("if-none-match", ""), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        path = self.directory / variant["file"]
+        size = variant["bytes"]
+        byte_range = request.headers.get("range")
+        # A range for a representation the client no longer has is answered in full
+        if byte_range and request.headers.get("if-range", etag) == etag:
+            bounds = parse_range(byte_range, size)
+            if bounds is None:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+            if bounds != (0, size - 1):
+                start, end = bounds
+                self.partial += 1
+                content = await anyio.to_thread.run_sync(read_range, path, start, end - start + 1)
+                return Response(
+                    content=content,
+                    status_code=206,
+                    media_type=FORMATS[fmt],
+                    headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"},
+                )
+
+        self.served += 1
+        # The server sends the file itself when it supports the pathsend extension
+        return FileResponse(path, media_type=FORMATS[fmt], headers=headers)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "images": len(self.manifest["images"]),
+            "served": self.served,
+            "not_modified": self.not_modified,
+            "partial": self.partial,
+        }
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive bounds of a single `bytes=` range, or None if it can't be satisfied."""
+    match = RANGE.match(header.strip())
+    if match is None or size == 0:
+        # Multiple ranges aren't worth it for images this size; send the whole file
+        return (0, size - 1) if size else None
+    first, last = match.groups()
+    if not first:
+        if not last or int(last) == 0:
+            return None
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+def read_range(path: Path, offset: int, length: int) -> bytes:
+    with open(path, 'rb') as f:
+        return os.pread(f.fileno(), length, offset)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=IMAGE_CACHE_DIR, help="Directory to write variants and the manifest to")
+    parser.add_argument("--widths", default=",".join(str(width) for width in IMAGE_WIDTHS),
+                        help="Comma-separated variant widths")
+    parser.add_argument("--quality", type=int, default=IMAGE_WEBP_QUALITY, help="WebP quality (0-100)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    widths = sorted(int(width) for width in args.widths.split(",") if width.strip())
+    manifest = build(args.out, widths, args.quality)
+    original = sum(path.stat().st_size for path in {path.resolve() for path in image_sources().values()})
+    variants = sum(
+        variant["bytes"] for record in manifest["images"].values()
+        for formats in record["variants"].values() for variant in formats.values()
+    )
+    print(f"{len(manifest['sources'])} references -> {len(manifest['images'])} distinct images "
+          f"({manifest['built']} rebuilt) in {time.perf_counter() - started:.1f}s")
+    print(f"Sources {original / 1024:.0f} KiB, all variants {variants / 1024:.0f} KiB")
+    for digest, record in manifest["images"].items():
+        widest = record["variants"][str(max(int(width) for width in record["variants"]))]
+        print(f"  {digest} {record['width']}x{record['height']}: "
+              f"png {widest['png']['bytes'] / 1024:.0f} KiB, webp {widest['webp']['bytes'] / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
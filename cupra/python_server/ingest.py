@@ -0,0 +1,311 @@
+"""
+Ingest the owner's manual into sharded, versioned metadata artifacts.
+
+Reads the manual's views (entry_*.json directories, or metadata.json files
+holding a list of views) and, optionally, its page text as JSON lines
+({"page": 321, "text": ...}), and processes them across a process pool:
+every view is split into feature records with their page references, and
+every page into passages for retrieval.
+
+    python ingest.py --pages manual_pages.jsonl --workers 8
+
+The output directory holds shard files named by their content and a
+manifest listing them, with the content hash of every view and page.
+Rebuilds are incremental: only views and pages whose content hash changed
+are processed again, only shards whose content changed are written, and
+the manifest is replaced last, so a reader never sees half a build.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from manual_index import ENTRIES_DIR, FeatureRecord, parse_features
+
+logger = logging.getLogger(__name__)
+
+# --- Ingestion Configuration ---
+MANUAL_DIR = os.environ.get("MANUAL_DIR", str(Path(__file__).parent / "state" / "manual"))
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+INGEST_SHARDS = int(os.environ.get("INGEST_SHARDS", "8"))
+# Longest passage, in words, a page is split into.
+PASSAGE_MAX_WORDS = int(os.environ.get("PASSAGE_MAX_WORDS", "80"))
+
+APP_ROOT = Path(__file__).parent.parent
+# Earlier sources win when two define a view with the same title
+DEFAULT_VIEW_SOURCES = [
+    ENTRIES_DIR,
+    APP_ROOT / "assets" / "metadata.json",
+    APP_ROOT / "lib" / "image_text_data" / "metadata.json",
+]
+MANIFEST_NAME = "manifest.json"
+# Bump when the records change shape or the parsing changes: every unit is processed again
+INGEST_VERSION = 1
+KINDS = ("views", "pages")
+# Shard files as this module names them; cleanup never touches anything else in the output directory
+SHARD_NAME = re.compile(rf"^(?:{'|'.join(KINDS)})-\d{{3}}-[0-9a-f]{{12}}\.json$")
+FEATURE_FIELDS = [field.name for field in fields(FeatureRecord)]
+
+
+def unit_hash(payload: Dict[str, Any]) -> str:
+    """Content hash of a view or page, including the ingestion version."""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f"{INGEST_VERSION}:{canonical}".encode("utf-8")).hexdigest()[:20]
+
+
+def read_views(sources: List[Path]) -> Tuple[Dict[str, Dict[str, Any]], int]:
+    """Views by title from directories of entry_*.json and view-list JSON files; and the duplicates skipped."""
+    views: Dict[str, Dict[str, Any]] = {}
+    duplicates = 0
+    for source in sources:
+        if source.is_dir():
+            found = []
+            for path in sorted(source.glob("entry_*.json")):
+                with open(path, 'r', encoding='utf-8') as f:
+                    found.append(json.load(f))
+        elif source.is_file():
+            with open(source, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            found = data.get('views', []) if isinstance(data, dict) else data
+        else:
+            logger.warning("View source %s not found", source)
+            continue
+        for view in found:
+            if not view.get("title") or not view.get("text"):
+                continue
+            if view["title"] in views:
+                duplicates += 1
+                continue
+            views[view["title"]] = {
+                "title": view["title"],
+                "text": view["text"],
+                "description": view.get("description"),
+                "image": view.get("image_path") or view.get("image"),
+            }
+    return views, duplicates
+
+
+def read_pages(sources: List[Path]) -> Dict[str, Dict[str, Any]]:
+    """Manual pages by page number from JSON lines files; a later line for the same page replaces it."""
+    pages: Dict[str, Dict[str, Any]] = {}
+    for source in sources:
+        with open(source, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    pages[str(item["page"])] = {"page": int(item["page"]), "text": item["text"], "title": item.get("title")}
+    return pages
+
+
+def process_view(view: Dict[str, Any]) -> Dict[str, Any]:
+    """A view with its feature records and the pages they refer to."""
+    # asdict() deep-copies every field, which dominates the cost on large manuals
+    features = [
+        {name: getattr(record, name) for name in FEATURE_FIELDS if getattr(record, name) is not None}
+        for record in parse_features(view["text"])
+    ]
+    return {
+        **view,
+        "features": features,
+        "pages": sorted({feature["page"] for feature in features if "page" in feature}),
+    }
+
+
+def split_passages(text: str, max_words: int = PASSAGE_MAX_WORDS) -> List[str]:
+    """Paragraphs of the text, with long ones cut at sentence ends into passages of at most max_words."""
+    passages = []
+    for paragraph in text.split("\n\n"):
+        current: List[str] = []
+        for word in paragraph.split():
+            current.append(word)
+            if len(current) >= max_words or (len(current) >= max_words // 2 and word.endswith((".", "!", "?"))):
+                passages.append(" ".join(current))
+                current = []
+        if current:
+            passages.append(" ".join(current))
+    return passages
+
+
+def process_page(page: Dict[str, Any]) -> Dict[str, Any]:
+    """A page with its text split into passages."""
+    return {"page": page["page"], "title": page.get("title"), "passages": split_passages(page["text"])}
+
+
+def process_unit(unit: Tuple[str, Dict[str, Any]]) -> Dict[str, Any]:
+    kind, payload = unit
+    return process_view(payload) if kind == "views" else process_page(payload)
+
+
+def shard_of(key: str, shards: int) -> int:
+    return int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:8], 16) % shards
+
+
+def load_manifest(directory: str = MANUAL_DIR) -> Optional[Dict[str, Any]]:
+    """The current build's manifest, or None if there is none of this ingestion version."""
+    path = Path(directory) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    return manifest if manifest.get("version") == INGEST_VERSION else None
+
+
+def load_records(directory: str = MANUAL_DIR, kind: str = "views",
+                 manifest: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Every record of one kind in the current build, in key order; empty if nothing was ingested."""
+    manifest = manifest or load_manifest(directory)
+    if manifest is None:
+        return []
+    records = []
+    for name in manifest["shards"][kind]:
+        with open(Path(directory) / name, 'r', encoding='utf-8') as f:
+            records.extend(json.load(f)["records"])
+    return sorted(records, key=lambda record: record["key"])
+
+
+def load_views(directory: str = MANUAL_DIR) -> List[Dict[str, Any]]:
+    """The ingested views, shaped like the cards in metadata.json."""
+    return [
+        {"title": record["title"], "text": record["text"], "description": record.get("description"),
+         "image": record.get("image")}
+        for record in load_records(directory, "views")
+    ]
+
+
+def load_page_passages(directory: str = MANUAL_DIR) -> List[Dict[str, Any]]:
+    """The ingested page passages as {"text", "page", "title"}, the shape retrieval.py takes."""
+    return [
+        {"text": text, "page": record["page"], "title": record.get("title")}
+        for record in load_records(directory, "pages") for text in record["passages"]
+    ]
+
+
+def write_json(path: Path, data: Any):
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    # json.dumps encodes in C; json.dump would go through the pure-Python iterative encoder
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    os.replace(tmp_path, path)
+
+
+def ingest(
+    view_sources: List[Path],
+    page_sources: List[Path],
+    out_dir: str = MANUAL_DIR,
+    workers: int = INGEST_WORKERS,
+    shards: int = INGEST_SHARDS,
+    force: bool = False,
+) -> Dict[str, Any]:
+    """Bring the artifacts in out_dir up to date with the sources; returns what the build did."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    views, duplicates = read_views(view_sources)
+    units = {"views": views, "pages": read_pages(page_sources)}
+
+    previous = None if force else load_manifest(out_dir)
+    # Earlier records are only reused from a build with the same sharding
+    if previous is not None and previous.get("shard_count") != shards:
+        previous = None
+    reused: Dict[str, Dict[str, Dict[str, Any]]] = {kind: {} for kind in KINDS}
+    if previous is not None:
+        for kind in KINDS:
+            for record in load_records(out_dir, kind, previous):
+                if units[kind].get(record["key"]) is not None and record["hash"] == unit_hash(units[kind][record["key"]]):
+                    reused[kind][record["key"]] = record
+
+    stale = [
+        (kind, key, payload) for kind in KINDS for key, payload in sorted(units[kind].items())
+        if key not in reused[kind]
+    ]
+    processed: List[Dict[str, Any]] = []
+    if workers > 1 and len(stale) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(stale) // (workers * 4))
+            processed = list(pool.map(process_unit, [(kind, payload) for kind, _, payload in stale], chunksize=chunksize))
+    else:
+        processed = [process_unit((kind, payload)) for kind, _, payload in stale]
+    for (kind, key, payload), record in zip(stale, processed):
+        reused[kind][key] = {"key": key, "hash": unit_hash(payload), **record}
+
+    manifest = {
+        "version": INGEST_VERSION,
+        "generation": (previous or {}).get("generation", 0) + 1,
+        "built_at": time.time(),
+        "shard_count": shards,
+        "shards": {},
+        "hashes": {},
+    }
+    written = 0
+    for kind in KINDS:
+        by_shard: List[List[Dict[str, Any]]] = [[] for _ in range(shards)]
+        for key in sorted(reused[kind]):
+            by_shard[shard_of(key, shards)].append(reused[kind][key])
+        manifest["shards"][kind] = []
+        for number, records in enumerate(by_shard):
+            if not records:
+                continue
+            digest = hashlib.sha256("".join(record["hash"] for record in records).encode("utf-8")).hexdigest()[:12]
+            name = f"{kind}-{number:03d}-{digest}.json"
+            # Named by content, so an existing file is already up to date
+            if not (out / name).exists():
+                write_json(out / name, {"version": INGEST_VERSION, "kind": kind, "shard": number, "records": records})
+                written += 1
+            manifest["shards"][kind].append(name)
+        manifest["hashes"][kind] = {key: record["hash"] for key, record in sorted(reused[kind].items())}
+    write_json(out / MANIFEST_NAME, manifest)
+
+    # Shards the new manifest no longer lists
+    referenced = {name for names in manifest["shards"].values() for name in names}
+    removed_shards = 0
+    for path in out.glob("*.json"):
+        if SHARD_NAME.match(path.name) and path.name not in referenced:
+            path.unlink()
+            removed_shards += 1
+
+    previous_hashes = (previous or {}).get("hashes", {})
+    return {
+        "generation": manifest["generation"],
+        "views": len(units["views"]),
+        "pages": len(units["pages"]),
+        "duplicate_views": duplicates,
+        "processed": len(stale),
+        "reused": sum(len(units[kind]) for kind in KINDS) - len(stale),
+        "removed": sum(len(set(previous_hashes.get(kind, {})) - set(units[kind])) for kind in KINDS),
+        "features": sum(len(record["features"]) for record in reused["views"].values()),
+        "passages": sum(len(record["passages"]) for record in reused["pages"].values()),
+        "shards_written": written,
+        "shards_removed": removed_shards,
+        "workers": workers if workers > 1 and len(stale) > 1 else 1,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--views", action="append", type=Path,
+                        help="Directory of entry_*.json or JSON file of views (default: the app's own)")
+    parser.add_argument("--pages", action="append", type=Path, default=[], help="Manual pages as JSON lines")
+    parser.add_argument("--out", default=MANUAL_DIR, help="Directory to write the shards and manifest to")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Processes to ingest with")
+    parser.add_argument("--shards", type=int, default=INGEST_SHARDS, help="Shards per kind of record")
+    parser.add_argument("--force", action="store_true", help="Process every view and page again")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    result = ingest(args.views or DEFAULT_VIEW_SOURCES, args.pages, args.out, args.workers, args.shards, args.force)
+    print(f"Generation {result['generation']}: {result['views']} views, {result['pages']} pages "
+          f"({result['duplicate_views']} duplicate views skipped) in {time.perf_counter() - started:.2f}s")
+    print(f"Processed {result['processed']} with {result['workers']} worker(s), reused {result['reused']}, "
+          f"removed {result['removed']}")
+    print(f"{result['features']} features, {result['passages']} passages; "
+          f"{result['shards_written']} shards written, {result['shards_removed']} removed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from matcher import normalize
+
+logger = logging.getLogger(__name__)
+
+# --- Judgement Cache Configuration ---
+JUDGEMENT_CACHE_SIZE = int(os.environ.get("JUDGEMENT_CACHE_SIZE", "10000"))
+JUDGEMENT_CACHE_TTL = float(os.environ.get("JUDGEMENT_CACHE_TTL", str(24 * 3600)))
+# SQLite file backing the cache across restarts; empty keeps the cache in memory only.
+JUDGEMENT_CACHE_PATH = os.environ.get("JUDGEMENT_CACHE_PATH", str(Path(__file__).parent / "state" / "judgements.sqlite3"))
+
+JudgementKey = Tuple[str, str, str, int]
+
+
+def judgement_key(backend: str, target_text: str, guess: str, clue_depth: int) -> JudgementKey:
+    """
+    Cache key for a verdict: the backend that gave it, the card target, the normalized guess
+    and how many clues were given.
+
+    Keying by backend keeps a fake or replayed verdict from being served by a real model's server
+    sharing the same database.
+    """
+    return (backend, target_text, normalize(guess), clue_depth)
+
+
+class JudgementCache:
+    """
+    Bounded LRU cache of parsed model verdicts with a TTL.
+
+    Values are the {"status", "clue", "reasoning"} dicts returned by the
+    judge. With a path, entries are written through to SQLite and misses
+    fall back to it, so a warm cache survives restarts.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = JUDGEMENT_CACHE_SIZE,
+        ttl: float = JUDGEMENT_CACHE_TTL,
+        path: Optional[str] = JUDGEMENT_CACHE_PATH,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[JudgementKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path:
+            self._open_db(Path(path))
+
+    def _open_db(self, path: Path):
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS judgements (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM judgements WHERE expires_at < ?", (time.time(),))
+        except Exception as e:
+            logger.error("Error opening judgement cache database: %s", e)
+            self._db = None
+
+    @staticmethod
+    def _db_key(key: JudgementKey) -> str:
+        return json.dumps(key, ensure_ascii=False)
+
+    def get(self, key: JudgementKey) -> Optional[Dict[str, Any]]:
+        """Return the cached verdict for the key, or None on a miss or expiry."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[1])
+            if entry:
+                del self._entries[key]
+
+        stored = self._db_get(key, now)
+        with self._lock:
+            if stored is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        value, expires_at = stored
+        self._remember(key, value, expires_at)
+        return dict(value)
+
+    def put(self, key: JudgementKey, value: Dict[str, Any]):
+        """Cache a verdict."""
+        expires_at = time.time() + self.ttl
+        value = {"status": value.get("status"), "clue": value.get("clue"), "reasoning": value.get("reasoning")}
+        self._remember(key, value, expires_at)
+        if self._db:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO judgements (key, value, expires_at) VALUES (?, ?, ?)",
+                    (self._db_key(key), json.dumps(value, ensure_ascii=False), expires_at),
+                )
+            except Exception as e:
+                logger.error("Error writing judgement cache: %s", e)
+
+    def _remember(self, key: JudgementKey, value: Dict[str, Any], expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _db_get(self, key: JudgementKey, now: float) -> Optional[Tuple[Dict[str, Any], float]]:
+        if not self._db:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM judgements WHERE key = ? AND expires_at > ?", (self._db_key(key), now)
+            ).fetchone()
+        except Exception as e:
+            logger.error("Error reading judgement cache: %s", e)
+            return None
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,268 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import AsyncIterator, Awaitable, List, Optional, Type, TypeVar
+
+from pydantic import BaseModel
+from starlette.requests import Request
+
+from admission import AdmissionController, admission_client
+from backends import LLMBackend, LLMResponse
+from metrics import LLM_CALL_SECONDS, LLM_PROMPT_TOKENS, LLM_RESPONSE_TOKENS
+from prompts import estimate_tokens, token_usage
+from schemas import StructuredOutputError, parse_stats, parse_structured, repair_prompt
+from resilience import Resilience, is_transient
+from single_flight import LLM_SINGLE_FLIGHT, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# --- LLM Call Configuration ---
+# Maximum number of model calls in flight at once across the whole worker.
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))
+# Deadline in seconds for a single model call, including time spent queued, retries and hedges.
+LLM_CALL_TIMEOUT = float(os.environ.get("LLM_CALL_TIMEOUT", "20"))
+# How often to check whether the client that triggered a call has gone away.
+DISCONNECT_POLL_INTERVAL = 0.25
+# Re-prompts allowed when a structured response doesn't validate against its schema.
+STRUCTURED_OUTPUT_MAX_REPAIRS = int(os.environ.get("STRUCTURED_OUTPUT_MAX_REPAIRS", "1"))
+
+llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+admission = AdmissionController()
+single_flight = SingleFlight()
+resilience = Resilience()
+
+T = TypeVar("T")
+M = TypeVar("M", bound=BaseModel)
+
+
+class LLMTimeoutError(Exception):
+    """Raised when a model call does not finish before its deadline."""
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the client disconnects while its model call is in flight."""
+
+
+async def _admit(timeout: float) -> float:
+    """Wait for upstream quota for the current client; returns the part of the deadline left."""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await asyncio.wait_for(admission.acquire(admission_client.get()), timeout)
+    return timeout - (loop.time() - started)
+
+
+async def await_unless_disconnected(awaitable: Awaitable[T], request: Optional[Request] = None) -> T:
+    """
+    Await the result, cancelling it and raising ClientDisconnectedError if the request's client goes away.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        if request is None:
+            return await task
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnectedError("Client disconnected before the model answered")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def prompt_key(backend: LLMBackend, prompt: str, schema: Optional[Type[BaseModel]] = None) -> str:
+    """Fingerprint of a model call, used to coalesce identical calls."""
+    schema_name = schema.__name__ if schema else ""
+    return hashlib.sha256(f"{backend.name}\0{schema_name}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+async def generate_content(
+    backend: LLMBackend,
+    prompt: str,
+    request: Optional[Request] = None,
+    timeout: float = LLM_CALL_TIMEOUT,
+    template: Optional[str] = None,
+    schema: Optional[Type[BaseModel]] = None,
+    coalesce: bool = True,
+) -> LLMResponse:
+    """
+    Run a model call under admission control, the concurrency limit and a deadline.
+
+    Identical prompts already in flight share that call rather than starting another,
+    unless `coalesce` is False because the caller wants an answer of its own.
+    Raises AdmissionRejected at once if the upstream quota can't take the call soon.
+    If a request is given, its wait is abandoned as soon as its client disconnects.
+    Token usage is recorded against the template name, if given, once per upstream call.
+    """
+    async def call() -> LLMResponse:
+        remaining = await _admit(timeout)
+        attempts = 0
+
+        def attempt() -> Awaitable[LLMResponse]:
+            nonlocal attempts
+            attempts += 1
+            if attempts > 1:
+                # Retries and hedges spend upstream quota too
+                admission.charge()
+            return backend.generate(prompt, schema)
+
+        return await resilience.call(attempt, remaining, limiter=llm_semaphore)
+
+    started_at = time.perf_counter()
+    outcome = "cancelled"
+    try:
+        if LLM_SINGLE_FLIGHT and coalesce:
+            response, started = await await_unless_disconnected(
+                single_flight.do(prompt_key(backend, prompt, schema), call), request
+            )
+        else:
+            response, started = await await_unless_disconnected(call(), request), True
+        outcome = "ok"
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        raise LLMTimeoutError(f"Model call exceeded its {timeout}s deadline")
+    except ClientDisconnectedError:
+        outcome = "disconnected"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        LLM_CALL_SECONDS.labels(template or "untemplated", outcome).observe(time.perf_counter() - started_at)
+
+    if template and started:
+        _record_usage(
+            template,
+            response.input_tokens or estimate_tokens(prompt),
+            response.output_tokens or estimate_tokens(response.text),
+        )
+    return response
+
+
+def _record_usage(template: str, input_tokens: int, output_tokens: int):
+    token_usage.record(template, input_tokens, output_tokens)
+    LLM_PROMPT_TOKENS.labels(template).observe(input_tokens)
+    LLM_RESPONSE_TOKENS.labels(template).observe(output_tokens)
+
+
+async def generate_structured(
+    backend: LLMBackend,
+    prompt: str,
+    schema: Type[M],
+    request: Optional[Request] = None,
+    timeout: float = LLM_CALL_TIMEOUT,
+    template: Optional[str] = None,
+    max_repairs: int = STRUCTURED_OUTPUT_MAX_REPAIRS,
+    coalesce: bool = True,
+) -> M:
+    """
+    Run a schema-constrained model call and validate its response.
+
+    A response that doesn't validate is sent back with the validation errors,
+    at most `max_repairs` times, before StructuredOutputError is raised.
+    """
+    attempt_prompt = prompt
+    for repair in range(max_repairs + 1):
+        response = await generate_content(
+            backend, attempt_prompt, request=request, timeout=timeout, template=template, schema=schema,
+            coalesce=coalesce,
+        )
+        try:
+            result = parse_structured(schema, response.text)
+        except StructuredOutputError as e:
+            if repair == max_repairs:
+                raise
+            logger.warning("Invalid %s response, asking for a repair: %s", schema.__name__, e)
+            attempt_prompt = repair_prompt(prompt, schema, e)
+            continue
+        if repair:
+            parse_stats.record(schema.__name__, "repaired")
+        return result
+
+
+async def stream_content(
+    backend: LLMBackend,
+    prompt: str,
+    timeout: float = LLM_CALL_TIMEOUT,
+    template: Optional[str] = None,
+    schema: Optional[Type[BaseModel]] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream a model call under the concurrency limit and a deadline for the whole stream.
+
+    Transient failures are retried only until the first chunk has been yielded.
+    The caller cancels the call by closing the iterator, e.g. when its client disconnects.
+    """
+    started_at = time.perf_counter()
+    outcome = "cancelled"
+    chunks: List[str] = []
+    try:
+        async for chunk in _stream_with_retries(backend, prompt, timeout, schema):
+            chunks.append(chunk)
+            yield chunk
+        outcome = "ok"
+    except LLMTimeoutError:
+        outcome = "timeout"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        LLM_CALL_SECONDS.labels(template or "untemplated", outcome).observe(time.perf_counter() - started_at)
+
+    if template:
+        _record_usage(template, estimate_tokens(prompt), estimate_tokens("".join(chunks)))
+
+
+async def _stream_with_retries(
+    backend: LLMBackend, prompt: str, timeout: float, schema: Optional[Type[BaseModel]]
+) -> AsyncIterator[str]:
+    resilience.breaker.before_call()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        await _admit(timeout)
+    except asyncio.TimeoutError:
+        raise LLMTimeoutError(f"Model call exceeded its {timeout}s deadline")
+    chunks: List[str] = []
+    retry = 0
+    while True:
+        if retry:
+            admission.charge()
+        try:
+            await asyncio.wait_for(llm_semaphore.acquire(), max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            # Still queued locally, which says nothing about the upstream's health
+            raise LLMTimeoutError(f"Model call exceeded its {timeout}s deadline")
+        try:
+            stream = backend.generate_stream(prompt, schema)
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), max(0.0, deadline - loop.time()))
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        raise LLMTimeoutError(f"Model call exceeded its {timeout}s deadline")
+                    chunks.append(chunk)
+                    yield chunk
+            finally:
+                llm_semaphore.release()
+                await stream.aclose()
+        except Exception as e:
+            transient = isinstance(e, LLMTimeoutError) or is_transient(e)
+            if transient:
+                resilience.breaker.record_failure()
+            delay = resilience.backoff(retry)
+            if (chunks or not transient or retry >= resilience.max_retries
+                    or loop.time() + delay >= deadline or resilience.breaker.is_open):
+                raise
+            retry += 1
+            resilience.retries += 1
+            logger.warning("Model stream failed before its first chunk (%s: %s), retry %d in %.2fs", type(e).__name__, e, retry, delay)
+            await asyncio.sleep(delay)
+            continue
+        resilience.breaker.record_success()
+        break
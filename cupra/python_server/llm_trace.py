@@ -0,0 +1,221 @@
+"""
+Record and replay of model traffic, for reproducing production performance offline.
+
+With LLM_TRACE_RECORD=1 the server appends to an append-only JSON lines
+trace (LLM_TRACE_PATH): one "llm" line per model call, with the prompt's
+fingerprint, the response text and the observed latency, and one "req" line
+per /start_game and /guess request, with its body and the outcome the
+player saw. Prompts themselves are not stored, only their fingerprints.
+
+With LLM_BACKEND=replay the server answers model calls from such a trace
+instead: a recorded prompt gets its recorded response after its recorded
+latency. A prompt the new build words differently falls back to a recording
+for the same template, target and guess; anything else fails like an
+unavailable backend. `python replay.py` re-runs the recorded requests
+against a build in this mode.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Type
+
+from pydantic import BaseModel
+
+from backends import LLMBackend, LLMBackendError, LLMResponse, quoted_after
+
+logger = logging.getLogger(__name__)
+
+# --- Trace Configuration ---
+LLM_TRACE_PATH = os.environ.get("LLM_TRACE_PATH", str(Path(__file__).parent / "state" / "llm_trace.jsonl"))
+LLM_TRACE_RECORD = os.environ.get("LLM_TRACE_RECORD", "0") == "1"
+# Replayed latencies are multiplied by this; 0 answers at once.
+LLM_TRACE_LATENCY_SCALE = float(os.environ.get("LLM_TRACE_LATENCY_SCALE", "1"))
+REPLAY_CHUNK_CHARS = 16
+# Enough of a prompt to tell its template apart
+TEMPLATE_PREFIX_CHARS = 160
+
+
+def fingerprint(prompt: str, schema: Optional[Type[BaseModel]] = None) -> str:
+    """Identifies a model call by its exact prompt and schema."""
+    schema_name = schema.__name__ if schema else ""
+    return hashlib.sha256(f"{schema_name}\0{prompt}".encode("utf-8")).hexdigest()[:24]
+
+
+def loose_fingerprint(prompt: str, schema: Optional[Type[BaseModel]] = None) -> str:
+    """Identifies a model call by template, target and guess, so it survives changes to the rest of the prompt."""
+    schema_name = schema.__name__ if schema else ""
+    target = quoted_after(prompt, "The target text is:") or ""
+    guess = quoted_after(prompt, "The user's latest guess is:") or ""
+    key = f"{schema_name}\0{prompt.lstrip()[:TEMPLATE_PREFIX_CHARS]}\0{target}\0{guess}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+
+
+class TraceWriter:
+    """
+    Appends trace lines to the file from a background thread, so recording never blocks the event loop.
+
+    Lines are queued as they are recorded and written in order; the file is
+    flushed whenever the queue runs dry, so a crash loses at most the lines
+    still queued.
+    """
+
+    def __init__(self, path: str = LLM_TRACE_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+        self._queue: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write, name="trace-writer", daemon=True)
+        self._thread.start()
+        self.lines = 0
+
+    def append(self, entry: Dict[str, Any]):
+        self._queue.put(entry)
+        self.lines += 1
+
+    def _write(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            try:
+                self._file.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+                if self._queue.empty():
+                    self._file.flush()
+            except Exception as e:
+                logger.error("Error writing trace line: %s", e)
+        self._file.flush()
+
+    def llm_call(self, prompt: str, schema: Optional[Type[BaseModel]], response: LLMResponse, latency: float):
+        self.append({
+            "k": "llm",
+            "ts": round(time.time(), 3),
+            "fp": fingerprint(prompt, schema),
+            "lfp": loose_fingerprint(prompt, schema),
+            "ms": round(latency * 1000, 1),
+            "text": response.text,
+            "in": response.input_tokens,
+            "out": response.output_tokens,
+        })
+
+    def request(self, path: str, body: Dict[str, Any], status: int, result: Optional[Dict[str, Any]],
+                latency: float, **extra):
+        self.append({
+            "k": "req",
+            "ts": round(time.time(), 3),
+            "path": path,
+            "body": body,
+            "status": status,
+            "ms": round(latency * 1000, 1),
+            "result": result,
+            **extra,
+        })
+
+    def close(self):
+        """Write the lines still queued, then close the file."""
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+
+class RecordingBackend(LLMBackend):
+    """Passes calls through to another backend and appends each one to the trace."""
+
+    def __init__(self, backend: LLMBackend, writer: TraceWriter):
+        self.backend = backend
+        self.writer = writer
+        # Same name as the wrapped backend, so coalescing keys don't change when recording
+        self.name = backend.name
+
+    async def generate(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> LLMResponse:
+        started = time.perf_counter()
+        response = await self.backend.generate(prompt, schema)
+        self.writer.llm_call(prompt, schema, response, time.perf_counter() - started)
+        return response
+
+    async def generate_stream(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        chunks: List[str] = []
+        async for chunk in self.backend.generate_stream(prompt, schema):
+            chunks.append(chunk)
+            yield chunk
+        # Only complete streams are recorded; an abandoned one has no response to replay
+        self.writer.llm_call(prompt, schema, LLMResponse(text="".join(chunks)), time.perf_counter() - started)
+
+    async def warm_up(self):
+        await self.backend.warm_up()
+
+
+def read_trace(path: str = LLM_TRACE_PATH) -> List[Dict[str, Any]]:
+    """Every line of a trace, skipping a torn last line."""
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning("Skipping unreadable trace line in %s", path)
+    return entries
+
+
+class ReplayBackend(LLMBackend):
+    """Answers model calls with the responses and latencies recorded in a trace."""
+
+    name = "replay"
+
+    def __init__(self, path: str = LLM_TRACE_PATH, latency_scale: float = LLM_TRACE_LATENCY_SCALE):
+        self.latency_scale = latency_scale
+        self._exact: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._loose: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for entry in read_trace(path):
+            if entry.get("k") == "llm":
+                self._exact[entry["fp"]].append(entry)
+                self._loose[entry["lfp"]].append(entry)
+        # Repeated prompts get their recordings in turn
+        self._served: Dict[str, int] = defaultdict(int)
+        self.exact = 0
+        self.loose = 0
+        self.misses = 0
+
+    def _recording(self, prompt: str, schema: Optional[Type[BaseModel]]) -> Dict[str, Any]:
+        for key, recordings in (
+            (fingerprint(prompt, schema), self._exact),
+            (loose_fingerprint(prompt, schema), self._loose),
+        ):
+            if recordings.get(key):
+                if recordings is self._exact:
+                    self.exact += 1
+                else:
+                    self.loose += 1
+                turn = self._served[key]
+                self._served[key] += 1
+                return recordings[key][turn % len(recordings[key])]
+        self.misses += 1
+        raise LLMBackendError("No recorded response for this prompt")
+
+    async def generate(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> LLMResponse:
+        recording = self._recording(prompt, schema)
+        await asyncio.sleep(recording["ms"] * self.latency_scale / 1000)
+        return LLMResponse(text=recording["text"], input_tokens=recording.get("in"), output_tokens=recording.get("out"))
+
+    async def generate_stream(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> AsyncIterator[str]:
+        recording = self._recording(prompt, schema)
+        text = recording["text"]
+        chunks = [text[i:i + REPLAY_CHUNK_CHARS] for i in range(0, len(text), REPLAY_CHUNK_CHARS)] or [""]
+        for chunk in chunks:
+            await asyncio.sleep(recording["ms"] * self.latency_scale / 1000 / len(chunks))
+            yield chunk
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "recorded_prompts": len(self._exact),
+            "exact": self.exact,
+            "loose": self.loose,
+            "misses": self.misses,
+        }
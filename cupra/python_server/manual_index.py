@@ -0,0 +1,211 @@
+"""
+Structured index over the owner's manual card data.
+
+Card texts pack many features into one string, e.g.
+"1 Front radar 2 Park assist sensor A Levels control Brake fluid ››› page 321 Battery ››› page 323".
+The index parses every text once into FeatureRecords (number or section
+letter, name and page) and keeps hash maps and a trigram index over card
+titles, so lookups don't rescan or re-split the raw metadata.
+
+Run it directly to build the index offline and inspect or save the parsed records:
+
+    python manual_index.py --out state/manual_index.json
+"""
+import argparse
+import json
+import logging
+import re
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+PAGE_REF = re.compile(r"›››\s*page\s*(\d+)")
+SECTION_LETTER = re.compile(r"^[A-Z]$")
+NUMBER = re.compile(r"^\d+$")
+
+ENTRIES_DIR = Path(__file__).parent.parent / "lib" / "image_text_data" / "metadata"
+
+
+@dataclass(slots=True)
+class FeatureRecord:
+    """One feature of a card: a numbered callout or an item in a lettered section."""
+    name: str
+    number: Optional[str] = None
+    section: Optional[str] = None
+    section_title: Optional[str] = None
+    page: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        """
+        The feature in the card text's own format, e.g. "Battery ››› page 323".
+
+        Section items keep their section title, e.g. "Levels control: Brake fluid ››› page 321",
+        since the item name alone can be ambiguous.
+        """
+        name = self.name
+        if self.section_title and self.section_title != self.name:
+            name = f"{self.section_title}: {self.name}"
+        return f"{name} ››› page {self.page}" if self.page is not None else name
+
+
+def _split_section_title(words: List[str]) -> tuple:
+    """
+    Split "Levels control Brake fluid" into the section title and its first item.
+
+    The item starts at the last capitalized word; if there is none the whole
+    run is both the title and the item.
+    """
+    for i in range(len(words) - 1, 0, -1):
+        if words[i][:1].isupper() and not words[i - 1][:1].isupper():
+            return " ".join(words[:i]), " ".join(words[i:])
+    joined = " ".join(words)
+    return joined, joined
+
+
+def parse_features(text: str) -> List[FeatureRecord]:
+    """Parse a card text into its feature records."""
+    # Collapse page references into single tokens so their numbers aren't read as callouts
+    words = PAGE_REF.sub(lambda m: f" \x00{m.group(1)} ", text).split()
+
+    records: List[FeatureRecord] = []
+    buffer: List[str] = []
+    number: Optional[str] = None
+    section: Optional[str] = None
+    section_title: Optional[str] = None
+    next_number = 1
+    next_letter = "A"
+
+    def flush(page: Optional[int] = None):
+        nonlocal buffer, section_title
+        if not buffer:
+            return
+        if section is not None:
+            if section_title is None:
+                section_title, name = _split_section_title(buffer)
+            else:
+                name = " ".join(buffer)
+            records.append(FeatureRecord(name=name, section=section, section_title=section_title, page=page))
+        else:
+            # Texts may leave the first callout unlabeled, so it defaults to "1"
+            records.append(FeatureRecord(name=" ".join(buffer), number=number or "1", page=page))
+        buffer = []
+
+    for word in words:
+        if word.startswith("\x00"):
+            flush(int(word[1:]))
+        elif section is None and NUMBER.match(word) and next_number <= int(word) <= next_number + 1:
+            flush()
+            number = word
+            next_number = int(word) + 1
+        elif SECTION_LETTER.match(word) and word == next_letter:
+            flush()
+            section, section_title = word, None
+            next_letter = chr(ord(word) + 1)
+        else:
+            buffer.append(word)
+    flush()
+    return records
+
+
+def _trigrams(text: str) -> Set[str]:
+    text = f"  {text.casefold()} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ManualIndex:
+    """Hash maps over card titles, a trigram index for substring lookups and parsed features per text."""
+
+    def __init__(self, cards: Iterable[dict]):
+        self.cards: List[dict] = list(cards)
+        self._by_title: Dict[str, dict] = {}
+        self._by_folded_title: Dict[str, dict] = {}
+        self._title_trigrams: Dict[str, Set[int]] = defaultdict(set)
+        self._features: Dict[str, List[FeatureRecord]] = {}
+        for position, card in enumerate(self.cards):
+            title = card.get("title", "")
+            self._by_title.setdefault(title, card)
+            self._by_folded_title.setdefault(title.casefold(), card)
+            for gram in _trigrams(title):
+                self._title_trigrams[gram].add(position)
+            if card.get("text"):
+                self.features(card["text"])
+
+    def card_by_title(self, title: str) -> Optional[dict]:
+        """Exact, then case-insensitive, then substring match, like the original linear scans."""
+        card = self._by_title.get(title)
+        if card is not None:
+            return card
+        folded = title.casefold()
+        card = self._by_folded_title.get(folded)
+        if card is not None:
+            return card
+
+        # Only cards sharing every trigram of the query can contain it as a substring
+        grams = [self._title_trigrams.get(gram, set()) for gram in _trigrams(folded) if gram.strip()]
+        if grams:
+            candidates = sorted(set.intersection(*grams))
+        else:
+            candidates = range(len(self.cards))
+        for position in candidates:
+            if folded in self.cards[position].get("title", "").casefold():
+                return self.cards[position]
+        return None
+
+    def features(self, text: str) -> List[FeatureRecord]:
+        """Parsed features of a card text, parsed once and memoized."""
+        records = self._features.get(text)
+        if records is None:
+            records = parse_features(text)
+            self._features[text] = records
+        return records
+
+    def all_features(self) -> List[FeatureRecord]:
+        """Every distinct feature across the indexed texts."""
+        seen = set()
+        unique = []
+        for records in self._features.values():
+            for record in records:
+                key = (record.name, record.page)
+                if key not in seen:
+                    seen.add(key)
+                    unique.append(record)
+        return unique
+
+
+def load_entries(entries_dir: Path = ENTRIES_DIR) -> List[dict]:
+    """The per-view entry_*.json files."""
+    entries = []
+    for path in sorted(entries_dir.glob("entry_*.json")):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries.append(json.load(f))
+        except Exception as e:
+            logger.error("Error loading manual entry %s: %s", path, e)
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", help="Write the parsed records to this JSON file")
+    args = parser.parse_args()
+
+    index = ManualIndex(load_entries())
+    output = {
+        card["title"]: [asdict(record) for record in index.features(card["text"])]
+        for card in index.cards if card.get("text")
+    }
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+        print(f"Wrote {sum(len(records) for records in output.values())} features to {args.out}")
+    else:
+        print(json.dumps(output, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import os
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+# --- Matcher Configuration ---
+# Token-level recall and precision a guess needs to be accepted as correct locally.
+MATCH_CORRECT_RECALL = float(os.environ.get("MATCH_CORRECT_RECALL", "0.9"))
+MATCH_CORRECT_PRECISION = float(os.environ.get("MATCH_CORRECT_PRECISION", "0.75"))
+# Whole-string similarity that is accepted as correct on its own (typos, spacing).
+MATCH_CORRECT_SIMILARITY = float(os.environ.get("MATCH_CORRECT_SIMILARITY", "0.92"))
+# A guess sharing no tokens with the target and below this similarity is rejected locally.
+MATCH_WRONG_SIMILARITY = float(os.environ.get("MATCH_WRONG_SIMILARITY", "0.35"))
+# Looser bars used to settle ambiguous guesses when the model is unavailable.
+MATCH_FALLBACK_RECALL = float(os.environ.get("MATCH_FALLBACK_RECALL", "0.6"))
+MATCH_FALLBACK_SIMILARITY = float(os.environ.get("MATCH_FALLBACK_SIMILARITY", "0.8"))
+# Similarity at which two single tokens count as the same word.
+MATCH_TOKEN_SIMILARITY = 0.85
+
+STOPWORDS = {
+    "a", "an", "the", "of", "and", "or", "for", "to", "in", "on", "with", "at", "by",
+    "is", "it", "its", "this", "that", "my", "your", "page",
+}
+
+# Spellings and abbreviations mapped to one canonical token.
+SYNONYMS = {
+    "cam": "camera",
+    "cams": "camera",
+    "airbags": "airbag",
+    "pdc": "parking",
+    "park": "parking",
+    "parktronic": "parking",
+    "sensor": "sensors",
+    "radars": "radar",
+    "seatbelt": "belt",
+    "seatbelts": "belt",
+    "belts": "belt",
+    "disabled": "off",
+    "deactivated": "off",
+    "disconnecting": "off",
+    "disconnected": "off",
+    "trunk": "boot",
+    "tailgate": "boot",
+    "hood": "front compartment",
+    "bonnet": "front compartment",
+    "display": "screen",
+    "touchscreen": "screen",
+    "infotainment": "screen",
+    "tow": "towing",
+    "tyre": "tire",
+    "flat": "puncture",
+}
+
+CORRECT = "correct"
+INCORRECT = "incorrect"
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents, page references and punctuation, collapse whitespace."""
+    text = text.split("›››")[0]
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^a-z0-9]+", " ", text.lower())
+    return " ".join(text.split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Content tokens of normalized text, with synonyms mapped to a canonical form."""
+    tokens = []
+    for word in normalize(text).split():
+        if word in STOPWORDS:
+            continue
+        tokens.extend(SYNONYMS.get(word, word).split())
+    return tokens
+
+
+def _tokens_match(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    if len(a) < 4 or len(b) < 4:
+        return False
+    return SequenceMatcher(None, a, b).ratio() >= MATCH_TOKEN_SIMILARITY
+
+
+class GuessMatcher:
+    """
+    Settles obvious guesses locally so only ambiguous ones reach the model.
+
+    `judge` returns "correct", "incorrect" or None when the guess falls in
+    the ambiguous band and needs the model's judgement.
+    """
+
+    def __init__(self):
+        self.counts = {CORRECT: 0, INCORRECT: 0, "ambiguous": 0}
+        self.fallbacks = 0
+
+    def score(self, guess: str, target: str) -> Dict[str, float]:
+        """Token recall/precision and whole-string similarity of a guess against the target."""
+        guess_tokens = set(tokenize(guess))
+        target_tokens = set(tokenize(target))
+        matched_target = {t for t in target_tokens if any(_tokens_match(t, g) for g in guess_tokens)}
+        matched_guess = {g for g in guess_tokens if any(_tokens_match(g, t) for t in target_tokens)}
+        return {
+            "recall": len(matched_target) / len(target_tokens) if target_tokens else 0.0,
+            "precision": len(matched_guess) / len(guess_tokens) if guess_tokens else 0.0,
+            "matched": float(len(matched_target)),
+            "similarity": SequenceMatcher(None, normalize(guess), normalize(target)).ratio(),
+        }
+
+    def judge(self, guess: str, target: str) -> Optional[str]:
+        """Return a confident verdict for the guess, or None if it is ambiguous."""
+        verdict = self._verdict(guess, target)
+        self.counts[verdict or "ambiguous"] += 1
+        return verdict
+
+    def fallback(self, guess: str, target: str) -> str:
+        """Always-decisive verdict for when the model can't judge an ambiguous guess."""
+        self.fallbacks += 1
+        verdict = self._verdict(guess, target)
+        if verdict is not None:
+            return verdict
+        score = self.score(guess, target)
+        if score["similarity"] >= MATCH_FALLBACK_SIMILARITY:
+            return CORRECT
+        if score["recall"] >= MATCH_FALLBACK_RECALL and score["precision"] >= MATCH_FALLBACK_RECALL:
+            return CORRECT
+        return INCORRECT
+
+    def _verdict(self, guess: str, target: str) -> Optional[str]:
+        normalized_guess = normalize(guess)
+        if not normalized_guess:
+            return INCORRECT
+        if normalized_guess == normalize(target):
+            return CORRECT
+
+        score = self.score(guess, target)
+        if score["similarity"] >= MATCH_CORRECT_SIMILARITY:
+            return CORRECT
+        if score["recall"] >= MATCH_CORRECT_RECALL and score["precision"] >= MATCH_CORRECT_PRECISION:
+            return CORRECT
+        if score["matched"] == 0 and score["similarity"] < MATCH_WRONG_SIMILARITY:
+            return INCORRECT
+        return None
+
+    def stats(self) -> Dict[str, float]:
+        total = sum(self.counts.values())
+        local = self.counts[CORRECT] + self.counts[INCORRECT]
+        return {
+            **self.counts,
+            "total": total,
+            "fallbacks": self.fallbacks,
+            "local_hit_rate": round(local / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,72 @@
+"""
+Prometheus metrics for the game server, served as text on /metrics.
+
+Histograms cover each stage a guess passes through (request, model call,
+prompt and response size, JSON parse, game store), and counters track
+game outcomes.
+
+Each worker process keeps its own metrics, so with several workers (e.g.
+GAME_STORE=sqlite behind `uvicorn --workers N`) set PROMETHEUS_MULTIPROC_DIR
+to an empty directory, cleared before every start: the workers then write
+their metrics there and every scrape adds up all of them. Without it a
+scrape only shows the worker that happened to answer it.
+"""
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# --- Metrics Configuration ---
+# Directory the worker processes share their metrics through; read by prometheus_client itself too.
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+REQUEST_SECONDS = Histogram(
+    "cupra_request_duration_seconds",
+    "HTTP request latency, until the response headers are sent",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+LLM_CALL_SECONDS = Histogram(
+    "cupra_llm_call_duration_seconds",
+    "Model call latency as seen by the caller, including queueing, retries and coalesced waits",
+    ["template", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30),
+)
+LLM_PROMPT_TOKENS = Histogram(
+    "cupra_llm_prompt_tokens",
+    "Input tokens per upstream model call",
+    ["template"],
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192),
+)
+LLM_RESPONSE_TOKENS = Histogram(
+    "cupra_llm_response_tokens",
+    "Output tokens per upstream model call",
+    ["template"],
+    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048),
+)
+JSON_PARSE_SECONDS = Histogram(
+    "cupra_json_parse_duration_seconds",
+    "Time to parse and validate a structured model response",
+    ["schema", "outcome"],
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01),
+)
+GAME_STORE_SECONDS = Histogram(
+    "cupra_game_store_operation_duration_seconds",
+    "Game store operation latency",
+    ["operation"],
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1),
+)
+GAMES_STARTED = Counter("cupra_games_started_total", "Games started")
+GAMES_WON = Counter("cupra_games_won_total", "Games won")
+GAMES_LOST = Counter("cupra_games_lost_total", "Games lost by running out of attempts")
+# Set by whichever worker was scraped last; with a shared store they all see the same count
+ACTIVE_GAMES = Gauge("cupra_active_games", "Games currently held by the game store", multiprocess_mode="mostrecent")
+
+
+def render_metrics() -> tuple:
+    """The current metrics in Prometheus text format, with their content type."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
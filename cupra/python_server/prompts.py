@@ -0,0 +1,393 @@
+"""
+Prompt templates for the clue and judge calls.
+
+Each template is a static prefix (instructions and few-shot examples),
+dedented once at import, followed by a short per-call body. Keeping the
+static text first and byte-identical across calls lets the upstream reuse
+the shared prefix, and the body's fields are parsed once at import rather
+than on every render. Clue and guess history is bounded to a token budget
+so prompt size stays flat however long a game runs.
+"""
+import os
+import textwrap
+import threading
+from string import Formatter
+from typing import Any, Dict, List, Optional, Tuple
+
+# --- Prompt Configuration ---
+# Approximate tokens allowed for each history list (clues, guesses) in a prompt.
+PROMPT_HISTORY_TOKEN_BUDGET = int(os.environ.get("PROMPT_HISTORY_TOKEN_BUDGET", "150"))
+# Most recent history items kept regardless of budget headroom.
+PROMPT_HISTORY_MAX_ITEMS = int(os.environ.get("PROMPT_HISTORY_MAX_ITEMS", "6"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count used for prompt budgeting (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def bound_history(items: List[str], noun: str, token_budget: int = PROMPT_HISTORY_TOKEN_BUDGET,
+                  max_items: int = PROMPT_HISTORY_MAX_ITEMS) -> str:
+    """
+    Render the most recent items as a bullet list within the token budget.
+
+    Older items that don't fit are summarized as a count.
+    """
+    kept: List[str] = []
+    used = 0
+    for item in reversed(items[-max_items:]):
+        cost = estimate_tokens(item)
+        if kept and used + cost > token_budget:
+            break
+        kept.append(item)
+        used += cost
+    kept.reverse()
+
+    lines = []
+    omitted = len(items) - len(kept)
+    if omitted:
+        lines.append(f"- ({omitted} earlier {noun} omitted)")
+    lines.extend(f"- {item}" for item in kept)
+    return "\n".join(lines) if lines else "- (none)"
+
+
+class PromptTemplate:
+    """A static prefix plus a body whose fields are parsed once."""
+
+    def __init__(self, name: str, prefix: str, body: str):
+        self.name = name
+        self.prefix = textwrap.dedent(prefix).strip() + "\n\n"
+        self._segments: List[Tuple[str, Optional[str]]] = [
+            (literal, field) for literal, field, _, _ in Formatter().parse(textwrap.dedent(body).strip() + "\n")
+        ]
+        self.fields = {field for _, field in self._segments if field}
+
+    def render(self, **values: Any) -> str:
+        parts = [self.prefix]
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field:
+                parts.append(str(values[field]))
+        return "".join(parts)
+
+
+class TokenUsage:
+    """Per-template call counts and input/output token totals."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage: Dict[str, Dict[str, int]] = {}
+
+    def record(self, template: str, input_tokens: int, output_tokens: int):
+        with self._lock:
+            usage = self._usage.setdefault(template, {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+            usage["calls"] += 1
+            usage["input_tokens"] += input_tokens
+            usage["output_tokens"] += output_tokens
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {
+                    **usage,
+                    "avg_input_tokens": round(usage["input_tokens"] / usage["calls"], 1),
+                    "avg_output_tokens": round(usage["output_tokens"] / usage["calls"], 1),
+                }
+                for name, usage in self._usage.items()
+            }
+
+
+token_usage = TokenUsage()
+
+INITIAL_CLUE = PromptTemplate(
+    name="initial_clue",
+    prefix="""
+    You are a helpful assistant creating clues for a car feature guessing game.
+
+    Generate a single, interesting, and not too obvious first clue for the target car feature.
+    The clue should:
+    1. Hint at the feature's function or purpose
+    2. Not directly mention the feature name
+    3. Be relevant to the car's operation or safety
+
+    Respond ONLY with a JSON object containing two keys:
+    1. "status": set to "success".
+    2. "clue": containing the generated clue string.
+
+    Example for target text "Front passenger front airbag off ››› page 50":
+    {
+      "status": "success",
+      "clue": "This safety feature can be disabled for specific passenger situations."
+    }
+    """,
+    body="""
+    The target text is: "{target_text}"
+    Relevant excerpts from the owner's manual:
+    {context}
+    {variant_note}
+    Now, generate the response for the target text: "{target_text}".
+    """,
+)
+
+VARIANT_NOTE = "This is clue #{variant} for this target; make it differ from the clues before it.\n"
+
+JUDGE_GUESS = PromptTemplate(
+    name="judge_guess",
+    prefix="""
+    You are the judge in a car feature guessing game.
+    You will be given the target text, excerpts from the owner's manual, the clues
+    the user has already received and the user's latest guess.
+
+    Analyze the guess. Is it correct or close enough to the target text?
+
+    Respond ONLY with a JSON object containing the following keys:
+    1. "status": set to "correct" if the guess is correct, or "incorrect" if it is wrong.
+    2. "clue": If the status is "incorrect", provide a *new*, helpful clue that hasn't been given before. If the status is "correct", set this to null.
+    3. "reasoning": Explain in detail why the guess was incorrect, focusing on:
+       - What aspects of the guess are not matching the target
+       - Any correlations or similarities with other car parts that might be causing confusion
+       - How the guess relates to a different part of the car
+       - What aspects of the guess need to be more specific or different
+       - DO NOT reveal the correct answer or give away too much information
+
+    IMPORTANT:
+    - Only explain why the guess is wrong, never reveal the correct answer
+    - Make the explanation educational and helpful for the user to think differently
+    - Keep the explanation focused on the guess itself, not the answer
+
+    Example for target text "Front passenger front airbag off ››› page 50", guess "airbag", status "incorrect":
+    {
+      "status": "incorrect",
+      "clue": "This feature can be toggled on or off depending on the passenger situation.",
+      "reasoning": "Your guess of 'airbag' is too general. Modern cars have multiple airbags (driver, passenger, side, curtain), and each serves a specific purpose. Think about which specific airbag this feature might be referring to and what makes it unique."
+    }
+
+    Example for target text "Front passenger front airbag off ››› page 50", guess "front passenger airbag off", status "correct":
+    {
+      "status": "correct",
+      "clue": null,
+      "reasoning": "Your guess exactly matches the target text."
+    }
+    """,
+    body="""
+    The target text is: "{target_text}"
+    Relevant excerpts from the owner's manual:
+    {context}
+    The user has already received the following clues:
+    {clues}
+    The user's earlier guesses were:
+    {guesses}
+
+    The user's latest guess is: "{guess}".
+    {clue_note}
+    Now, evaluate the guess "{guess}" for the target text "{target_text}" given the previous clues.
+    """,
+)
+
+
+JUDGE_GUESS_BATCH = PromptTemplate(
+    name="judge_guess_batch",
+    prefix="""
+    You are the judge in a car feature guessing game.
+    You will be given several numbered items, each from a different game. Every item has
+    its own target text, excerpts from the owner's manual, the clues the user has already
+    received and the user's latest guess. Judge each item independently of the others.
+
+    For each item, analyze the guess. Is it correct or close enough to that item's target text?
+
+    Respond ONLY with a JSON object with one key, "verdicts": a list with one object per item,
+    each containing the following keys:
+    1. "id": the item's number.
+    2. "status": set to "correct" if the guess is correct, or "incorrect" if it is wrong.
+    3. "clue": If the status is "incorrect", provide a *new*, helpful clue that hasn't been given before. If the status is "correct", set this to null.
+    4. "reasoning": Explain why the guess was incorrect (what doesn't match, what it might be
+       confused with, what needs to be more specific) without revealing the correct answer.
+
+    Example for two items, where item 0 has target text "Front passenger front airbag off ››› page 50"
+    and guess "airbag", and item 1 has target text "Battery ››› page 323" and guess "battery":
+    {
+      "verdicts": [
+        {
+          "id": 0,
+          "status": "incorrect",
+          "clue": "This feature can be toggled on or off depending on the passenger situation.",
+          "reasoning": "Your guess of 'airbag' is too general. Think about which specific airbag this might be and what makes it unique."
+        },
+        {
+          "id": 1,
+          "status": "correct",
+          "clue": null,
+          "reasoning": "Your guess matches the target text."
+        }
+      ]
+    }
+    """,
+    body="""
+    {items}
+
+    Now, return the verdicts for all {count} items.
+    """,
+)
+
+BATCH_ITEM = textwrap.dedent("""
+    Item {id}:
+    The target text is: "{target_text}"
+    Relevant excerpts from the owner's manual:
+    {context}
+    The user has already received the following clues:
+    {clues}
+    The user's earlier guesses were:
+    {guesses}
+    The user's latest guess is: "{guess}".
+    {clue_note}
+    """).strip()
+
+# Added to a judge item when the next clue was generated ahead of time
+CLUE_READY_NOTE = 'A new clue has already been prepared for this guess, so set "clue" to null.'
+
+
+NEXT_CLUE = PromptTemplate(
+    name="next_clue",
+    prefix="""
+    You are a helpful assistant creating clues for a car feature guessing game.
+    The player has already received some clues and is about to guess again.
+
+    Generate the next clue for the target car feature. The clue should:
+    1. Add new information that none of the earlier clues gave, a little more specific than them
+    2. Not directly mention the feature name
+    3. Be relevant to the car's operation or safety
+
+    Respond ONLY with a JSON object containing two keys:
+    1. "status": set to "success".
+    2. "clue": containing the generated clue string.
+
+    Example for target text "Front passenger front airbag off ››› page 50" after the clue
+    "This safety feature protects someone sitting in the front of the car.":
+    {
+      "status": "success",
+      "clue": "It can be disabled for specific passenger situations."
+    }
+    """,
+    body="""
+    The target text is: "{target_text}"
+    Relevant excerpts from the owner's manual:
+    {context}
+    The player has already received the following clues:
+    {clues}
+
+    Now, generate the next clue for the target text: "{target_text}".
+    """,
+)
+
+
+CLUE_LADDER = PromptTemplate(
+    name="clue_ladder",
+    prefix="""
+    You are writing the clues for the daily challenge of a car feature guessing game.
+    The player gets one clue at the start and one more after every wrong guess.
+
+    Write a ladder of clues for the target car feature, ordered from the vaguest to the most specific.
+    Every clue should:
+    1. Add new information that the earlier clues didn't give
+    2. Not directly mention the feature name
+    3. Be relevant to the car's operation or safety
+
+    Respond ONLY with a JSON object with one key, "clues": the list of clue strings in order.
+
+    Example for target text "Front passenger front airbag off ››› page 50" and 3 clues:
+    {
+      "clues": [
+        "This safety feature protects someone sitting in the front of the car.",
+        "It can be disabled for specific passenger situations.",
+        "You would switch it off before fitting a rear-facing child seat next to the driver."
+      ]
+    }
+    """,
+    body="""
+    The target text is: "{target_text}"
+    Relevant excerpts from the owner's manual:
+    {context}
+
+    Now, write exactly {count} clues for the target text: "{target_text}".
+    """,
+)
+
+ANSWER_VARIANTS = PromptTemplate(
+    name="answer_variants",
+    prefix="""
+    You are preparing the answer key for the daily challenge of a car feature guessing game.
+
+    List the different ways a player could correctly name the target car feature: its name,
+    synonyms, abbreviations, and common everyday phrasings a driver might use. Only include
+    answers that clearly identify this exact feature, not related or more general ones.
+
+    Respond ONLY with a JSON object with one key, "answers": the list of answer strings.
+
+    Example for target text "Front passenger front airbag off ››› page 50":
+    {
+      "answers": [
+        "front passenger airbag off",
+        "passenger airbag deactivation",
+        "passenger airbag switch",
+        "turn off the passenger airbag"
+      ]
+    }
+    """,
+    body="""
+    The target text is: "{target_text}"
+    Relevant excerpts from the owner's manual:
+    {context}
+
+    Now, list at most {count} answers for the target text: "{target_text}".
+    """,
+)
+
+
+def render_initial_clue(target_text: str, context: str, variant: Optional[int] = None) -> str:
+    variant_note = VARIANT_NOTE.format(variant=variant) if variant is not None else ""
+    return INITIAL_CLUE.render(target_text=target_text, context=context, variant_note=variant_note)
+
+
+def render_judge_guess(target_text: str, context: str, clues_given: List[str], guess: str,
+                       previous_guesses: Optional[List[str]] = None, clue_ready: bool = False) -> str:
+    return JUDGE_GUESS.render(
+        target_text=target_text,
+        context=context,
+        clues=bound_history(clues_given, "clues"),
+        guesses=bound_history(previous_guesses or [], "guesses"),
+        guess=guess,
+        clue_note=CLUE_READY_NOTE if clue_ready else "",
+    )
+
+
+def render_next_clue(target_text: str, context: str, clues_given: List[str]) -> str:
+    return NEXT_CLUE.render(target_text=target_text, context=context, clues=bound_history(clues_given, "clues"))
+
+
+def render_clue_ladder(target_text: str, context: str, count: int) -> str:
+    return CLUE_LADDER.render(target_text=target_text, context=context, count=count)
+
+
+def render_answer_variants(target_text: str, context: str, count: int) -> str:
+    return ANSWER_VARIANTS.render(target_text=target_text, context=context, count=count)
+
+
+def render_judge_guess_batch(items: List[Dict[str, Any]]) -> str:
+    """
+    Render one judge prompt for several guesses.
+
+    Each item holds the arguments of render_judge_guess; verdicts refer to items by position.
+    """
+    rendered = [
+        BATCH_ITEM.format(
+            id=position,
+            target_text=item["target_text"],
+            context=item["context"],
+            clues=bound_history(item["clues_given"], "clues"),
+            guesses=bound_history(item.get("previous_guesses") or [], "guesses"),
+            guess=item["guess"],
+            clue_note=CLUE_READY_NOTE if item.get("clue_ready") else "",
+        ).rstrip()
+        for position, item in enumerate(items)
+    ]
+    return JUDGE_GUESS_BATCH.render(items="\n\n".join(rendered), count=len(items))
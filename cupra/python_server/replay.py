@@ -0,0 +1,237 @@
+"""
+Replay recorded game traffic against a build and report how it performed.
+
+Reads the /start_game and /guess requests of a trace recorded with
+LLM_TRACE_RECORD=1, groups them into games and sends them again, each game
+in its recorded order and, with --speed, at its recorded pace. By default
+the server runs in-process with LLM_BACKEND=replay on the same trace, so
+model calls get their recorded responses after their recorded latencies:
+
+    python replay.py --trace state/llm_trace.jsonl --day 2026-10-17 --speed 10
+
+Reports throughput, per-endpoint tail latency next to the recorded one, and
+verdict drift: guesses whose outcome (correct, game over, won) differs from
+what the player got when it was recorded. Pass --url to replay against a
+running server (started with LLM_BACKEND=replay) and --json for
+machine-readable output.
+
+The clue pool and clue speculation are turned off while replaying: their
+clues depend on background timing rather than on the trace, and would make
+clues and judge prompts drift from the recorded ones. A server given with
+--url should be started with CLUE_POOL_SIZE=0 and CLUE_SPECULATION=0 too.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmark import make_client, percentile
+
+VERDICT_KEYS = ("is_correct", "game_over", "won")
+MAX_DRIFT_EXAMPLES = 10
+
+
+def recorded_games(entries: List[Dict[str, Any]], day: Optional[date] = None) -> Dict[str, Any]:
+    """The recorded requests grouped into games, each in order; and the guesses for games started before the trace."""
+    requests = sorted(
+        (entry for entry in entries if entry.get("k") == "req" and isinstance(entry.get("body"), dict)),
+        key=lambda entry: entry["ts"],
+    )
+    if day is not None:
+        requests = [
+            entry for entry in requests
+            if datetime.fromtimestamp(entry["ts"], timezone.utc).date() == day
+        ]
+    games: Dict[str, List[Dict[str, Any]]] = {}
+    orphans = 0
+    for position, entry in enumerate(requests):
+        if entry["path"] == "/start_game":
+            # A start that failed has no game id; it is replayed as a game of its own
+            game_id = (entry.get("result") or {}).get("game_id") or f"failed-{position}"
+            games[game_id] = [entry]
+        elif entry["body"].get("game_id") in games:
+            games[entry["body"]["game_id"]].append(entry)
+        else:
+            orphans += 1
+    return {"games": list(games.values()), "requests": sum(len(game) for game in games.values()), "orphans": orphans}
+
+
+class Replay:
+    """Sends recorded games and compares what comes back with what was recorded."""
+
+    def __init__(self, client: httpx.AsyncClient, speed: float, concurrency: int):
+        self.client = client
+        self.speed = speed
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.recorded_latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.guesses = 0
+        self.drift: List[Dict[str, Any]] = []
+        self.clue_changes = 0
+        self.skipped = 0
+
+    async def send(self, entry: Dict[str, Any], game_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        path = entry["path"]
+        body = dict(entry["body"])
+        headers = {}
+        if path == "/start_game" and entry.get("feature"):
+            headers["X-Replay-Feature"] = str(entry["feature"])
+        if path == "/guess":
+            body["game_id"] = game_id
+        self.recorded_latencies[path].append(entry["ms"] / 1000)
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(path, json=body, headers=headers)
+        except httpx.HTTPError:
+            self.errors[path] += 1
+            return None
+        finally:
+            self.latencies[path].append(time.perf_counter() - started)
+        if response.status_code != 200:
+            self.errors[path] += 1
+            return None
+        return response.json()
+
+    def compare(self, entry: Dict[str, Any], result: Optional[Dict[str, Any]]):
+        recorded = entry.get("result")
+        if recorded is None:
+            return
+        self.guesses += 1
+        replayed = {key: (result or {}).get(key) for key in VERDICT_KEYS}
+        if result is None or any(bool(recorded.get(key)) != bool(replayed[key]) for key in VERDICT_KEYS):
+            self.drift.append({
+                "guess": entry["body"].get("guess"),
+                "recorded": {key: recorded.get(key) for key in VERDICT_KEYS},
+                "replayed": replayed if result is not None else None,
+            })
+        elif recorded.get("next_clue") != result.get("next_clue"):
+            self.clue_changes += 1
+
+    async def game(self, requests: List[Dict[str, Any]], started: float, first_ts: float):
+        if self.speed:
+            # Paced games start when they were recorded to, however many are in flight
+            return await self.play(requests, started, first_ts)
+        async with self.semaphore:
+            await self.play(requests, started, first_ts)
+
+    async def play(self, requests: List[Dict[str, Any]], started: float, first_ts: float):
+        game_id = None
+        for entry in requests:
+            if self.speed:
+                delay = started + (entry["ts"] - first_ts) / self.speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if entry["path"] == "/guess" and game_id is None:
+                # The replayed start failed, so its guesses can't be sent
+                self.skipped += 1
+                continue
+            result = await self.send(entry, game_id)
+            if entry["path"] == "/start_game":
+                game_id = (result or {}).get("game_id")
+            else:
+                self.compare(entry, result)
+
+    async def run(self, games: List[List[Dict[str, Any]]]) -> float:
+        if not games:
+            return 0.0
+        first_ts = min(game[0]["ts"] for game in games)
+        started = time.perf_counter()
+        await asyncio.gather(*(self.game(requests, started, first_ts) for requests in games))
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        sent = sum(len(samples) for samples in self.latencies.values())
+        endpoints = {}
+        for path, samples in sorted(self.latencies.items()):
+            recorded = self.recorded_latencies[path]
+            endpoints[path] = {
+                "requests": len(samples),
+                "errors": self.errors.get(path, 0),
+                **{f"p{pct}_ms": round(percentile(samples, pct) * 1000, 1) for pct in (50, 95, 99)},
+                **{f"recorded_p{pct}_ms": round(percentile(recorded, pct) * 1000, 1) for pct in (50, 95, 99)},
+            }
+        return {
+            "requests": sent,
+            "skipped": self.skipped,
+            "elapsed_s": round(elapsed, 3),
+            "requests_per_s": round(sent / elapsed, 2) if elapsed else 0.0,
+            "endpoints": endpoints,
+            "guesses": self.guesses,
+            "verdict_drift": len(self.drift),
+            "verdict_drift_rate": round(len(self.drift) / self.guesses, 4) if self.guesses else 0.0,
+            "clue_changes": self.clue_changes,
+            "drift_examples": self.drift[:MAX_DRIFT_EXAMPLES],
+        }
+
+
+def print_report(results: Dict[str, Any]):
+    print(f"Replayed {results['requests']} requests of {results['games']} games in {results['elapsed_s']}s: "
+          f"{results['requests_per_s']} req/s ({results['orphans']} guesses for unrecorded games, "
+          f"{results['skipped']} for failed starts skipped)")
+    print(f"{'endpoint':<12} {'reqs':>6} {'errs':>5} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8}   "
+          f"{'rec p50':>8} {'rec p95':>8} {'rec p99':>8}")
+    for path, stats in results["endpoints"].items():
+        print(f"{path:<12} {stats['requests']:>6} {stats['errors']:>5} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}   "
+              f"{stats['recorded_p50_ms']:>8} {stats['recorded_p95_ms']:>8} {stats['recorded_p99_ms']:>8}")
+    print(f"Verdict drift: {results['verdict_drift']} of {results['guesses']} guesses "
+          f"({results['verdict_drift_rate']:.1%}); {results['clue_changes']} more got a different clue")
+    for example in results["drift_examples"]:
+        print(f"  {example['guess']!r}: recorded {example['recorded']}, replayed {example['replayed']}")
+    if results.get("backend"):
+        print(f"Replayed model calls: {results['backend']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trace", help="Trace recorded with LLM_TRACE_RECORD=1 (default: LLM_TRACE_PATH)")
+    parser.add_argument("--day", type=date.fromisoformat, help="Only replay requests from this UTC day (YYYY-MM-DD)")
+    parser.add_argument("--speed", type=float, default=0,
+                        help="Replay at this multiple of the recorded pace (default 0: as fast as possible)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Games in flight at once, unless paced with --speed")
+    parser.add_argument("--url", help="Base URL of a running server (default: in-process on the trace)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    # Only affect the in-process server: answer from the trace, record nothing, start from empty caches
+    os.environ.setdefault("LLM_BACKEND", "replay")
+    if args.trace:
+        os.environ["LLM_TRACE_PATH"] = args.trace
+    os.environ["LLM_TRACE_RECORD"] = "0"
+    # Clues come from the trace, not from background generation racing the replayed requests
+    os.environ["CLUE_POOL_SIZE"] = "0"
+    os.environ["CLUE_SPECULATION"] = "0"
+    os.environ.setdefault("CLUE_POOL_PATH", "")
+    os.environ.setdefault("JUDGEMENT_CACHE_PATH", "")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    # The server modules read the environment when imported, so only import them now
+    from llm_trace import LLM_TRACE_PATH, read_trace
+
+    recorded = recorded_games(read_trace(LLM_TRACE_PATH), args.day)
+    async with make_client(args.url) as client:
+        replay = Replay(client, args.speed, args.concurrency)
+        elapsed = await replay.run(recorded["games"])
+        stats = (await client.get("/stats")).json()
+    results = {
+        "games": len(recorded["games"]),
+        "orphans": recorded["orphans"],
+        **replay.report(elapsed),
+        "backend": stats.get("trace"),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
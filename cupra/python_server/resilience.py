@@ -0,0 +1,264 @@
+"""
+Retries, hedging and a circuit breaker around upstream model calls.
+
+Every call gets an overall deadline. Inside it, each attempt has its own
+shorter deadline, transient failures are retried after a jittered
+exponential backoff, and (optionally) a slow attempt is hedged with a
+second one once it has run longer than the recent p95 latency; whichever
+finishes first wins. A circuit breaker stops calling an upstream that keeps
+failing, so callers can fall back to local answers immediately instead of
+waiting out retries.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from backends import LLMBackendError
+
+logger = logging.getLogger(__name__)
+
+# --- Resilience Configuration ---
+# Deadline in seconds for one attempt; the overall call deadline is set by the caller.
+LLM_ATTEMPT_TIMEOUT = float(os.environ.get("LLM_ATTEMPT_TIMEOUT", "8"))
+# Retries after the first attempt for transient failures, and their backoff bounds in seconds.
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.2"))
+LLM_RETRY_MAX_DELAY = float(os.environ.get("LLM_RETRY_MAX_DELAY", "2"))
+# Send a second, hedged attempt once the first has run longer than the recent p95 latency.
+LLM_HEDGE = os.environ.get("LLM_HEDGE", "0") == "1"
+# Successful calls needed before the p95 is trusted for hedging.
+LLM_HEDGE_MIN_SAMPLES = 20
+# Consecutive failures that open the breaker, and seconds it stays open before a probe.
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.environ.get("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_TIMEOUT = float(os.environ.get("LLM_BREAKER_RESET_TIMEOUT", "30"))
+
+# HTTP statuses of upstream errors worth retrying: rate limited, server errors, timeouts.
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream the circuit breaker considers unhealthy."""
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a failed call is worth retrying."""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, LLMBackendError)):
+        return True
+    # google.api_core errors carry the HTTP status as `code`
+    return getattr(error, "code", None) in TRANSIENT_STATUS_CODES
+
+
+class CircuitBreaker:
+    """
+    Closed while the upstream is healthy; open after `failure_threshold`
+    consecutive failures. Once `reset_timeout` has passed, one probe call is
+    let through (half-open): success closes the breaker, failure reopens it.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = LLM_BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probing = False
+        self._probe_started = 0.0
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go upstream now."""
+        if self.state == "closed":
+            return
+        now = time.monotonic()
+        if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        # A probe that never reported back (e.g. it was cancelled) is replaced after a while
+        if self.state == "half_open" and (not self._probing or now - self._probe_started >= self.reset_timeout):
+            self._probing = True
+            self._probe_started = now
+            return
+        self.rejected += 1
+        raise CircuitOpenError("Model upstream is unavailable; circuit breaker is open")
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == "open" and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class LatencyTracker:
+    """Recent successful attempt latencies, for the hedging threshold."""
+
+    def __init__(self, size: int = 500):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        if len(self._samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+class Resilience:
+    """Deadline, retry, hedging and circuit-breaker policy for one upstream."""
+
+    def __init__(
+        self,
+        breaker: Optional[CircuitBreaker] = None,
+        max_retries: int = LLM_MAX_RETRIES,
+        base_delay: float = LLM_RETRY_BASE_DELAY,
+        max_delay: float = LLM_RETRY_MAX_DELAY,
+        attempt_timeout: float = LLM_ATTEMPT_TIMEOUT,
+        hedge: bool = LLM_HEDGE,
+    ):
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.hedge = hedge
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+
+    def backoff(self, retry: int) -> float:
+        """Full-jitter exponential backoff before the given retry (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    async def call(self, fn: Callable[[], Awaitable[T]], timeout: float,
+                   limiter: Optional[asyncio.Semaphore] = None) -> T:
+        """
+        Run fn within the overall deadline, retrying transient failures.
+
+        With a limiter, each attempt first waits for one of its slots; that wait
+        counts against the overall deadline but not the attempt's, and timing
+        out in it isn't held against the upstream. A hedge shares its attempt's slot.
+        Raises CircuitOpenError without calling fn while the breaker is open,
+        and asyncio.TimeoutError once the deadline has passed.
+        """
+        self.breaker.before_call()
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        retry = 0
+        while True:
+            if limiter is not None:
+                # Raises asyncio.TimeoutError without touching the breaker
+                await asyncio.wait_for(limiter.acquire(), max(0.0, deadline - loop.time()))
+            budget = min(self.attempt_timeout, deadline - loop.time())
+            error: Optional[Exception] = None
+            try:
+                if budget <= 0:
+                    # The deadline passed while queued locally, before anything went upstream
+                    raise asyncio.TimeoutError()
+                result = await self._attempt(fn, budget)
+            except Exception as e:
+                error = e
+            finally:
+                if limiter is not None:
+                    limiter.release()
+            if error is None:
+                self.breaker.record_success()
+                return result
+            if isinstance(error, asyncio.TimeoutError) and budget < self.attempt_timeout:
+                # Cut short by the overall deadline, e.g. after queueing, not by a slow upstream
+                raise error
+            if not is_transient(error):
+                # The upstream answered, so it is healthy; the request itself was bad
+                self.breaker.record_success()
+                raise error
+            self.breaker.record_failure()
+            delay = self.backoff(retry)
+            if retry >= self.max_retries or loop.time() + delay >= deadline or self.breaker.is_open:
+                self.failures += 1
+                raise error
+            retry += 1
+            self.retries += 1
+            logger.warning("Model call failed (%s: %s), retry %d in %.2fs", type(error).__name__, error, retry, delay)
+            await asyncio.sleep(delay)
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], timeout: float) -> T:
+        """One attempt, hedged with a second one if it outlives the recent p95."""
+        if timeout <= 0:
+            raise asyncio.TimeoutError()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + timeout
+        primary = asyncio.ensure_future(fn())
+        pending = {primary}
+        hedge_after = self.latency.p95() if self.hedge else None
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                wait = remaining
+                if hedge_after is not None and len(pending) == 1 and primary in pending:
+                    wait = min(remaining, max(0.0, started + hedge_after - loop.time()))
+                done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.latency.record(loop.time() - started)
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                if not done and hedge_after is not None and primary in pending and len(pending) == 1:
+                    self.hedges += 1
+                    pending.add(asyncio.ensure_future(fn()))
+                    hedge_after = None
+            if error is not None and not pending:
+                raise error
+            raise asyncio.TimeoutError()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, float]:
+        p95 = self.latency.p95()
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "hedging": self.hedge,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "breaker": self.breaker.stats(),
+        }
@@ -0,0 +1,236 @@
+"""
+BM25 retrieval over the owner's manual, served from a memory-mapped index file.
+
+The index is built offline from the manual's views (one passage per
+parsed feature, with its view, section and page), the page passages of the
+ingested manual if `python ingest.py` was run (the entry_*.json views
+otherwise), plus any extra passages given as JSON lines
+({"text": ..., "page": ..., "title": ...}):
+
+    python retrieval.py --out state/retrieval.idx [--passages more.jsonl]
+
+File layout (little-endian):
+    header      magic "CRIX", version, doc count, term count, avg doc length,
+                then the byte offsets of the four sections below
+    docs        per doc: text offset, text length, token count, page (-1 if none)
+    text        UTF-8 passage text
+    terms       per term (sorted): term offset, term length, postings offset, doc frequency
+                followed by the UTF-8 term bytes
+    postings    per posting: doc id, term frequency
+
+Lookups binary-search the term table in the mapped file, so opening the
+index costs one mmap and no parsing.
+"""
+import argparse
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ingest import load_page_passages, load_views
+from manual_index import load_entries, parse_features
+from matcher import tokenize
+from prompts import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# --- Retrieval Configuration ---
+RETRIEVAL_INDEX_PATH = os.environ.get("RETRIEVAL_INDEX_PATH", str(Path(__file__).parent / "state" / "retrieval.idx"))
+# Passages injected into a prompt, and the approximate token budget they must fit in.
+RAG_TOP_K = int(os.environ.get("RAG_TOP_K", "3"))
+RAG_TOKEN_BUDGET = int(os.environ.get("RAG_TOKEN_BUDGET", "200"))
+
+MAGIC = b"CRIX"
+VERSION = 1
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+HEADER = struct.Struct("<4sIIIfQQQQ")
+DOC = struct.Struct("<IIIi")
+TERM = struct.Struct("<IIII")
+POSTING = struct.Struct("<II")
+
+
+@dataclass
+class Passage:
+    text: str
+    page: Optional[int] = None
+    score: float = 0.0
+
+
+def passages_from_entries(entries: List[dict]) -> List[Passage]:
+    """One passage per parsed feature, prefixed with its view; the record's text carries its section."""
+    passages = []
+    for entry in entries:
+        title = entry.get("title", "")
+        for record in parse_features(entry.get("text", "")):
+            passages.append(Passage(text=f"{title}: {record.text}" if title else record.text, page=record.page))
+    return passages
+
+
+def build_index(passages: List[Passage], path: str):
+    """Write the passages and their BM25 postings to an index file."""
+    term_postings: Dict[str, List[tuple]] = {}
+    doc_lengths = []
+    for doc_id, passage in enumerate(passages):
+        counts = Counter(tokenize(passage.text))
+        doc_lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            term_postings.setdefault(term, []).append((doc_id, tf))
+
+    text_blob = bytearray()
+    docs = bytearray()
+    for passage, length in zip(passages, doc_lengths):
+        encoded = passage.text.encode("utf-8")
+        docs += DOC.pack(len(text_blob), len(encoded), length, passage.page if passage.page is not None else -1)
+        text_blob += encoded
+
+    terms = sorted(term_postings)
+    term_table = bytearray()
+    term_blob = bytearray()
+    postings = bytearray()
+    term_table_size = TERM.size * len(terms)
+    for term in terms:
+        encoded = term.encode("utf-8")
+        entries = term_postings[term]
+        term_table += TERM.pack(term_table_size + len(term_blob), len(encoded), len(postings), len(entries))
+        term_blob += encoded
+        for doc_id, tf in entries:
+            postings += POSTING.pack(doc_id, tf)
+
+    docs_offset = HEADER.size
+    text_offset = docs_offset + len(docs)
+    terms_offset = text_offset + len(text_blob)
+    postings_offset = terms_offset + len(term_table) + len(term_blob)
+    avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(passages), len(terms), avg_length,
+                            docs_offset, text_offset, terms_offset, postings_offset))
+        f.write(docs)
+        f.write(text_blob)
+        f.write(term_table)
+        f.write(term_blob)
+        f.write(postings)
+    os.replace(tmp_path, path)
+
+
+class RetrievalIndex:
+    """Read-only BM25 index over a memory-mapped index file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.doc_count, self.term_count, self.avg_length,
+         self._docs, self._text, self._terms, self._postings) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Unsupported retrieval index format in {path}")
+
+    def _term(self, position: int) -> tuple:
+        offset, length, postings_offset, df = TERM.unpack_from(self._mm, self._terms + position * TERM.size)
+        start = self._terms + offset
+        return self._mm[start:start + length].decode("utf-8"), postings_offset, df
+
+    def _lookup(self, term: str) -> Optional[tuple]:
+        low, high = 0, self.term_count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            candidate, postings_offset, df = self._term(middle)
+            if candidate == term:
+                return postings_offset, df
+            if candidate < term:
+                low = middle + 1
+            else:
+                high = middle - 1
+        return None
+
+    def _doc(self, doc_id: int) -> tuple:
+        return DOC.unpack_from(self._mm, self._docs + doc_id * DOC.size)
+
+    def passage(self, doc_id: int) -> Passage:
+        offset, length, _, page = self._doc(doc_id)
+        start = self._text + offset
+        return Passage(text=self._mm[start:start + length].decode("utf-8"), page=page if page >= 0 else None)
+
+    def search(self, query: str, k: int = RAG_TOP_K) -> List[Passage]:
+        """Top-k passages for the query by BM25 score."""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            found = self._lookup(term)
+            if not found:
+                continue
+            postings_offset, df = found
+            idf = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+            base = self._postings + postings_offset
+            for i in range(df):
+                doc_id, tf = POSTING.unpack_from(self._mm, base + i * POSTING.size)
+                length = self._doc(doc_id)[2]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self.avg_length) if self.avg_length else BM25_K1
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        results = []
+        for doc_id, score in ranked:
+            passage = self.passage(doc_id)
+            passage.score = score
+            results.append(passage)
+        return results
+
+    def context(self, query: str, k: int = RAG_TOP_K, token_budget: int = RAG_TOKEN_BUDGET) -> List[Passage]:
+        """Top-k passages for the query, dropping any that would exceed the token budget."""
+        selected = []
+        used = 0
+        for passage in self.search(query, k):
+            cost = estimate_tokens(passage.text)
+            if used + cost > token_budget:
+                continue
+            selected.append(passage)
+            used += cost
+        return selected
+
+    def close(self):
+        self._mm.close()
+
+
+def open_index(path: str = RETRIEVAL_INDEX_PATH) -> Optional[RetrievalIndex]:
+    """Map the index file, or return None if it hasn't been built."""
+    if not path or not Path(path).exists():
+        return None
+    try:
+        return RetrievalIndex(path)
+    except Exception as e:
+        logger.error("Error opening retrieval index: %s", e)
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=RETRIEVAL_INDEX_PATH, help="Index file to write")
+    parser.add_argument("--passages", action="append", default=[], help="Extra passages as JSON lines")
+    args = parser.parse_args()
+
+    # The ingested manual (`python ingest.py`) when there is one, else the app's entries
+    items = load_page_passages()
+    passages = passages_from_entries(load_views() or load_entries())
+    for passages_path in args.passages:
+        with open(passages_path, 'r', encoding='utf-8') as f:
+            items.extend(json.loads(line) for line in f if line.strip())
+    for item in items:
+        title = item.get("title")
+        text = f"{title}: {item['text']}" if title else item["text"]
+        passages.append(Passage(text=text, page=item.get("page")))
+
+    build_index(passages, args.out)
+    print(f"Indexed {len(passages)} passages into {args.out} ({os.path.getsize(args.out)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Response schemas for the model calls and the single parse path for their output.
+
+The same Pydantic models constrain generation (as a response schema sent
+upstream) and validate what comes back, so a response is either a valid
+instance or a counted parse failure; nothing is guessed from free text.
+"""
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Literal, Optional, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from metrics import JSON_PARSE_SECONDS
+
+T = TypeVar("T", bound=BaseModel)
+
+# Keys of a JSON schema the upstream understands; everything else is dropped.
+UPSTREAM_SCHEMA_KEYS = {"type", "format", "description", "nullable", "enum", "properties", "required", "items"}
+
+
+class ClueResult(BaseModel):
+    status: Literal["success"]
+    clue: str
+
+
+class GuessVerdict(BaseModel):
+    status: Literal["correct", "incorrect"]
+    clue: Optional[str] = None
+    reasoning: str
+
+
+class BatchVerdict(GuessVerdict):
+    id: int
+
+
+class BatchVerdicts(BaseModel):
+    verdicts: List[BatchVerdict]
+
+
+class ClueLadder(BaseModel):
+    clues: List[str]
+
+
+class AnswerVariants(BaseModel):
+    answers: List[str]
+
+
+class StructuredOutputError(Exception):
+    """Raised when a response doesn't validate against its schema."""
+
+
+def _upstream_schema(node: Dict[str, Any], defs: Dict[str, Any]) -> Dict[str, Any]:
+    if "$ref" in node:
+        return _upstream_schema(defs[node["$ref"].split("/")[-1]], defs)
+    # Optional[X] is rendered as anyOf [X, null]; the upstream spells it as a nullable X
+    if "anyOf" in node:
+        options = [option for option in node["anyOf"] if option.get("type") != "null"]
+        converted = _upstream_schema(options[0], defs)
+        if len(options) < len(node["anyOf"]):
+            converted["nullable"] = True
+        return converted
+    if "const" in node:
+        node = {**node, "enum": [node["const"]]}
+
+    converted = {key: value for key, value in node.items() if key in UPSTREAM_SCHEMA_KEYS}
+    if "enum" in converted:
+        converted.setdefault("type", "string")
+    if "properties" in converted:
+        converted["properties"] = {
+            name: _upstream_schema(child, defs) for name, child in converted["properties"].items()
+        }
+    if "items" in converted:
+        converted["items"] = _upstream_schema(converted["items"], defs)
+    return converted
+
+
+def response_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """The model's JSON schema in the OpenAPI subset accepted for constrained generation."""
+    schema = model.model_json_schema()
+    return _upstream_schema(schema, schema.get("$defs", {}))
+
+
+def _strip_fences(text: str) -> str:
+    """Drop a Markdown code fence around the JSON, which some models add even in JSON mode."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text
+
+
+class ParseStats:
+    """Per-schema counts of parsed and failed responses, and time spent parsing."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def record(self, schema: str, outcome: str, seconds: float = 0.0):
+        with self._lock:
+            stats = self._stats.setdefault(schema, {"parsed": 0, "failed": 0, "repaired": 0, "parse_seconds": 0.0})
+            stats[outcome] += 1
+            stats["parse_seconds"] += seconds
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {**stats, "parse_seconds": round(stats["parse_seconds"], 4)}
+                for name, stats in self._stats.items()
+            }
+
+
+parse_stats = ParseStats()
+
+
+def _validate(model: Type[T], validate: Callable[[Any], T], value: Any) -> T:
+    started = time.perf_counter()
+    try:
+        result = validate(value)
+    except ValidationError as e:
+        elapsed = time.perf_counter() - started
+        parse_stats.record(model.__name__, "failed", elapsed)
+        JSON_PARSE_SECONDS.labels(model.__name__, "failed").observe(elapsed)
+        raise StructuredOutputError(f"{model.__name__}: {e.error_count()} validation error(s): {_summary(e)}")
+    elapsed = time.perf_counter() - started
+    parse_stats.record(model.__name__, "parsed", elapsed)
+    JSON_PARSE_SECONDS.labels(model.__name__, "parsed").observe(elapsed)
+    return result
+
+
+def parse_structured(model: Type[T], text: str) -> T:
+    """Validate a response against the model, raising StructuredOutputError if it doesn't fit."""
+    return _validate(model, model.model_validate_json, _strip_fences(text))
+
+
+def validate_fields(model: Type[T], fields: Dict[str, Any]) -> T:
+    """Validate already-decoded fields (e.g. from a streamed response) against the model."""
+    return _validate(model, model.model_validate, fields)
+
+
+def _summary(error: ValidationError) -> str:
+    """Short description of the validation errors, for logs and repair prompts."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'response'}: {item['msg']}"
+        for item in error.errors()[:3]
+    )
+
+
+def repair_prompt(prompt: str, model: Type[BaseModel], error: StructuredOutputError) -> str:
+    """The original prompt plus the reason its previous answer was rejected."""
+    return (
+        f"{prompt}\n"
+        f"Your previous answer was rejected ({error}). Respond ONLY with a JSON object matching "
+        f"this schema: {json.dumps(response_schema(model))}\n"
+    )
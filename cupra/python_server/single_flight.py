@@ -0,0 +1,89 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+
+# --- Single-Flight Configuration ---
+# Whether identical model calls in flight at the same time share one upstream call.
+LLM_SINGLE_FLIGHT = os.environ.get("LLM_SINGLE_FLIGHT", "1") == "1"
+# How many times a caller that joined a failed call starts a fresh one before giving up.
+SINGLE_FLIGHT_RETRIES = 1
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one.
+
+    The first caller for a key starts the call; callers arriving while it is
+    in flight wait on the same task instead of starting their own. Results
+    are never kept once the call finishes.
+
+    The shared task is cancelled only when every waiter has gone, so one
+    caller disconnecting doesn't fail the others. If the call fails, the
+    caller that started it gets the error, while callers that joined it
+    start a fresh call (coalescing again among themselves), so one bad
+    upstream response doesn't fail everyone who happened to ask at the same
+    time. Timeouts are not retried: the joiners share the deadline that
+    just passed.
+    """
+
+    def __init__(self, retries: int = SINGLE_FLIGHT_RETRIES):
+        self.retries = retries
+        self._calls: Dict[str, _Call] = {}
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.joiner_retries = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Run fn for the key, or join the call already in flight; returns (result, whether this caller started it)."""
+        attempt = 0
+        while True:
+            call = self._calls.get(key)
+            started = call is None
+            if started:
+                call = _Call(asyncio.ensure_future(fn()))
+                self._calls[key] = call
+                call.task.add_done_callback(lambda _, call=call: self._forget(key, call))
+                self.upstream_calls += 1
+            else:
+                self.coalesced += 1
+
+            call.waiters += 1
+            try:
+                return await asyncio.shield(call.task), started
+            except asyncio.TimeoutError:
+                raise
+            except Exception:
+                if started or attempt >= self.retries:
+                    raise
+                attempt += 1
+                self.joiner_retries += 1
+            finally:
+                call.waiters -= 1
+                if call.waiters == 0 and not call.task.done():
+                    self._forget(key, call)
+                    call.task.cancel()
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, float]:
+        requests = self.upstream_calls + self.coalesced
+        return {
+            "enabled": LLM_SINGLE_FLIGHT,
+            "in_flight": len(self._calls),
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "joiner_retries": self.joiner_retries,
+            "coalescing_ratio": round(self.coalesced / requests, 4) if requests else 0.0,
+        }
@@ -0,0 +1,136 @@
+"""
+Speculative next clues, generated while the player is thinking.
+
+The next clue depends on the target and the clues already given, not on
+the guess the player hasn't made yet. So as soon as a clue is shown, the
+following one is generated in the background and stored on the game state.
+If the next guess is wrong, the ready clue is attached and the judge only
+has to decide the verdict; a clue that becomes ready after the judge was
+asked to write one is dropped in favour of the judge's. A clue made for an earlier point in the game is
+never used; every generated clue ends up counted as a hit or as waste.
+"""
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from admission import admission_client
+from game_store import GameConflictError, GameState, GameStore
+
+logger = logging.getLogger(__name__)
+
+# --- Speculation Configuration ---
+CLUE_SPECULATION = os.environ.get("CLUE_SPECULATION", "1") == "1"
+
+
+class ClueSpeculator:
+    """Keeps one next clue ready per game, and counts how many of them get used."""
+
+    def __init__(
+        self,
+        generate: Callable[[str, List[str]], Awaitable[Optional[str]]],
+        store: GameStore,
+        enabled: bool = CLUE_SPECULATION,
+    ):
+        self._generate = generate
+        self.store = store
+        self.enabled = enabled
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.generated = 0
+        self.ready = 0
+        self.failed = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+
+    def schedule(self, game: GameState, target_text: str):
+        """Start generating the game's next clue, unless one is ready, in flight or can't be needed."""
+        if not self.enabled or game.is_completed or game.game_id in self._tasks:
+            return
+        # The guess that would need the next clue is the game's last one
+        if game.attempts + 1 >= game.max_attempts:
+            return
+        if self.has_clue(game):
+            return
+        self.started += 1
+        task = asyncio.create_task(self._speculate(game.game_id, target_text, list(game.clues_given)))
+        self._tasks[game.game_id] = task
+        task.add_done_callback(lambda _, game_id=game.game_id: self._tasks.pop(game_id, None))
+
+    async def _speculate(self, game_id: str, target_text: str, clues_given: List[str]):
+        # Background work: it waits for upstream quota behind the players' own calls
+        admission_client.set(None)
+        try:
+            clue = await self._generate(target_text, clues_given)
+        except Exception as e:
+            logger.warning("Error generating speculative clue: %s", e, extra={"game_id": game_id})
+            clue = None
+        if not clue or clue in clues_given:
+            self.failed += 1
+            return
+        self.generated += 1
+        game = await self.store.get(game_id)
+        if game is None or game.is_completed or len(game.clues_given) != len(clues_given):
+            # The player moved on before it was ready
+            self.wasted += 1
+            return
+        game.next_clue = clue
+        game.next_clue_for = len(clues_given)
+        try:
+            await self.store.save(game)
+        except GameConflictError:
+            # A guess for the game was saved meanwhile, so the clue is already out of date
+            self.wasted += 1
+            return
+        self.ready += 1
+
+    def has_clue(self, game: GameState) -> bool:
+        """Whether a next clue is ready for the clues the player has now."""
+        return (
+            game.next_clue is not None
+            and game.next_clue_for == len(game.clues_given)
+            and game.next_clue not in game.clues_given
+        )
+
+    def take(self, game: GameState) -> Optional[str]:
+        """The ready next clue, if any, for a wrong guess that needs one; counts a hit or a miss."""
+        clue = game.next_clue if self.has_clue(game) else None
+        if game.next_clue is not None and clue is None:
+            self.wasted += 1
+        game.next_clue = None
+        if clue is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return clue
+
+    def decline(self, game: GameState):
+        """Drop the ready clue, if any, because the judge wrote the next clue itself; counts a miss."""
+        if game.next_clue is not None:
+            self.wasted += 1
+            game.next_clue = None
+        self.misses += 1
+
+    def discard(self, game: GameState):
+        """Drop the ready clue of a game that ended without needing it."""
+        if game.next_clue is not None:
+            self.wasted += 1
+            game.next_clue = None
+
+    def stats(self) -> Dict[str, float]:
+        needed = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "started": self.started,
+            "generated": self.generated,
+            "ready": self.ready,
+            "failed": self.failed,
+            "in_flight": len(self._tasks),
+            "hits": self.hits,
+            "misses": self.misses,
+            "wasted": self.wasted,
+            "hit_rate": round(self.hits / needed, 3) if needed else 0.0,
+            # Clues that arrive after the player moved on are wasted without ever being ready
+            "waste_rate": round(self.wasted / self.generated, 3) if self.generated else 0.0,
+        }
@@ -0,0 +1,135 @@
+"""
+Cold-start benchmark for the game server.
+
+Measures, over several fresh processes, how long `import fastapi_server`
+takes and how long a spawned uvicorn worker takes to answer its liveness
+probe, to report ready, and to serve its first /start_game:
+
+    python startup_benchmark.py --runs 5 --warm-up background
+
+Compare --warm-up lazy and background (and --backend gemini or fake) to
+see what the deferred SDK import saves and where its cost moves to.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+SERVER_DIR = Path(__file__).parent
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import fastapi_server; print(time.perf_counter() - t)"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_env(backend: str, warm_up: str) -> Dict[str, str]:
+    return {**os.environ, "LLM_BACKEND": backend, "STARTUP_WARM_UP": warm_up, "LOG_LEVEL": "WARNING"}
+
+
+def measure_import(env: Dict[str, str]) -> float:
+    """Seconds to import the server module in a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def wait_for(client: httpx.Client, path: str, deadline: float) -> Optional[float]:
+    """Poll a GET endpoint until it answers 200; the time it did, or None at the deadline."""
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def measure_server(env: Dict[str, str], card: dict, timeout: float) -> Dict[str, Optional[float]]:
+    """Spawn a worker and time its liveness, readiness and first game, from the spawn."""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fastapi_server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = started + timeout
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            live = wait_for(client, "/healthz", deadline)
+            ready = wait_for(client, "/readyz", deadline)
+            first = None
+            if ready is not None:
+                response = client.post("/start_game", json={"card_data": card})
+                if response.status_code == 200:
+                    first = time.perf_counter()
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        name: round(moment - started, 3) if moment is not None else None
+        for name, moment in (("live", live), ("ready", ready), ("first_request", first))
+    }
+
+
+def summarize(samples: List[Optional[float]]) -> Dict[str, Optional[float]]:
+    values = [sample for sample in samples if sample is not None]
+    if not values:
+        return {"median": None, "min": None, "max": None, "failed": len(samples)}
+    return {
+        "median": round(statistics.median(values), 3),
+        "min": round(min(values), 3),
+        "max": round(max(values), 3),
+        "failed": len(samples) - len(values),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement")
+    parser.add_argument("--backend", default=os.environ.get("LLM_BACKEND", "gemini"), help="LLM backend of the server")
+    parser.add_argument("--warm-up", default="background", choices=["background", "lazy"], help="STARTUP_WARM_UP mode")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds a worker gets to serve its first game")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    env = server_env(args.backend, args.warm_up)
+    card = {"title": "Front View", "text": "1 Front radar 2 Front camera 3 Park distance control sensors"}
+    imports = [measure_import(env) for _ in range(args.runs)]
+    servers = [measure_server(env, card, args.timeout) for _ in range(args.runs)]
+
+    results = {
+        "backend": args.backend,
+        "warm_up": args.warm_up,
+        "runs": args.runs,
+        "import_seconds": summarize(imports),
+        **{
+            f"{name}_seconds": summarize([server[name] for server in servers])
+            for name in ("live", "ready", "first_request")
+        },
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"backend={args.backend} warm_up={args.warm_up} runs={args.runs}")
+    print(f"{'measure':<22}{'median':>9}{'min':>9}{'max':>9}{'failed':>8}")
+    for name in ("import", "live", "ready", "first_request"):
+        stats = results[f"{name}_seconds"]
+        cells = [f"{stats[key]:>9.3f}" if stats[key] is not None else f"{'-':>9}" for key in ("median", "min", "max")]
+        print(f"{name + ' (s)':<22}{''.join(cells)}{stats['failed']:>8}")
+
+
+if __name__ == "__main__":
+    main()
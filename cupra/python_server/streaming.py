@@ -0,0 +1,171 @@
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+# Longest JSON string escape (a \uXXXX\uXXXX surrogate pair), used to find a decodable prefix.
+MAX_ESCAPE_LENGTH = 12
+
+
+@dataclass
+class FieldEvent:
+    """
+    A change to one top-level field of a streamed JSON object.
+
+    `delta` carries newly decoded text of a string value still being
+    streamed; `done` is set once the field's full value is known.
+    """
+    key: str
+    delta: str = ""
+    done: bool = False
+    value: Any = None
+
+
+def _decode_prefix(raw: str) -> str:
+    """Decode the longest prefix of a raw JSON string body that doesn't end mid-escape."""
+    for end in range(len(raw), max(-1, len(raw) - MAX_ESCAPE_LENGTH), -1):
+        try:
+            decoded = json.loads(f'"{raw[:end]}"')
+        except ValueError:
+            continue
+        # Hold back a high surrogate until its low half arrives
+        if decoded and "\ud800" <= decoded[-1] <= "\udbff":
+            return decoded[:-1]
+        return decoded
+    return ""
+
+
+class JSONFieldStream:
+    """
+    Incremental parser for the top-level fields of a JSON object arriving in chunks.
+
+    Text before the opening brace (prose, code fences) is skipped. String
+    values are reported as they stream in; other values when they complete.
+    """
+
+    def __init__(self):
+        self._state = "seek"
+        self._key_raw: List[str] = []
+        self._key: Optional[str] = None
+        self._raw: List[str] = []
+        self._escaped = False
+        self._emitted = 0
+        self._nested_depth = 0
+        self._nested_in_string = False
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+
+    def feed(self, chunk: str) -> List[FieldEvent]:
+        events: List[FieldEvent] = []
+        for ch in chunk:
+            self._step(ch, events)
+        if self._state == "string_value":
+            self._emit_delta(events)
+        return events
+
+    def _emit_delta(self, events: List[FieldEvent]):
+        decoded = _decode_prefix("".join(self._raw))
+        if len(decoded) > self._emitted:
+            events.append(FieldEvent(key=self._key, delta=decoded[self._emitted:]))
+            self._emitted = len(decoded)
+
+    def _finish(self, value: Any, events: List[FieldEvent]):
+        self.fields[self._key] = value
+        events.append(FieldEvent(key=self._key, done=True, value=value))
+        self._raw = []
+        self._state = "comma"
+
+    def _step(self, ch: str, events: List[FieldEvent]):
+        state = self._state
+        if state == "seek":
+            if ch == "{":
+                self._state = "key"
+        elif state == "key":
+            if ch == '"':
+                self._key_raw = []
+                self._escaped = False
+                self._state = "key_string"
+            elif ch == "}":
+                self._state = "done"
+                self.complete = True
+        elif state == "key_string":
+            if self._escaped:
+                self._escaped = False
+                self._key_raw.append(ch)
+            elif ch == "\\":
+                self._escaped = True
+                self._key_raw.append(ch)
+            elif ch == '"':
+                self._key = json.loads(f'"{"".join(self._key_raw)}"')
+                self._state = "colon"
+            else:
+                self._key_raw.append(ch)
+        elif state == "colon":
+            if ch == ":":
+                self._state = "value"
+        elif state == "value":
+            if ch.isspace():
+                return
+            self._raw = []
+            if ch == '"':
+                self._escaped = False
+                self._emitted = 0
+                self._state = "string_value"
+            elif ch in "{[":
+                self._raw.append(ch)
+                self._nested_depth = 1
+                self._nested_in_string = False
+                self._escaped = False
+                self._state = "nested_value"
+            else:
+                self._raw.append(ch)
+                self._state = "scalar_value"
+        elif state == "string_value":
+            if self._escaped:
+                self._escaped = False
+                self._raw.append(ch)
+            elif ch == "\\":
+                self._escaped = True
+                self._raw.append(ch)
+            elif ch == '"':
+                self._emit_delta(events)
+                self._finish(json.loads(f'"{"".join(self._raw)}"'), events)
+            else:
+                self._raw.append(ch)
+        elif state == "scalar_value":
+            if ch in ",}" or ch.isspace():
+                try:
+                    value = json.loads("".join(self._raw))
+                except ValueError:
+                    value = "".join(self._raw)
+                self._finish(value, events)
+                self._step(ch, events)
+            else:
+                self._raw.append(ch)
+        elif state == "nested_value":
+            self._raw.append(ch)
+            if self._nested_in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._nested_in_string = False
+            elif ch == '"':
+                self._nested_in_string = True
+            elif ch in "{[":
+                self._nested_depth += 1
+            elif ch in "}]":
+                self._nested_depth -= 1
+                if self._nested_depth == 0:
+                    self._finish(json.loads("".join(self._raw)), events)
+        elif state == "comma":
+            if ch == ",":
+                self._state = "key"
+            elif ch == "}":
+                self._state = "done"
+                self.complete = True
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, TokenBucket
+
+
+def test_token_bucket_burst_then_empty():
+    bucket = TokenBucket(rate=1, capacity=3)
+    assert [bucket.try_take() for _ in range(4)] == [True, True, True, False]
+    assert 0 < bucket.wait_time() <= 1
+
+
+def test_token_bucket_charge_runs_into_debt():
+    bucket = TokenBucket(rate=1, capacity=1)
+    bucket.charge()
+    bucket.charge()
+    assert bucket.wait_time() > 1
+
+
+def test_disabled_admits_everything():
+    async def run():
+        controller = AdmissionController(rpm=0)
+        for _ in range(100):
+            await controller.acquire("a")
+        assert controller.stats()["admitted"] == 0
+
+    asyncio.run(run())
+
+
+def test_clients_are_served_round_robin():
+    async def run():
+        # A token every 10ms, none saved up beyond the first
+        controller = AdmissionController(rpm=6000, burst=1, max_wait=10)
+        order = []
+
+        async def call(client):
+            await controller.acquire(client)
+            order.append(client)
+
+        await call("chatty")
+        await asyncio.gather(*[call("chatty") for _ in range(3)], *[call("quiet") for _ in range(2)])
+        return order
+
+    # The chatty client queued first, but can't make the quiet one wait behind all its calls
+    assert asyncio.run(run()) == ["chatty", "chatty", "quiet", "chatty", "quiet", "chatty"]
+
+
+def test_rejects_a_client_whose_queue_is_full():
+    async def run():
+        controller = AdmissionController(rpm=60, burst=1, max_queue_per_client=2, max_wait=100)
+        await controller.acquire("chatty")
+        waiting = [asyncio.create_task(controller.acquire("chatty")) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire("chatty")
+        # Another client still gets a place in the queue
+        other = asyncio.create_task(controller.acquire("quiet"))
+        await asyncio.sleep(0)
+        assert not other.done()
+        assert controller.stats()["rejected"] == 1
+        for task in [*waiting, other]:
+            task.cancel()
+        await asyncio.gather(*waiting, other, return_exceptions=True)
+        assert controller.stats()["waiting"] == 0
+        assert controller.stats()["clients_waiting"] == 0
+
+    asyncio.run(run())
+
+
+def test_rejects_when_the_wait_is_too_long():
+    async def run():
+        controller = AdmissionController(rpm=60, burst=1, max_wait=0.5)
+        await controller.acquire("a")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("b")
+        assert rejected.value.retry_after >= 1
+
+    asyncio.run(run())
+
+
+def test_background_work_waits_instead_of_being_rejected():
+    async def run():
+        controller = AdmissionController(rpm=60, burst=1, max_wait=0.5)
+        await controller.acquire("a")
+        background = asyncio.create_task(controller.acquire(None))
+        await asyncio.sleep(0)
+        assert not background.done()
+        assert controller.stats()["rejected"] == 0
+        background.cancel()
+        await asyncio.gather(background, return_exceptions=True)
+
+    asyncio.run(run())
@@ -0,0 +1,76 @@
+import pytest
+
+from manual_index import FeatureRecord, load_entries, parse_features
+
+# (name, number, section, section_title, page) of every feature, per bundled entry
+EXPECTED = {
+    "Front View": [
+        ("Front radar", "1", None, None, None),
+        ("“Top View Camera” front camera", "2", None, None, None),
+        ("Park distance control sensors", "3", None, None, None),
+        ("Park assist sensor", "4", None, None, None),
+        ("Front multifunction camera", "5", None, None, None),
+        ("“Top View Camera” side cameras", "6", None, None, None),
+        ("Brake fluid", None, "A", "Levels control", 321),
+        ("Battery", None, "A", "Levels control", 323),
+        ("Unlocking lever", None, "B", "Front compartment", 317),
+        ("Open/close", None, "B", "Front compartment", 317),
+        ("Jump start", None, "B", "Front compartment", 304),
+        ("Towing", None, "C", "Towing the vehicle", 305),
+        ("Towline anchorage", None, "C", "Towing the vehicle", 307),
+    ],
+    "Rear View": [
+        ("Rear view camera", "1", None, None, None),
+        ("Park distance control sensors", "2", None, None, None),
+        ("Rear radars", "3", None, None, None),
+        ("Park assist sensor", "4", None, None, None),
+        ("Opening from outside", None, "A", "Rear lid", 102),
+        ("Towline anchorage", None, "B", "Towing the vehicle", 308),
+        ("Charging process display", None, "C", "Charging socket", 79),
+        ("Emergency unlocking", None, "C", "Charging socket", 82),
+        ("Doors", None, "D", "Opening and closing", 99),
+        ("Central locking", None, "D", "Opening and closing", 94),
+        ("Emergency lock", None, "D", "Opening and closing", 101),
+        ("Action in the event of a puncture", None, "E", "Action in the event of a puncture", 328),
+    ],
+    "Interior View": [
+        ("Armrest", "1", None, None, 116),
+        ("Isofix anchors", "2", None, None, 58),
+        ("Seat belts", "3", None, None, 41),
+        ("Seat adjustment", "4", None, None, 111),
+        ("Drink holder with emergency starter housing", "5", None, None, 152),
+        ("Start button", "6", None, None, 149),
+        ("Connectivity Box / Wireless Charger", "7", None, None, 282),
+        ("Glove compartment", "8", None, None, 229),
+        ("Front passenger airbag", "9", None, None, 50),
+        ("Disconnecting the front passenger front airbag", "10", None, None, 51),
+    ],
+    "Symbol-163": [
+        ("Fault in the electromechanical brake servo", "1", None, None, 163),
+    ],
+    "Symbol-50": [
+        ("Front passenger front airbag off", "1", None, None, 50),
+    ],
+}
+
+ENTRIES = {entry["title"]: entry for entry in load_entries()}
+
+
+def test_all_entries_are_bundled():
+    assert sorted(ENTRIES) == sorted(EXPECTED)
+
+
+@pytest.mark.parametrize("title", sorted(EXPECTED))
+def test_parse_features(title):
+    records = parse_features(ENTRIES[title]["text"])
+    assert [(r.name, r.number, r.section, r.section_title, r.page) for r in records] == EXPECTED[title]
+
+
+def test_record_text():
+    assert FeatureRecord(name="Battery", section="A", section_title="Levels control", page=323).text == (
+        "Levels control: Battery ››› page 323"
+    )
+    # A section that is its own only item isn't prefixed with itself
+    title = "Action in the event of a puncture"
+    assert FeatureRecord(name=title, section="E", section_title=title, page=328).text == f"{title} ››› page 328"
+    assert FeatureRecord(name="Front radar", number="1").text == "Front radar"
@@ -0,0 +1,46 @@
+import pytest
+
+from matcher import CORRECT, INCORRECT, GuessMatcher
+
+
+@pytest.mark.parametrize("guess, target", [
+    ("front radar", "Front radar ››› page 12"),
+    ("Front radars", "Front radar"),
+    ("front passenger airbag disabled", "Front passenger front airbag off"),
+    ("seatbelts", "Seat belts"),
+])
+def test_confident_correct(guess, target):
+    assert GuessMatcher().judge(guess, target) == CORRECT
+
+
+@pytest.mark.parametrize("guess, target", [
+    ("banana", "Front radar"),
+    ("", "Front radar"),
+    ("?!", "Front radar"),
+])
+def test_confident_incorrect(guess, target):
+    assert GuessMatcher().judge(guess, target) == INCORRECT
+
+
+@pytest.mark.parametrize("guess, target", [
+    ("radar", "Front radar"),
+    ("rear camera", "Rear view camera"),
+    ("front sensor", "Front radar"),
+])
+def test_partial_guesses_are_left_to_the_model(guess, target):
+    assert GuessMatcher().judge(guess, target) is None
+
+
+def test_fallback_is_always_decisive():
+    matcher = GuessMatcher()
+    assert matcher.fallback("rear camera", "Rear view camera") == CORRECT
+    assert matcher.fallback("front sensor", "Front radar") == INCORRECT
+    assert matcher.fallbacks == 2
+
+
+def test_counts_each_band():
+    matcher = GuessMatcher()
+    matcher.judge("front radar", "Front radar")
+    matcher.judge("banana", "Front radar")
+    matcher.judge("radar", "Front radar")
+    assert matcher.counts == {CORRECT: 1, INCORRECT: 1, "ambiguous": 1}
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+class UpstreamError(Exception):
+    pass
+
+
+def test_concurrent_callers_share_one_call():
+    async def run():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "clue"
+
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(3)))
+        assert calls == 1
+        assert results == [("clue", True), ("clue", False), ("clue", False)]
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(run())
+
+
+def test_error_is_shared_between_callers():
+    async def run():
+        flight = SingleFlight(retries=0)
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise UpstreamError("bad response")
+
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(3)), return_exceptions=True)
+        assert calls == 1
+        assert all(isinstance(result, UpstreamError) for result in results)
+        # Results aren't kept, so the failure isn't either
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(run())
+
+
+def test_joiners_retry_once_together_after_an_error():
+    async def run():
+        flight = SingleFlight(retries=1)
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            if calls == 1:
+                raise UpstreamError("bad response")
+            return "clue"
+
+        first, *joiners = await asyncio.gather(*(flight.do("key", fetch) for _ in range(3)), return_exceptions=True)
+        assert isinstance(first, UpstreamError)
+        # The joiners coalesce again on their retry
+        assert calls == 2
+        assert sorted(started for _, started in joiners) == [False, True]
+        assert all(result == "clue" for result, _ in joiners)
+        assert flight.joiner_retries == 2
+
+    asyncio.run(run())
+
+
+def test_timeout_is_not_retried():
+    async def run():
+        flight = SingleFlight(retries=1)
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise asyncio.TimeoutError()
+
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(2)), return_exceptions=True)
+        assert calls == 1
+        assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+
+    asyncio.run(run())
+
+
+def test_one_caller_leaving_does_not_cancel_the_call():
+    async def run():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "clue"
+
+        leaving = asyncio.create_task(flight.do("key", fetch))
+        staying = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await staying == ("clue", False)
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+
+    asyncio.run(run())
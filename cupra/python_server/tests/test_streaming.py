@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from streaming import FieldEvent, JSONFieldStream, sse_event
+
+DOCUMENT = json.dumps({
+    "is_correct": False,
+    "clue": 'Say "café" \\ tab\there \U0001F697 über',
+    "score": 0.5,
+    "tags": ["a", "}", {"b": "]"}],
+}, ensure_ascii=True)
+
+
+def stream(chunks):
+    parser = JSONFieldStream()
+    events = [event for chunk in chunks for event in parser.feed(chunk)]
+    return parser, events
+
+
+def streamed_text(events, key):
+    return "".join(event.delta for event in events if event.key == key and not event.done)
+
+
+def check(parser, events):
+    expected = json.loads(DOCUMENT)
+    assert parser.complete
+    assert parser.fields == expected
+    assert streamed_text(events, "clue") == expected["clue"]
+    assert [event.key for event in events if event.done] == list(expected)
+
+
+def test_whole_document():
+    check(*stream([DOCUMENT]))
+
+
+def test_one_character_at_a_time():
+    check(*stream(list(DOCUMENT)))
+
+
+@pytest.mark.parametrize("split", range(1, len(DOCUMENT)))
+def test_split_anywhere(split):
+    check(*stream([DOCUMENT[:split], DOCUMENT[split:]]))
+
+
+def test_delta_never_holds_half_an_escape():
+    parser = JSONFieldStream()
+    assert parser.feed('{"clue": "caf\\u00') == [FieldEvent(key="clue", delta="caf")]
+    assert parser.feed("e9 \\") == [FieldEvent(key="clue", delta="é ")]
+    # Half a surrogate pair is held back until the other half arrives
+    assert parser.feed('"ok\\ud83d') == [FieldEvent(key="clue", delta='"ok')]
+    assert parser.feed("\\ude97") == [FieldEvent(key="clue", delta="\U0001F697")]
+
+
+def test_skips_text_before_the_object():
+    parser, _ = stream(["Sure! ```json\n", '{"clue": "x"}', "\n```"])
+    assert parser.complete
+    assert parser.fields == {"clue": "x"}
+
+
+def test_incomplete_document():
+    parser, events = stream(['{"is_correct": true, "clue": "hal'])
+    assert not parser.complete
+    assert parser.fields == {"is_correct": True}
+    assert streamed_text(events, "clue") == "hal"
+
+
+def test_sse_event():
+    assert sse_event("clue", {"text": "é"}) == 'event: clue\ndata: {"text": "é"}\n\n'